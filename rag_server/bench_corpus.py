@@ -0,0 +1,173 @@
+"""
+Synthetic Hebrew clinic corpus for benchmarks and retrieval evaluation.
+
+Generates treatment summaries and visit transcriptions shaped like the rows
+the indexer selects from Supabase (patient name joined in), plus labelled
+queries whose relevant documents are known. Everything is derived from a
+seed, so separate processes generate the same corpus.
+"""
+
+import random
+import uuid
+from datetime import date, timedelta
+
+FIRST_NAMES = [
+    "דנה", "יוסי", "מיכל", "אבי", "רונית", "משה", "שרה", "דוד", "נועה", "איתי",
+    "תמר", "עומר", "ליאת", "גיל", "הילה", "אורי", "יעל", "רון", "מאיה", "אלון",
+]
+LAST_NAMES = [
+    "כהן", "לוי", "מזרחי", "פרץ", "ביטון", "אברהם", "פרידמן", "שפירא", "דהן", "אזולאי",
+    "גבאי", "חדד", "אוחיון", "יוסף", "קליין", "רוזן", "וייס", "בן דוד", "אשכנזי", "מלכה",
+]
+
+# condition -> (symptoms, treatment, medication)
+CONDITIONS = {
+    "יתר לחץ דם": ("כאבי ראש וסחרחורת בבוקר", "מעקב לחץ דם ביתי והפחתת מלח", "אמלודיפין 5 מ\"ג"),
+    "סוכרת סוג 2": ("צמא מוגבר ועייפות", "תזונה דלת פחמימות ובדיקת HbA1c", "מטפורמין 850 מ\"ג"),
+    "אסתמה": ("קוצר נשימה בלילה ושיעול יבש", "הימנעות מאלרגנים ותוכנית פעולה", "משאף ונטולין"),
+    "דלקת גרון": ("כאב בבליעה וחום", "מנוחה ושתייה מרובה", "אמוקסיצילין 500 מ\"ג"),
+    "מיגרנה": ("כאב ראש חד צדדי ורגישות לאור", "יומן כאבי ראש וזיהוי טריגרים", "סומטריפטן 50 מ\"ג"),
+    "דלקת בדרכי השתן": ("צריבה במתן שתן ותכיפות", "שתייה מרובה ותרבית שתן", "מונורל 3 גרם"),
+    "תת פעילות בלוטת התריס": ("עייפות ועלייה במשקל", "בדיקת TSH חוזרת בעוד שישה שבועות", "אלטרוקסין 50 מק\"ג"),
+    "כולסטרול גבוה": ("ללא תסמינים, נמצא בבדיקת דם", "פעילות גופנית ותזונה ים תיכונית", "ליפיטור 20 מ\"ג"),
+    "דיכאון": ("מצב רוח ירוד והפרעות שינה", "הפניה לטיפול פסיכולוגי", "ציפרלקס 10 מ\"ג"),
+    "חרדה": ("דפיקות לב ודאגנות יתר", "תרגילי נשימה וטיפול קוגניטיבי התנהגותי", "סרטרלין 50 מ\"ג"),
+    "כאבי גב תחתון": ("כאב המקרין לרגל שמאל", "פיזיותרפיה ותרגילי חיזוק", "אטופן 90 מ\"ג"),
+    "ריפלוקס": ("צרבת לאחר ארוחות", "הימנעות מארוחות מאוחרות והגבהת ראש המיטה", "אומפרזול 20 מ\"ג"),
+    "אנמיה": ("חולשה וחיוורון", "בדיקת פריטין ומעקב ספירת דם", "ברזל פומי 100 מ\"ג"),
+    "דלקת אוזן תיכונה": ("כאב אוזן וחום אצל ילד", "משככי כאבים ומעקב תוך 48 שעות", "אוגמנטין 875 מ\"ג"),
+    "אקזמה": ("גרד ופריחה יבשה בקפלי המרפקים", "לחות אינטנסיבית והימנעות מסבון", "משחת סטרואידים קלה"),
+    "גאוט": ("נפיחות וכאב חד בבוהן", "הפחתת בשר אדום ואלכוהול", "קולכיצין 0.5 מ\"ג"),
+}
+
+TRANSCRIPT_LINES = [
+    "הרופא שאל מתי התחילו התסמינים והמטופל ענה שלפני כשבועיים.",
+    "המטופל סיפר ש{symptoms} מחמירים בשעות הערב.",
+    "נבדקו לחץ דם ודופק והתוצאות היו בטווח התקין.",
+    "הרופא הסביר את האבחנה של {condition} ואת משמעותה.",
+    "סוכם על {treatment} ועל ביקור חוזר בעוד חודש.",
+    "הומלץ על {medication} פעם ביום לאחר האוכל.",
+    "המטופל שאל על תופעות לוואי והרופא פירט אותן.",
+    "נמסרו הנחיות לפנות למיון במקרה של החמרה.",
+    "בני המשפחה השתתפו בשיחה ושאלו על תזונה מתאימה.",
+    "הרופא רשם הפניה לבדיקות דם כלליות.",
+]
+
+
+class Corpus:
+    def __init__(self, doctor_id: str, summaries: list[dict], transcriptions: list[dict],
+                 patients: list[dict]):
+        self.doctor_id = doctor_id
+        self.summaries = summaries
+        self.transcriptions = transcriptions
+        self.patients = patients
+
+    def rows(self, table: str) -> list[dict]:
+        return {
+            "treatment_summaries": self.summaries,
+            "transcriptions": self.transcriptions,
+            "users": self.patients,
+        }[table]
+
+
+def _uuid(rng: random.Random) -> str:
+    return str(uuid.UUID(int=rng.getrandbits(128), version=4))
+
+
+def generate_corpus(patients: int = 50, visits_per_patient: int = 4, seed: int = 7) -> Corpus:
+    """Each visit yields one treatment summary and one transcription."""
+    rng = random.Random(seed)
+    doctor_id = _uuid(rng)
+    conditions = list(CONDITIONS)
+    start = date(2025, 1, 1)
+
+    patient_rows, summaries, transcriptions = [], [], []
+    names = set()
+    for _ in range(patients):
+        name = f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}"
+        while name in names:
+            name = f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}"
+        names.add(name)
+        patient = {"id": _uuid(rng), "full_name": name, "phone": "", "email": ""}
+        patient_rows.append(patient)
+
+        for _ in range(visits_per_patient):
+            condition = rng.choice(conditions)
+            symptoms, treatment, medication = CONDITIONS[condition]
+            created = (start + timedelta(days=rng.randrange(365))).isoformat() + "T10:00:00"
+            follow_up = rng.random() < 0.4
+            summaries.append({
+                "id": _uuid(rng),
+                "doctor_id": doctor_id,
+                "patient_id": patient["id"],
+                "diagnosis": condition,
+                "treatment_notes": f"המטופל הגיע עם {symptoms}. {treatment}.",
+                "prescription": medication,
+                "follow_up_required": follow_up,
+                "follow_up_date": (start + timedelta(days=rng.randrange(365, 400))).isoformat()
+                if follow_up else None,
+                "created_at": created,
+                "patient": {"full_name": name},
+                "condition": condition,
+            })
+            lines = rng.sample(TRANSCRIPT_LINES, k=len(TRANSCRIPT_LINES))
+            transcriptions.append({
+                "id": _uuid(rng),
+                "doctor_id": doctor_id,
+                "patient_id": patient["id"],
+                "transcription_text": " ".join(
+                    line.format(symptoms=symptoms, condition=condition,
+                                treatment=treatment, medication=medication)
+                    for line in lines * 2
+                ),
+                "created_at": created,
+                "patient": {"full_name": name},
+                "condition": condition,
+            })
+
+    return Corpus(doctor_id, summaries, transcriptions, patient_rows)
+
+
+def labelled_queries(corpus: Corpus, count: int = 100, seed: int = 11) -> list[dict]:
+    """Queries with the source IDs that answer them.
+
+    Returns dicts with ``query`` and ``relevant`` (a set of source IDs over
+    treatment summaries and transcriptions).
+    """
+    rng = random.Random(seed)
+    documents = corpus.summaries + corpus.transcriptions
+    by_patient_condition: dict[tuple[str, str], set[str]] = {}
+    by_condition: dict[str, set[str]] = {}
+    for doc in documents:
+        name = doc["patient"]["full_name"]
+        by_patient_condition.setdefault((name, doc["condition"]), set()).add(doc["id"])
+        by_condition.setdefault(doc["condition"], set()).add(doc["id"])
+
+    pairs = sorted(by_patient_condition)
+    queries = []
+    for _ in range(count):
+        if rng.random() < 0.7:
+            name, condition = rng.choice(pairs)
+            # Names and terms as separate words (no prefixed letters), the way
+            # the documents spell them, so lexical embeddings can match them too
+            template = rng.choice([
+                "מה הטיפול של המטופל {name} עם אבחנה {condition}?",
+                "האם המטופל {name} עם אבחנה של {condition}?",
+                "מה המרשם למטופל: {name} אבחנה: {condition}?",
+            ])
+            queries.append({
+                "query": template.format(name=name, condition=condition),
+                "relevant": by_patient_condition[(name, condition)],
+            })
+        else:
+            condition = rng.choice(sorted(by_condition))
+            symptoms, _, medication = CONDITIONS[condition]
+            template = rng.choice([
+                "איזה מטופל הגיע עם {symptoms}?",
+                "לאיזה מטופל מרשם: {medication}?",
+            ])
+            queries.append({
+                "query": template.format(symptoms=symptoms, medication=medication),
+                "relevant": by_condition[condition],
+            })
+    return queries
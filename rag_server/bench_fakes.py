@@ -0,0 +1,434 @@
+"""
+Local stand-ins for Ollama and Supabase, for benchmarking the RAG server.
+
+FakeOllama serves /api/ps, /api/embed and /api/generate: deterministic
+hashed embeddings (the same vectors as EMBEDDING_BACKEND=fake) and answers
+streamed token by token with configurable prefill and per-token delays.
+
+FakeSupabase serves the PostgREST calls the RAG server makes: the
+match_* and refresh_patient_centroids RPCs over an in-memory chunk table
+(exact cosine search with numpy), and simple eq-filtered selects, inserts
+and deletes. It is seeded with the synthetic corpus from bench_corpus,
+chunked and embedded the way the indexer would.
+
+Usage (normally started by benchmark.py):
+  python bench_fakes.py --ollama-port 11500 --supabase-port 11501 [--patients 50]
+"""
+
+import argparse
+import json
+import socket
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, urlsplit
+
+import numpy as np
+
+from bench_corpus import Corpus, generate_corpus
+from chunker import chunk_text, prepare_transcription_text, prepare_treatment_summary_text
+from embedder import FakeBackend
+
+ANSWER_WORDS = "המטופל אובחן עם המצב המתואר וקיבל טיפול מתאים עם מעקב בעוד חודש".split()
+
+
+class JsonHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def setup(self):
+        super().setup()
+        # Headers and body are separate writes; don't let Nagle hold the body
+        self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+    def log_message(self, format, *args):
+        pass
+
+    def read_json(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        body = self.rfile.read(length) if length else b""
+        return json.loads(body) if body else None
+
+    def send_json(self, payload, status: int = 200):
+        body = json.dumps(payload, ensure_ascii=False).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def start_chunked(self, content_type: str):
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+    def write_chunk(self, data: bytes):
+        self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+        self.wfile.flush()
+
+    def end_chunked(self):
+        self.wfile.write(b"0\r\n\r\n")
+        self.wfile.flush()
+
+
+# --- Ollama ---
+
+class FakeOllama:
+    def __init__(self, prefill_ms: float = 50, token_ms: float = 20, tokens: int = 40,
+                 embed_ms: float = 5):
+        self.prefill_ms = prefill_ms
+        self.token_ms = token_ms
+        self.tokens = tokens
+        self.embed_ms = embed_ms
+        self.embedder = FakeBackend()
+        self.loaded: set[str] = set()
+
+    @staticmethod
+    def _now() -> str:
+        return datetime.now(timezone.utc).isoformat()
+
+    def handler(self):
+        fake = self
+
+        class Handler(JsonHandler):
+            def do_GET(self):
+                if self.path == "/api/ps":
+                    self.send_json({"models": [
+                        {"name": m, "model": m, "size": 0, "digest": "", "size_vram": 0,
+                         "expires_at": "2099-01-01T00:00:00Z"}
+                        for m in sorted(fake.loaded)
+                    ]})
+                else:
+                    self.send_json({"error": "not found"}, 404)
+
+            def do_POST(self):
+                body = self.read_json() or {}
+                if self.path == "/api/embed":
+                    fake.embed(self, body)
+                elif self.path == "/api/generate":
+                    fake.generate(self, body)
+                else:
+                    self.send_json({"error": "not found"}, 404)
+
+        return Handler
+
+    def _model(self, name: str) -> str:
+        model = name if ":" in name else f"{name}:latest"
+        self.loaded.add(model)
+        return model
+
+    def embed(self, handler: JsonHandler, body: dict):
+        texts = body.get("input") or []
+        if isinstance(texts, str):
+            texts = [texts]
+        time.sleep(self.embed_ms / 1000 * max(len(texts), 1))
+        handler.send_json({
+            "model": self._model(body.get("model", "")),
+            "embeddings": self.embedder.embed(texts),
+        })
+
+    def generate(self, handler: JsonHandler, body: dict):
+        model = self._model(body.get("model", ""))
+        prompt = (body.get("system") or "") + (body.get("prompt") or "")
+        if not body.get("prompt"):
+            # Residency ping: loads the model, generates nothing
+            handler.send_json({"model": model, "created_at": self._now(), "response": "",
+                               "done": True, "done_reason": "load"})
+            return
+
+        prompt_tokens = max(len(prompt.split()), 1)
+        words = [ANSWER_WORDS[i % len(ANSWER_WORDS)] for i in range(self.tokens)]
+        time.sleep(self.prefill_ms / 1000)
+        final = {
+            "model": model,
+            "created_at": self._now(),
+            "response": "",
+            "done": True,
+            "done_reason": "stop",
+            "context": list(range(prompt_tokens + self.tokens)),
+            "total_duration": int((self.prefill_ms + self.token_ms * self.tokens) * 1e6),
+            "load_duration": 0,
+            "prompt_eval_count": prompt_tokens,
+            "prompt_eval_duration": int(self.prefill_ms * 1e6),
+            "eval_count": self.tokens,
+            "eval_duration": int(self.token_ms * self.tokens * 1e6),
+        }
+
+        if body.get("stream", True) is False:
+            time.sleep(self.token_ms * self.tokens / 1000)
+            handler.send_json({**final, "response": " ".join(words)})
+            return
+
+        handler.start_chunked("application/x-ndjson")
+        for i, word in enumerate(words):
+            time.sleep(self.token_ms / 1000)
+            line = {"model": model, "created_at": self._now(),
+                    "response": word if i == 0 else f" {word}", "done": False}
+            handler.write_chunk(json.dumps(line, ensure_ascii=False).encode() + b"\n")
+        handler.write_chunk(json.dumps(final).encode() + b"\n")
+        handler.end_chunked()
+
+
+# --- Supabase (PostgREST) ---
+
+class FakeSupabase:
+    def __init__(self, corpus: Corpus, search_ms: float = 5):
+        self.corpus = corpus
+        self.search_ms = search_ms
+        self.tables = {
+            table: {row["id"]: row for row in corpus.rows(table)}
+            for table in ("treatment_summaries", "transcriptions", "users")
+        }
+        self.chunks: list[dict] = []
+        self.centroids: dict[tuple[str, str, str], dict] = {}
+        self._matrix: np.ndarray | None = None
+        self._lock = threading.Lock()
+
+    # seeding
+
+    def seed(self, embedder: FakeBackend):
+        """Index the corpus the way the indexer does (same text, chunk sizes)."""
+        for table, rows, prepare, size, kind in (
+            ("treatment_summaries", self.corpus.summaries, prepare_treatment_summary_text,
+             500, "treatment_summary"),
+            ("transcriptions", self.corpus.transcriptions, prepare_transcription_text,
+             800, "transcription"),
+        ):
+            for row in rows:
+                chunks = chunk_text(prepare(row), chunk_size=size)
+                for i, (content, embedding) in enumerate(zip(chunks, embedder.embed(chunks))):
+                    self.chunks.append({
+                        "id": str(uuid.uuid4()),
+                        "source_table": table,
+                        "source_id": row["id"],
+                        "chunk_index": i,
+                        "doctor_id": row["doctor_id"],
+                        "patient_id": row["patient_id"],
+                        "content": content,
+                        "embedding": embedding,
+                        "metadata": {
+                            "type": kind,
+                            "patient_name": row["patient"]["full_name"],
+                            "date": row["created_at"][:10],
+                        },
+                    })
+        for patient in self.corpus.patients:
+            self._refresh_centroids(self.corpus.doctor_id, patient["id"])
+
+    # vector search
+
+    def _vectors(self) -> np.ndarray:
+        if self._matrix is None:
+            matrix = np.array([c["embedding"] for c in self.chunks], dtype=np.float32)
+            norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+            self._matrix = matrix / np.clip(norms, 1e-12, None)
+        return self._matrix
+
+    @staticmethod
+    def _result(chunk: dict, similarity: float) -> dict:
+        row = {k: v for k, v in chunk.items() if k != "embedding"}
+        row["similarity"] = similarity
+        return row
+
+    def match_chunks(self, query_embedding, doctor_id: str, match_count: int,
+                     threshold: float, patient_ids: list[str] | None = None) -> list[dict]:
+        time.sleep(self.search_ms / 1000)
+        with self._lock:
+            if not self.chunks:
+                return []
+            query = np.asarray(query_embedding, dtype=np.float32)
+            query /= max(np.linalg.norm(query), 1e-12)
+            similarities = self._vectors() @ query
+            allowed = set(patient_ids) if patient_ids is not None else None
+            order = np.argsort(-similarities)
+            results = []
+            for index in order:
+                chunk = self.chunks[index]
+                similarity = float(similarities[index])
+                if similarity <= threshold:
+                    break
+                if chunk["doctor_id"] != doctor_id:
+                    continue
+                if allowed is not None and chunk["patient_id"] not in allowed \
+                        and chunk["patient_id"] is not None:
+                    continue
+                results.append(self._result(chunk, similarity))
+                if len(results) >= match_count:
+                    break
+            return results
+
+    def _refresh_centroids(self, doctor_id: str, patient_id: str):
+        for key in [k for k in self.centroids if k[:2] == (doctor_id, patient_id)]:
+            del self.centroids[key]
+        groups: dict[str, list] = {}
+        for chunk in self.chunks:
+            if chunk["doctor_id"] == doctor_id and chunk["patient_id"] == patient_id:
+                groups.setdefault("*", []).append(chunk["embedding"])
+                groups.setdefault(chunk["source_table"], []).append(chunk["embedding"])
+        for source, vectors in groups.items():
+            self.centroids[(doctor_id, patient_id, source)] = {
+                "centroid": np.mean(np.array(vectors, dtype=np.float32), axis=0),
+                "chunk_count": len(vectors),
+            }
+
+    def match_centroids(self, query_embedding, doctor_id: str, match_count: int,
+                        source_table: str) -> list[dict]:
+        time.sleep(self.search_ms / 1000)
+        query = np.asarray(query_embedding, dtype=np.float32)
+        query /= max(np.linalg.norm(query), 1e-12)
+        with self._lock:
+            scored = []
+            for (doctor, patient, source), entry in self.centroids.items():
+                if doctor != doctor_id or source != source_table:
+                    continue
+                centroid = entry["centroid"]
+                similarity = float(centroid @ query / max(np.linalg.norm(centroid), 1e-12))
+                scored.append({"patient_id": patient, "chunk_count": entry["chunk_count"],
+                               "similarity": similarity})
+        scored.sort(key=lambda row: -row["similarity"])
+        return scored[:match_count]
+
+    def rpc(self, name: str, params: dict):
+        if name == "match_document_chunks":
+            return self.match_chunks(params["query_embedding"], params["filter_doctor_id"],
+                                     params.get("match_count", 5),
+                                     params.get("similarity_threshold", 0.3))
+        if name == "match_document_chunks_for_patients":
+            return self.match_chunks(params["query_embedding"], params["filter_doctor_id"],
+                                     params.get("match_count", 5),
+                                     params.get("similarity_threshold", 0.3),
+                                     patient_ids=params["filter_patient_ids"])
+        if name == "match_patient_centroids":
+            return self.match_centroids(params["query_embedding"], params["filter_doctor_id"],
+                                        params.get("match_count", 5),
+                                        params.get("filter_source_table", "*"))
+        if name == "refresh_patient_centroids":
+            with self._lock:
+                self._refresh_centroids(params["p_doctor_id"], params["p_patient_id"])
+            return None
+        raise KeyError(name)
+
+    # tables
+
+    @staticmethod
+    def _filters(query: str) -> tuple[dict, dict]:
+        filters, options = {}, {}
+        for key, value in parse_qsl(query, keep_blank_values=True):
+            if value.startswith("eq."):
+                filters[key] = value[3:]
+            else:
+                options[key] = value
+        return filters, options
+
+    @staticmethod
+    def _matches(row: dict, filters: dict) -> bool:
+        return all(str(row.get(key)) == value for key, value in filters.items())
+
+    def select(self, table: str, filters: dict, options: dict) -> list[dict]:
+        source = self.chunks if table == "document_chunks" else self.tables[table].values()
+        rows = [
+            {k: v for k, v in row.items() if k != "embedding"}
+            for row in source if self._matches(row, filters)
+        ]
+        offset = int(options.get("offset", 0))
+        limit = options.get("limit")
+        return rows[offset:offset + int(limit)] if limit else rows[offset:]
+
+    def delete(self, table: str, filters: dict) -> list[dict]:
+        with self._lock:
+            deleted = [c for c in self.chunks if self._matches(c, filters)]
+            if deleted:
+                self.chunks = [c for c in self.chunks if not self._matches(c, filters)]
+                self._matrix = None
+        return [{k: v for k, v in c.items() if k != "embedding"} for c in deleted]
+
+    def insert(self, table: str, rows) -> list[dict]:
+        rows = rows if isinstance(rows, list) else [rows]
+        with self._lock:
+            for row in rows:
+                self.chunks.append({"id": str(uuid.uuid4()), **row})
+            self._matrix = None
+        return [{k: v for k, v in row.items() if k != "embedding"} for row in rows]
+
+    def handler(self):
+        fake = self
+
+        class Handler(JsonHandler):
+            def _route(self):
+                parts = urlsplit(self.path)
+                path = parts.path.removeprefix("/rest/v1/")
+                return path, *fake._filters(parts.query)
+
+            def _respond(self, rows):
+                single = "vnd.pgrst.object" in (self.headers.get("Accept") or "")
+                if single:
+                    if len(rows) != 1:
+                        self.send_json({"code": "PGRST116", "message": "not one row",
+                                        "details": None, "hint": None}, 406)
+                        return
+                    self.send_json(rows[0])
+                else:
+                    self.send_json(rows)
+
+            def do_GET(self):
+                table, filters, options = self._route()
+                self._respond(fake.select(table, filters, options))
+
+            def do_DELETE(self):
+                self.read_json()  # postgrest-py sends a body; drain it for keep-alive
+                table, filters, _ = self._route()
+                self.send_json(fake.delete(table, filters))
+
+            def do_POST(self):
+                path, _, _ = self._route()
+                body = self.read_json()
+                if path.startswith("rpc/"):
+                    try:
+                        self.send_json(fake.rpc(path[4:], body or {}))
+                    except KeyError:
+                        self.send_json({"message": f"unknown function {path[4:]}"}, 404)
+                else:
+                    self.send_json(fake.insert(path, body), 201)
+
+            def do_PATCH(self):
+                self.read_json()
+                self.send_json([])
+
+        return Handler
+
+
+def serve(handler, port: int) -> ThreadingHTTPServer:
+    server = ThreadingHTTPServer(("127.0.0.1", port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--ollama-port", type=int, required=True)
+    parser.add_argument("--supabase-port", type=int, required=True)
+    parser.add_argument("--patients", type=int, default=50)
+    parser.add_argument("--visits", type=int, default=4, help="Visits per patient")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--prefill-ms", type=float, default=50)
+    parser.add_argument("--token-ms", type=float, default=20)
+    parser.add_argument("--tokens", type=int, default=40)
+    parser.add_argument("--embed-ms", type=float, default=5, help="Per embedded text")
+    parser.add_argument("--search-ms", type=float, default=5, help="Per RPC")
+    args = parser.parse_args()
+
+    ollama = FakeOllama(args.prefill_ms, args.token_ms, args.tokens, args.embed_ms)
+    supabase = FakeSupabase(generate_corpus(args.patients, args.visits, args.seed), args.search_ms)
+    supabase.seed(ollama.embedder)
+
+    serve(ollama.handler(), args.ollama_port)
+    serve(supabase.handler(), args.supabase_port)
+    print(f"ready: {len(supabase.chunks)} chunks", flush=True)
+    threading.Event().wait()
+
+
+if __name__ == "__main__":
+    main()
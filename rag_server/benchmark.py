@@ -0,0 +1,381 @@
+"""
+Throughput and latency benchmark for the RAG server.
+
+Starts the local stand-ins from bench_fakes (Ollama and Supabase), runs the
+RAG server against them with uvicorn, and drives /rag/query,
+/rag/query/stream and /rag/index at each requested concurrency. Reports
+p50/p95/p99 latency, time to first token (streams), requests per second
+and the server's own per-stage breakdown (Server-Timing / timing event),
+plus how many queries retrieved no context and so skipped generation.
+
+Results can be saved as a baseline and later runs compared against it;
+the exit code is 1 when a metric regresses past the tolerance, or when
+most queries of a scenario retrieved no context.
+
+Usage:
+  python benchmark.py [--scenarios query,stream,index] [--concurrency 1,4,16]
+                      [--requests 200] [--output run.json]
+                      [--save-baseline baseline.json | --baseline baseline.json]
+
+  # Against an already running server and its real dependencies:
+  python benchmark.py --server-url http://localhost:8001 --doctor-id <uuid> \\
+      --internal-key "$SUPABASE_SERVICE_KEY" --scenarios query,stream
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import httpx
+
+from bench_corpus import generate_corpus, labelled_queries
+
+HERE = Path(__file__).parent
+SCENARIOS = ("query", "stream", "index")
+# Placeholder key shaped like a JWT, which supabase-py checks for
+FAKE_KEY = "bench.bench.bench"
+
+# Metric -> True if higher is better
+COMPARED = {
+    "rps": True,
+    "latency_p50_ms": False,
+    "latency_p95_ms": False,
+    "latency_p99_ms": False,
+    "ttft_p50_ms": False,
+    "ttft_p95_ms": False,
+}
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def percentile(values: list[float], pct: float) -> float | None:
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = (len(ordered) - 1) * pct / 100
+    low = int(rank)
+    high = min(low + 1, len(ordered) - 1)
+    return round(ordered[low] + (ordered[high] - ordered[low]) * (rank - low), 1)
+
+
+def parse_server_timing(header: str) -> dict[str, float]:
+    stages = {}
+    for entry in filter(None, (e.strip() for e in header.split(","))):
+        name, _, params = entry.partition(";")
+        if params.startswith("dur="):
+            stages[name] = float(params[4:])
+    return stages
+
+
+class Stack:
+    """The stand-in processes and the RAG server under test."""
+
+    def __init__(self, args):
+        self.args = args
+        self.processes: list[subprocess.Popen] = []
+        self.server_log = None
+
+    def _spawn(self, command: list[str], env: dict | None = None, log=None) -> subprocess.Popen:
+        process = subprocess.Popen(
+            command, cwd=HERE, env={**os.environ, **(env or {})},
+            stdout=log or subprocess.PIPE, stderr=subprocess.STDOUT, text=True,
+        )
+        self.processes.append(process)
+        return process
+
+    def start(self) -> str:
+        args = self.args
+        ollama_port, supabase_port, server_port = free_port(), free_port(), free_port()
+        fakes = self._spawn([
+            sys.executable, "bench_fakes.py",
+            "--ollama-port", str(ollama_port), "--supabase-port", str(supabase_port),
+            "--patients", str(args.patients), "--visits", str(args.visits),
+            "--seed", str(args.seed),
+            "--prefill-ms", str(args.prefill_ms), "--token-ms", str(args.token_ms),
+            "--tokens", str(args.tokens), "--embed-ms", str(args.embed_ms),
+            "--search-ms", str(args.search_ms),
+        ])
+        line = fakes.stdout.readline()
+        if not line.startswith("ready"):
+            raise RuntimeError(f"Stand-ins failed to start: {line}{fakes.stdout.read()}")
+        print(f"Stand-ins {line.strip()}", flush=True)
+        # The fakes print nothing more; the server's log goes to a file so
+        # an unread pipe can't stall it
+        self.server_log = open(args.server_log, "w")
+
+        server = self._spawn(
+            [sys.executable, "-m", "uvicorn", "main:app", "--port", str(server_port),
+             "--log-level", "warning"],
+            env={
+                "OLLAMA_HOST": f"http://127.0.0.1:{ollama_port}",
+                "OLLAMA_HOSTS": "",
+                "SUPABASE_URL": f"http://127.0.0.1:{supabase_port}",
+                "SUPABASE_SERVICE_KEY": FAKE_KEY,
+                "EMBEDDING_BACKEND": "ollama",
+                "OLLAMA_RESIDENCY_START_DELAY_SECONDS": "0",
+                **dict(kv.split("=", 1) for kv in args.server_env),
+            },
+            log=self.server_log,
+        )
+        url = f"http://127.0.0.1:{server_port}"
+        deadline = time.monotonic() + 60
+        while time.monotonic() < deadline:
+            if server.poll() is not None:
+                raise RuntimeError(f"RAG server exited, see {self.args.server_log}")
+            try:
+                if httpx.get(f"{url}/health", timeout=2).status_code == 200:
+                    return url
+            except httpx.HTTPError:
+                pass
+            time.sleep(0.2)
+        raise RuntimeError("RAG server did not become healthy")
+
+    def stop(self):
+        for process in reversed(self.processes):
+            process.terminate()
+        for process in self.processes:
+            try:
+                process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                process.kill()
+        if self.server_log:
+            self.server_log.close()
+
+
+async def run_request(client: httpx.AsyncClient, scenario: str, payload: dict) -> dict:
+    """One request; returns latency, TTFT and stage timings (ms)."""
+    start = time.perf_counter()
+    sample = {"ok": False, "ttft": None, "stages": {}, "no_context": False}
+    if scenario == "stream":
+        async with client.stream("POST", "/rag/query/stream", json=payload) as response:
+            async for line in response.aiter_lines():
+                if not line.startswith("data: "):
+                    continue
+                event = json.loads(line[6:])
+                if event["type"] == "token" and sample["ttft"] is None:
+                    sample["ttft"] = (time.perf_counter() - start) * 1000
+                elif event["type"] == "sources":
+                    sample["no_context"] = not event["total_scanned"]
+                elif event["type"] == "timing":
+                    sample["stages"] = event["timings"]
+                elif event["type"] == "done":
+                    sample["ok"] = response.status_code == 200
+                elif event["type"] == "error":
+                    break
+    else:
+        path = "/rag/query" if scenario == "query" else "/rag/index"
+        response = await client.post(path, json=payload)
+        sample["ok"] = response.status_code == 200
+        sample["stages"] = parse_server_timing(response.headers.get("server-timing", ""))
+        if scenario == "query" and sample["ok"]:
+            sample["no_context"] = not response.json()["total_summaries_scanned"]
+    sample["latency"] = (time.perf_counter() - start) * 1000
+    return sample
+
+
+async def run_scenario(url: str, key: str, scenario: str, payloads: list[dict],
+                       concurrency: int, warmup: int) -> dict:
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    headers = {"X-Internal-Key": key}
+    async with httpx.AsyncClient(base_url=url, headers=headers, limits=limits,
+                                 timeout=600) as client:
+        for payload in payloads[:warmup]:
+            await run_request(client, scenario, payload)
+
+        pending = payloads[warmup:]
+        samples: list[dict] = []
+
+        async def worker():
+            while pending:
+                payload = pending.pop()
+                try:
+                    samples.append(await run_request(client, scenario, payload))
+                except httpx.HTTPError:
+                    samples.append({"ok": False, "latency": None, "ttft": None, "stages": {},
+                                    "no_context": False})
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - start
+
+    ok = [s for s in samples if s["ok"]]
+    latencies = [s["latency"] for s in ok]
+    ttfts = [s["ttft"] for s in ok if s["ttft"] is not None]
+    stage_names = sorted({name for s in ok for name in s["stages"]})
+    return {
+        "requests": len(samples),
+        "errors": len(samples) - len(ok),
+        # Answered from the "no results" early return, without generation
+        "no_context": sum(1 for s in ok if s["no_context"]),
+        "rps": round(len(ok) / elapsed, 2) if elapsed else None,
+        "latency_p50_ms": percentile(latencies, 50),
+        "latency_p95_ms": percentile(latencies, 95),
+        "latency_p99_ms": percentile(latencies, 99),
+        "ttft_p50_ms": percentile(ttfts, 50),
+        "ttft_p95_ms": percentile(ttfts, 95),
+        "ttft_p99_ms": percentile(ttfts, 99),
+        "stages_p50_ms": {
+            name: percentile([s["stages"][name] for s in ok if name in s["stages"]], 50)
+            for name in stage_names
+        },
+    }
+
+
+def build_payloads(args, scenario: str) -> list[dict]:
+    rng = random.Random(args.seed)
+    if args.server_url:
+        doctor_id = args.doctor_id
+        queries = [q["query"] for q in labelled_queries(generate_corpus(5, 1, args.seed), 50)]
+        index_ids = [("treatment_summaries", i) for i in args.index_ids.split(",") if i]
+    else:
+        corpus = generate_corpus(args.patients, args.visits, args.seed)
+        doctor_id = corpus.doctor_id
+        queries = [q["query"] for q in labelled_queries(corpus, 200, args.seed)]
+        index_ids = [("treatment_summaries", row["id"]) for row in corpus.summaries] + \
+                    [("transcriptions", row["id"]) for row in corpus.transcriptions]
+
+    count = args.requests + args.warmup
+    if scenario == "index":
+        if not index_ids:
+            return []
+        return [{"source_table": table, "source_id": source_id}
+                for table, source_id in (rng.choice(index_ids) for _ in range(count))]
+    return [{"query": rng.choice(queries), "doctor_id": doctor_id, "top_k": args.top_k}
+            for _ in range(count)]
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list[str]:
+    """Regressions beyond the tolerance, as printable lines."""
+    regressions = []
+    print(f"\nCompared with baseline (tolerance {tolerance:.0%}):")
+    for name, result in results.items():
+        previous = baseline.get("results", {}).get(name)
+        if previous is None:
+            continue
+        for metric, higher_is_better in COMPARED.items():
+            old, new = previous.get(metric), result.get(metric)
+            if not old or new is None:
+                continue
+            change = (new - old) / old
+            worse = -change if higher_is_better else change
+            flag = "REGRESSION" if worse > tolerance else ""
+            print(f"  {name:<14} {metric:<16} {old:>10} -> {new:>10} ({change:+.1%}) {flag}")
+            if flag:
+                regressions.append(f"{name} {metric}: {old} -> {new} ({change:+.1%})")
+    return regressions
+
+
+def print_result(name: str, result: dict):
+    ttft = f"  ttft p50/p95 {result['ttft_p50_ms']}/{result['ttft_p95_ms']} ms" \
+        if result["ttft_p50_ms"] is not None else ""
+    print(
+        f"{name:<14} {result['rps']:>8} req/s  "
+        f"p50/p95/p99 {result['latency_p50_ms']}/{result['latency_p95_ms']}/"
+        f"{result['latency_p99_ms']} ms{ttft}  errors {result['errors']}"
+        f"  no-context {result['no_context']}"
+    )
+    if result["stages_p50_ms"]:
+        stages = ", ".join(f"{k} {v}" for k, v in result["stages_p50_ms"].items())
+        print(f"{'':<14} stages p50 (ms): {stages}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--scenarios", default="query,stream,index")
+    parser.add_argument("--concurrency", default="1,4,16", help="Comma-separated levels")
+    parser.add_argument("--requests", type=int, default=200, help="Per scenario and level")
+    parser.add_argument("--warmup", type=int, default=5)
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=7)
+    # Stand-ins
+    parser.add_argument("--patients", type=int, default=50)
+    parser.add_argument("--visits", type=int, default=4)
+    parser.add_argument("--prefill-ms", type=float, default=50)
+    parser.add_argument("--token-ms", type=float, default=20)
+    parser.add_argument("--tokens", type=int, default=40)
+    parser.add_argument("--embed-ms", type=float, default=5)
+    parser.add_argument("--search-ms", type=float, default=5)
+    parser.add_argument("--server-log", default="benchmark-server.log")
+    parser.add_argument("--server-env", action="append", default=[],
+                        help="KEY=VALUE passed to the RAG server, e.g. RAG_TWO_STAGE=false")
+    # External server
+    parser.add_argument("--server-url", help="Benchmark a running server instead")
+    parser.add_argument("--internal-key", default=os.environ.get("SUPABASE_SERVICE_KEY", ""))
+    parser.add_argument("--doctor-id", default="")
+    parser.add_argument("--index-ids", default="", help="Treatment summary IDs for the index scenario")
+    # Results
+    parser.add_argument("--output", help="Write results as JSON")
+    parser.add_argument("--save-baseline", help="Write results as the new baseline")
+    parser.add_argument("--baseline", help="Compare with a saved baseline")
+    parser.add_argument("--tolerance", type=float, default=0.15)
+    args = parser.parse_args()
+
+    scenarios = [s for s in args.scenarios.split(",") if s]
+    for scenario in scenarios:
+        if scenario not in SCENARIOS:
+            parser.error(f"Unknown scenario: {scenario}")
+    if args.server_url and not args.doctor_id:
+        parser.error("--doctor-id is required with --server-url")
+    levels = [int(c) for c in args.concurrency.split(",")]
+
+    stack = None
+    url, key = args.server_url, args.internal_key
+    if not url:
+        stack = Stack(args)
+        url, key = stack.start(), FAKE_KEY
+
+    results = {}
+    try:
+        for scenario in scenarios:
+            payloads = build_payloads(args, scenario)
+            if not payloads:
+                print(f"Skipping {scenario}: nothing to index (--index-ids)")
+                continue
+            for concurrency in levels:
+                name = f"{scenario}@{concurrency}"
+                results[name] = asyncio.run(run_scenario(
+                    url, key, scenario, payloads, concurrency, args.warmup
+                ))
+                print_result(name, results[name])
+    finally:
+        if stack:
+            stack.stop()
+
+    # Queries that retrieve nothing skip generation, so their latencies
+    # say little about the query path
+    empty = [name for name, result in results.items()
+             if result["no_context"] * 2 > result["requests"]]
+    if empty:
+        print(f"\nMost queries retrieved no context in: {', '.join(empty)}")
+
+    report = {
+        "config": {k: v for k, v in vars(args).items()
+                   if k not in ("internal_key", "output", "save_baseline", "baseline")},
+        "results": results,
+    }
+    for path in filter(None, (args.output, args.save_baseline)):
+        Path(path).write_text(json.dumps(report, indent=2, ensure_ascii=False))
+        print(f"Wrote {path}")
+
+    if args.baseline:
+        regressions = compare(results, json.loads(Path(args.baseline).read_text()), args.tolerance)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s)")
+            sys.exit(1)
+    if empty:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -4,6 +4,11 @@ Splits text into overlapping chunks at sentence boundaries.
 """
 
 import re
+from collections import deque
+from typing import Callable, Iterable, Iterator
+
+# Sentence boundary: whitespace after Hebrew/English punctuation or a newline
+SENTENCE_BOUNDARY = re.compile(r'(?<=[.!?\n।])\s+')
 
 
 def chunk_text(
@@ -21,58 +26,203 @@ def chunk_text(
     Returns:
         List of text chunks.
     """
-    if not text or not text.strip():
-        return []
+    return list(chunk_text_stream([text], chunk_size, overlap_ratio))
+
 
-    text = text.strip()
+def split_sentences(pieces: Iterable[str]) -> Iterator[str]:
+    """Yield stripped, non-empty sentences from a stream of text pieces.
 
-    # Short text → single chunk
-    if len(text) <= chunk_size:
-        return [text]
+    Pieces may break anywhere (mid-word, mid-whitespace); the result is the
+    same as splitting the concatenated text. Only the unfinished sentence is
+    held in memory, and each character is scanned for a boundary once.
+    """
+    pending = ""
+    # Boundaries before this offset were already found; the lookbehind
+    # still sees the character before it
+    scan_from = 0
+    for piece in pieces:
+        if not piece:
+            continue
+        pending += piece
+        start = 0
+        next_scan = len(pending)
+        for match in SENTENCE_BOUNDARY.finditer(pending, scan_from):
+            if match.end() == len(pending):
+                # Whitespace run may continue in the next piece
+                next_scan = match.start()
+                break
+            sentence = pending[start:match.start()].strip()
+            if sentence:
+                yield sentence
+            start = match.end()
+        pending = pending[start:]
+        scan_from = next_scan - start
+
+    sentence = pending.strip()
+    if sentence:
+        yield sentence
+
+
+def stream_chunks(
+    sentences: Iterable[str],
+    chunk_size: int = 500,
+    overlap_ratio: float = 0.2,
+    length_function: Callable[[str], int] = len,
+) -> Iterator[str]:
+    """Greedily pack sentences into overlapping chunks in a single pass.
 
+    Args:
+        sentences: Stripped, non-empty sentences, e.g. from ``split_sentences``.
+        chunk_size: Target chunk size, in units of ``length_function``.
+        overlap_ratio: Fraction of chunk_size to overlap (0.0-0.5).
+        length_function: Size of a string; ``len`` for characters, or a
+            token counter for token-based sizes. Sizes are summed per
+            sentence, with ``length_function(" ")`` per separator.
+
+    Yields:
+        Text chunks. Memory is bounded by one chunk plus the overlap window.
+    """
     overlap = int(chunk_size * overlap_ratio)
+    separator = length_function(" ")
+
+    current: list[str] = []
+    current_size = 0
+    # Most recent sentences that could still be part of an overlap
+    history: deque[tuple[str, int]] = deque()
+    history_size = 0
+
+    for sentence in sentences:
+        size = length_function(sentence)
+
+        if not current:
+            current, current_size = [sentence], size
+        elif current_size + size + separator <= chunk_size:
+            current.append(sentence)
+            current_size += size + separator
+        else:
+            # Chunk is full - emit it
+            yield " ".join(current)
+
+            # Overlap: walk backwards over the preceding sentences
+            overlap_parts: list[str] = []
+            overlap_size = 0
+            for candidate, candidate_size in reversed(history):
+                if candidate_size + overlap_size + separator <= overlap:
+                    overlap_parts.append(candidate)
+                    overlap_size += candidate_size + (separator if len(overlap_parts) > 1 else 0)
+                else:
+                    break
 
-    # Split into sentences (Hebrew/English punctuation + newlines)
-    sentences = re.split(r'(?<=[.!?\n।])\s+', text)
-    # Filter empty
-    sentences = [s.strip() for s in sentences if s.strip()]
+            overlap_parts.reverse()
+            current = overlap_parts + [sentence]
+            current_size = overlap_size + size + (separator if overlap_parts else 0)
 
-    if not sentences:
-        return [text]
+        history.append((sentence, size))
+        history_size += size
+        # Drop sentences too far back to ever fit in the overlap
+        while history and history_size + separator > overlap:
+            history_size -= history.popleft()[1]
 
-    chunks: list[str] = []
-    current_chunk = ""
-    sentence_idx = 0
+    if current:
+        yield " ".join(current)
 
-    while sentence_idx < len(sentences):
-        sentence = sentences[sentence_idx]
 
-        # If adding this sentence stays within chunk_size, add it
-        if not current_chunk:
-            current_chunk = sentence
-            sentence_idx += 1
-        elif len(current_chunk) + len(sentence) + 1 <= chunk_size:
-            current_chunk += " " + sentence
-            sentence_idx += 1
-        else:
-            # Chunk is full - save it
-            chunks.append(current_chunk)
-
-            # Find overlap start: walk backwards from end of current chunk
-            overlap_text = ""
-            for prev_idx in range(sentence_idx - 1, -1, -1):
-                candidate = sentences[prev_idx]
-                if len(candidate) + len(overlap_text) + 1 <= overlap:
-                    overlap_text = candidate + (" " + overlap_text if overlap_text else "")
-                else:
-                    break
+def chunk_text_stream(
+    pieces: Iterable[str],
+    chunk_size: int = 500,
+    overlap_ratio: float = 0.2,
+    length_function: Callable[[str], int] = len,
+) -> Iterator[str]:
+    """Streaming equivalent of ``chunk_text`` over text arriving in pieces.
+
+    With the default ``length_function`` the chunks are identical to
+    ``chunk_text`` on the concatenated text, including returning short text
+    (at most ``chunk_size`` after stripping) unchanged as a single chunk.
+    Runs in linear time with memory bounded by roughly one chunk.
+    """
+    pieces = iter(pieces)
+
+    # Buffer just enough to tell whether the whole text fits in one chunk
+    head = ""
+    for piece in pieces:
+        head += piece
+        if length_function(head.strip()) > chunk_size:
+            break
+    else:
+        text = head.strip()
+        if text:
+            yield text
+        return
+
+    def remaining():
+        yield head
+        yield from pieces
+
+    yield from stream_chunks(
+        split_sentences(remaining()), chunk_size, overlap_ratio, length_function
+    )
+
+
+def chunk_segments(
+    segments: list[dict],
+    window_seconds: float = 60.0,
+    overlap_seconds: float = 10.0,
+    max_size: int = 800,
+    length_function: Callable[[str], int] = len,
+) -> list[dict]:
+    """Group timestamped transcription segments into overlapping time windows.
 
-            current_chunk = overlap_text + (" " + sentence if overlap_text else sentence)
-            sentence_idx += 1
+    Args:
+        segments: Whisper segments with ``start``, ``end`` (seconds) and ``text``.
+        window_seconds: Maximum time span of a chunk.
+        overlap_seconds: Trailing time carried into the next chunk.
+        max_size: Maximum chunk size, in units of ``length_function``
+            (characters by default).
+        length_function: Size of a string, e.g. a token counter.
 
-    # Don't forget the last chunk
-    if current_chunk:
-        chunks.append(current_chunk)
+    Returns:
+        List of ``{"text", "start", "end"}`` dicts, in recording order.
+    """
+    segments = [s for s in segments if s.get("text", "").strip()]
+
+    chunks: list[dict] = []
+    window: list[dict] = []
+
+    separator = length_function(" ")
+
+    def size(items: list[dict]) -> int:
+        return (
+            sum(length_function(s["text"].strip()) for s in items)
+            + separator * max(len(items) - 1, 0)
+        )
+
+    def emit(items: list[dict]) -> None:
+        chunks.append({
+            "text": " ".join(s["text"].strip() for s in items),
+            "start": items[0]["start"],
+            "end": items[-1]["end"],
+        })
+
+    for segment in segments:
+        candidate = window + [segment]
+        if window and (
+            segment["end"] - window[0]["start"] > window_seconds
+            or size(candidate) > max_size
+        ):
+            emit(window)
+            # Carry the segments that start inside the overlap period
+            overlap_from = window[-1]["end"] - overlap_seconds
+            window = [s for s in window if s["start"] >= overlap_from]
+            while window and (
+                segment["end"] - window[0]["start"] > window_seconds
+                or size(window + [segment]) > max_size
+            ):
+                window.pop(0)
+            candidate = window + [segment]
+        window = candidate
+
+    if window:
+        emit(window)
 
     return chunks
 
@@ -0,0 +1,120 @@
+"""
+Compare character- and token-sized chunking on the indexed corpus.
+
+Fetches treatment summaries and transcriptions from Supabase, chunks each
+document both ways and reports chunk counts, token statistics and the time
+to embed each set of chunks.
+
+Usage:
+  EMBEDDING_TOKENIZER_PATH=/models/nomic-embed-text/tokenizer.json \\
+      python chunking_report.py [--limit 200] [--no-embed] [--batch-size 32]
+"""
+
+import argparse
+import os
+import statistics
+import time
+from pathlib import Path
+
+from dotenv import load_dotenv
+from supabase import create_client
+
+from chunker import (
+    chunk_text_stream,
+    prepare_treatment_summary_text,
+    prepare_transcription_text,
+)
+from embedder import embed_texts
+from indexer import _fetch_all_rows
+from token_counter import CHUNK_SIZES, count_tokens, tokens_available
+
+load_dotenv(Path(__file__).parent / ".env")
+
+CORPUS = {
+    "treatment_summary": (
+        "treatment_summaries",
+        "id, diagnosis, treatment_notes, prescription, follow_up_required, "
+        "follow_up_date, created_at, patient:users!treatment_summaries_patient_id_fkey(full_name)",
+        prepare_treatment_summary_text,
+    ),
+    "transcription": (
+        "transcriptions",
+        "id, transcription_text, created_at, "
+        "patient:users!transcriptions_patient_id_fkey(full_name)",
+        prepare_transcription_text,
+    ),
+}
+
+
+def chunk_corpus(texts: list[str], chunk_size: int, length_function) -> list[str]:
+    chunks: list[str] = []
+    for text in texts:
+        chunks.extend(chunk_text_stream(
+            [text], chunk_size=chunk_size, overlap_ratio=0.2, length_function=length_function,
+        ))
+    return chunks
+
+
+def time_embedding(chunks: list[str], batch_size: int) -> float:
+    start = time.perf_counter()
+    for i in range(0, len(chunks), batch_size):
+        embed_texts(chunks[i:i + batch_size])
+    return time.perf_counter() - start
+
+
+def describe(name: str, chunks: list[str], max_tokens: int, embed_seconds: float | None) -> dict:
+    tokens = [count_tokens(c) for c in chunks] or [0]
+    row = {
+        "mode": name,
+        "chunks": len(chunks),
+        "mean_tokens": round(statistics.mean(tokens), 1),
+        "max_tokens": max(tokens),
+        f"over_{max_tokens}": sum(t > max_tokens for t in tokens),
+    }
+    if embed_seconds is not None:
+        row["embed_seconds"] = round(embed_seconds, 2)
+    return row
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--limit", type=int, default=0, help="documents per type (0 = all)")
+    parser.add_argument("--no-embed", action="store_true", help="skip embedding timings")
+    parser.add_argument("--batch-size", type=int, default=32, help="texts per embed call")
+    parser.add_argument("--max-tokens", type=int, default=512,
+                        help="report chunks longer than this many tokens")
+    args = parser.parse_args()
+
+    if not tokens_available():
+        raise SystemExit("Set EMBEDDING_TOKENIZER_PATH to the embedding model's tokenizer.json")
+
+    supabase = create_client(os.environ["SUPABASE_URL"], os.environ["SUPABASE_SERVICE_KEY"])
+
+    for kind, (table, select, prepare) in CORPUS.items():
+        rows = _fetch_all_rows(supabase, table, select)
+        if args.limit:
+            rows = rows[:args.limit]
+        texts = [prepare(row) for row in rows]
+        print(f"\n{kind}: {len(texts)} documents")
+
+        results = []
+        for unit, length_function in (("chars", len), ("tokens", count_tokens)):
+            chunk_size = CHUNK_SIZES[kind][unit]
+            chunks = chunk_corpus(texts, chunk_size, length_function)
+            embed_seconds = None if args.no_embed else time_embedding(chunks, args.batch_size)
+            results.append(describe(f"{chunk_size} {unit}", chunks, args.max_tokens, embed_seconds))
+
+        for row in results:
+            print("  " + "  ".join(f"{key}={value}" for key, value in row.items()))
+
+        chars, tokens = results
+        if chars["chunks"]:
+            change = (tokens["chunks"] - chars["chunks"]) / chars["chunks"] * 100
+            print(f"  chunk count change: {change:+.1f}%")
+        if not args.no_embed and chars.get("embed_seconds"):
+            change = (tokens["embed_seconds"] - chars["embed_seconds"]) / chars["embed_seconds"] * 100
+            print(f"  embedding time change: {change:+.1f}%")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,21 +1,158 @@
 """
-Embedding module using Ollama's nomic-embed-text model.
+Embedding module with pluggable backends for nomic-embed-text.
 Produces 768-dimensional vectors for text chunks.
+
+Backends (EMBEDDING_BACKEND):
+  ollama  - Ollama HTTP API (default)
+  onnx    - in-process CPU inference with ONNX Runtime, weights from a local path
+  fake    - deterministic hashed bag-of-words vectors, for tests and benchmarks
 """
 
+import hashlib
+import math
 import os
 import logging
+import re
+from functools import lru_cache
+from pathlib import Path
 
-import ollama
+from ollama_pool import pool, KEEP_ALIVE
 
 logger = logging.getLogger("rag_server")
 
+EMBEDDING_BACKEND = os.environ.get("EMBEDDING_BACKEND", "ollama")
 EMBEDDING_MODEL = os.environ.get("OLLAMA_EMBEDDING_MODEL", "nomic-embed-text")
-OLLAMA_HOST = os.environ.get("OLLAMA_HOST", "http://localhost:11434")
+# Directory with model.onnx and tokenizer.json (e.g. an ONNX export of nomic-embed-text-v1.5)
+EMBEDDING_ONNX_PATH = os.environ.get("EMBEDDING_ONNX_PATH", "")
+EMBEDDING_ONNX_THREADS = int(os.environ.get("EMBEDDING_ONNX_THREADS", "0"))  # 0 = ORT default
+EMBEDDING_MAX_TOKENS = int(os.environ.get("EMBEDDING_MAX_TOKENS", "2048"))
+EMBEDDING_BATCH_SIZE = int(os.environ.get("EMBEDDING_BATCH_SIZE", "16"))
+EMBEDDING_DIMENSIONS = 768
+
+
+class OllamaBackend:
+    """Embeddings from Ollama hosts with the embed role (see ollama_pool)."""
+
+    name = "ollama"
+
+    def __init__(self, model: str = EMBEDDING_MODEL):
+        self.model = model
+
+    def embed(self, texts: list[str]) -> list[list[float]]:
+        response = pool.call("embed", self.model, lambda host: host.client.embed(
+            model=self.model, input=texts, keep_alive=KEEP_ALIVE,
+        ))
+        return response.embeddings
+
+
+class OnnxBackend:
+    """In-process CPU embeddings with ONNX Runtime.
+
+    Mean-pools the last hidden state over the attention mask and
+    L2-normalizes, matching the vectors Ollama returns for the same weights.
+    """
+
+    name = "onnx"
+
+    def __init__(
+        self,
+        model_dir: str = EMBEDDING_ONNX_PATH,
+        threads: int = EMBEDDING_ONNX_THREADS,
+        max_tokens: int = EMBEDDING_MAX_TOKENS,
+        batch_size: int = EMBEDDING_BATCH_SIZE,
+    ):
+        if not model_dir:
+            raise RuntimeError("EMBEDDING_ONNX_PATH is not set")
+
+        import numpy as np
+        import onnxruntime as ort
+        from tokenizers import Tokenizer
+
+        self._np = np
+        model_dir = Path(model_dir)
+
+        options = ort.SessionOptions()
+        if threads:
+            options.intra_op_num_threads = threads
+        self.session = ort.InferenceSession(
+            str(model_dir / "model.onnx"), options, providers=["CPUExecutionProvider"]
+        )
+        self.input_names = {i.name for i in self.session.get_inputs()}
+
+        self.tokenizer = Tokenizer.from_file(str(model_dir / "tokenizer.json"))
+        self.tokenizer.enable_truncation(max_length=max_tokens)
+        self.tokenizer.enable_padding()
+        self.batch_size = batch_size
+        logger.info(f"Loaded ONNX embedding model from {model_dir}")
+
+    def embed(self, texts: list[str]) -> list[list[float]]:
+        np = self._np
+        vectors: list[list[float]] = []
+        for i in range(0, len(texts), self.batch_size):
+            encodings = self.tokenizer.encode_batch(texts[i:i + self.batch_size])
+            input_ids = np.array([e.ids for e in encodings], dtype=np.int64)
+            attention_mask = np.array([e.attention_mask for e in encodings], dtype=np.int64)
+
+            inputs = {"input_ids": input_ids, "attention_mask": attention_mask}
+            if "token_type_ids" in self.input_names:
+                inputs["token_type_ids"] = np.zeros_like(input_ids)
+
+            hidden = self.session.run(None, inputs)[0]
+            mask = attention_mask[:, :, None].astype(hidden.dtype)
+            pooled = (hidden * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+            pooled /= np.clip(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12, None)
+            vectors.extend(pooled.tolist())
+        return vectors
+
+
+class FakeBackend:
+    """Deterministic embeddings without a model.
+
+    Words are hashed into signed buckets (feature hashing), so the same text
+    always maps to the same unit vector and texts sharing words are similar.
+    """
+
+    name = "fake"
+
+    def __init__(self, dimensions: int = EMBEDDING_DIMENSIONS):
+        self.dimensions = dimensions
+
+    def embed_one(self, text: str) -> list[float]:
+        vector = [0.0] * self.dimensions
+        for word in re.findall(r"\w+", text.lower()):
+            digest = hashlib.blake2b(word.encode(), digest_size=8).digest()
+            bucket = int.from_bytes(digest[:4], "little") % self.dimensions
+            vector[bucket] += 1.0 if digest[4] & 1 else -1.0
+
+        norm = math.sqrt(sum(v * v for v in vector))
+        if norm == 0:
+            vector[0] = 1.0
+            return vector
+        return [v / norm for v in vector]
+
+    def embed(self, texts: list[str]) -> list[list[float]]:
+        return [self.embed_one(text) for text in texts]
+
+
+BACKENDS = {
+    "ollama": OllamaBackend,
+    "onnx": OnnxBackend,
+    "fake": FakeBackend,
+}
+
+
+@lru_cache(maxsize=None)
+def get_backend(name: str = EMBEDDING_BACKEND):
+    """The configured embedding backend, created once per process."""
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown EMBEDDING_BACKEND: {name} (expected one of {', '.join(BACKENDS)})")
+    backend = BACKENDS[name]()
+    logger.info(f"Embedding backend: {backend.name}")
+    return backend
 
 
 def embed_texts(texts: list[str]) -> list[list[float]]:
-    """Generate embeddings for a list of texts using Ollama.
+    """Generate embeddings for a list of texts with the configured backend.
 
     Args:
         texts: List of text strings to embed.
@@ -30,9 +167,7 @@ def embed_texts(texts: list[str]) -> list[list[float]]:
         return []
 
     try:
-        client = ollama.Client(host=OLLAMA_HOST)
-        response = client.embed(model=EMBEDDING_MODEL, input=texts)
-        return response.embeddings
+        return get_backend().embed(texts)
     except Exception as e:
         logger.error(f"Embedding error: {e}")
         raise RuntimeError(f"Failed to generate embeddings: {e}") from e
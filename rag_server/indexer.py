@@ -4,25 +4,75 @@ Chunks documents, generates embeddings, and stores in Supabase pgvector.
 """
 
 import logging
+import time
 
 from supabase import Client
 
 from chunker import (
-    chunk_text,
+    chunk_text_stream,
+    chunk_segments,
     prepare_treatment_summary_text,
     prepare_transcription_text,
     prepare_patient_text,
 )
-from embedder import embed_texts
+from embedder import embed_texts, EMBEDDING_MODEL
+import metrics
+from token_counter import chunk_sizing
 
 logger = logging.getLogger("rag_server")
 
 
-def _delete_existing_chunks(supabase: Client, source_table: str, source_id: str) -> None:
-    """Delete existing chunks for a source (idempotent re-index)."""
-    supabase.table("document_chunks").delete().eq(
+def _chunk(text: str, kind: str) -> list[str]:
+    """Chunk text with the configured size unit (characters or model tokens)."""
+    chunk_size, length_function = chunk_sizing(kind)
+    return list(chunk_text_stream(
+        [text], chunk_size=chunk_size, overlap_ratio=0.2, length_function=length_function,
+    ))
+
+
+def _embed_chunks(chunks: list[str]) -> list[list[float]]:
+    """Embed a document's chunks, recording chunk count and throughput."""
+    start = time.perf_counter()
+    embeddings = embed_texts(chunks)
+    elapsed = time.perf_counter() - start
+    metrics.observe(metrics.INDEX_CHUNKS, len(chunks), EMBEDDING_MODEL)
+    if elapsed > 0:
+        metrics.observe(metrics.INDEX_EMBEDDINGS_PER_SECOND, len(chunks) / elapsed, EMBEDDING_MODEL)
+    return embeddings
+
+
+def _delete_existing_chunks(
+    supabase: Client, source_table: str, source_id: str
+) -> set[tuple[str, str]]:
+    """Delete existing chunks for a source (idempotent re-index).
+
+    Returns the (doctor_id, patient_id) pairs the deleted chunks belonged to.
+    """
+    result = supabase.table("document_chunks").delete().eq(
         "source_table", source_table
     ).eq("source_id", source_id).execute()
+    return _patient_pairs(result.data)
+
+
+def _patient_pairs(rows: list[dict] | None) -> set[tuple[str, str]]:
+    return {
+        (row["doctor_id"], row["patient_id"])
+        for row in rows or []
+        if row.get("patient_id")
+    }
+
+
+def _refresh_centroids(supabase: Client, pairs: set[tuple[str, str]]) -> None:
+    """Recompute the per-patient centroid vectors used for two-stage retrieval."""
+    for doctor_id, patient_id in pairs:
+        try:
+            supabase.rpc(
+                "refresh_patient_centroids",
+                {"p_doctor_id": doctor_id, "p_patient_id": patient_id},
+            ).execute()
+        except Exception as e:
+            # Search falls back to the flat chunk search without centroids
+            logger.warning(f"Centroid refresh failed for patient {patient_id}: {e}")
 
 
 def _insert_chunks(
@@ -34,10 +84,16 @@ def _insert_chunks(
     chunks: list[str],
     embeddings: list[list[float]],
     metadata: dict,
+    chunk_metadata: list[dict] | None = None,
 ) -> int:
-    """Insert chunk rows into document_chunks table. Returns count inserted."""
+    """Insert chunk rows into document_chunks table. Returns count inserted.
+
+    ``chunk_metadata`` optionally adds per-chunk fields (e.g. segment times)
+    on top of the shared ``metadata``.
+    """
     rows = []
     for i, (chunk, embedding) in enumerate(zip(chunks, embeddings)):
+        row_metadata = {**metadata, **chunk_metadata[i]} if chunk_metadata else metadata
         row = {
             "source_table": source_table,
             "source_id": source_id,
@@ -46,7 +102,7 @@ def _insert_chunks(
             "patient_id": patient_id,
             "content": chunk,
             "embedding": embedding,
-            "metadata": metadata,
+            "metadata": row_metadata,
         }
         rows.append(row)
 
@@ -80,12 +136,12 @@ def index_treatment_summary(supabase: Client, summary_id: str) -> int:
         return 0
 
     text = prepare_treatment_summary_text(summary)
-    chunks = chunk_text(text, chunk_size=500, overlap_ratio=0.2)
+    chunks = _chunk(text, "treatment_summary")
 
     if not chunks:
         return 0
 
-    embeddings = embed_texts(chunks)
+    embeddings = _embed_chunks(chunks)
 
     patient_name = "לא ידוע"
     if summary.get("patient") and isinstance(summary["patient"], dict):
@@ -98,7 +154,7 @@ def index_treatment_summary(supabase: Client, summary_id: str) -> int:
     }
 
     # Delete old chunks then insert new
-    _delete_existing_chunks(supabase, "treatment_summaries", summary_id)
+    pairs = _delete_existing_chunks(supabase, "treatment_summaries", summary_id)
     count = _insert_chunks(
         supabase,
         source_table="treatment_summaries",
@@ -109,6 +165,9 @@ def index_treatment_summary(supabase: Client, summary_id: str) -> int:
         embeddings=embeddings,
         metadata=metadata,
     )
+    if summary.get("patient_id"):
+        pairs.add((summary["doctor_id"], summary["patient_id"]))
+    _refresh_centroids(supabase, pairs)
 
     logger.info(f"Indexed treatment summary {summary_id}: {count} chunks")
     return count
@@ -134,12 +193,12 @@ def index_transcription(supabase: Client, transcription_id: str) -> int:
 
     text = prepare_transcription_text(transcription)
     # Larger chunks for transcriptions since they tend to be longer
-    chunks = chunk_text(text, chunk_size=800, overlap_ratio=0.2)
+    chunks = _chunk(text, "transcription")
 
     if not chunks:
         return 0
 
-    embeddings = embed_texts(chunks)
+    embeddings = _embed_chunks(chunks)
 
     patient_name = "לא ידוע"
     if transcription.get("patient") and isinstance(transcription["patient"], dict):
@@ -151,7 +210,7 @@ def index_transcription(supabase: Client, transcription_id: str) -> int:
         "date": transcription.get("created_at", "")[:10],
     }
 
-    _delete_existing_chunks(supabase, "transcriptions", transcription_id)
+    pairs = _delete_existing_chunks(supabase, "transcriptions", transcription_id)
     count = _insert_chunks(
         supabase,
         source_table="transcriptions",
@@ -162,11 +221,107 @@ def index_transcription(supabase: Client, transcription_id: str) -> int:
         embeddings=embeddings,
         metadata=metadata,
     )
+    if transcription.get("patient_id"):
+        pairs.add((transcription["doctor_id"], transcription["patient_id"]))
+    _refresh_centroids(supabase, pairs)
 
     logger.info(f"Indexed transcription {transcription_id}: {count} chunks")
     return count
 
 
+def fetch_transcription(supabase: Client, transcription_id: str) -> dict | None:
+    """The saved transcription row, with its job and patient name, or None."""
+    result = (
+        supabase.table("transcriptions")
+        .select(
+            "id, doctor_id, patient_id, job_id, created_at, "
+            "patient:users!transcriptions_patient_id_fkey(full_name)"
+        )
+        .eq("id", transcription_id)
+        .limit(1)
+        .execute()
+    )
+    return result.data[0] if result.data else None
+
+
+def index_transcription_result(
+    supabase: Client,
+    transcription: dict,
+    transcription_text: str,
+    segments: list[dict] | None = None,
+) -> int:
+    """Index a transcription delivered directly by the transcription service.
+
+    ``transcription`` is the saved row (see ``fetch_transcription``); doctor,
+    patient and date come from it, only the text and segments from the
+    caller. With segments, chunks follow time windows of the recording and
+    carry ``start``/``end`` (seconds) in their metadata; otherwise the text
+    is chunked the same way as ``index_transcription``.
+    """
+    transcription_id = transcription["id"]
+    doctor_id = transcription["doctor_id"]
+    patient_id = transcription.get("patient_id")
+    created_at = transcription.get("created_at")
+    patient_name = (transcription.get("patient") or {}).get("full_name") or "לא ידוע"
+    header = prepare_transcription_text({
+        "patient": {"full_name": patient_name},
+        "created_at": created_at,
+    })
+
+    chunk_metadata = None
+    if segments:
+        max_size, length_function = chunk_sizing("transcription")
+        # Leave room for the header (and its newline) added to the first chunk
+        max_size -= length_function(header) + length_function("\n")
+        windows = chunk_segments(
+            segments, window_seconds=60, overlap_seconds=10,
+            max_size=max_size, length_function=length_function,
+        )
+        chunks = [w["text"] for w in windows]
+        if chunks:
+            chunks[0] = f"{header}\n{chunks[0]}"
+        chunk_metadata = [
+            {"start": round(w["start"], 2), "end": round(w["end"], 2)} for w in windows
+        ]
+    else:
+        text = prepare_transcription_text({
+            "patient": {"full_name": patient_name},
+            "created_at": created_at,
+            "transcription_text": transcription_text,
+        })
+        chunks = _chunk(text, "transcription")
+
+    if not chunks:
+        return 0
+
+    embeddings = _embed_chunks(chunks)
+
+    metadata = {
+        "type": "transcription",
+        "patient_name": patient_name,
+        "date": (created_at or "")[:10],
+    }
+
+    pairs = _delete_existing_chunks(supabase, "transcriptions", transcription_id)
+    count = _insert_chunks(
+        supabase,
+        source_table="transcriptions",
+        source_id=transcription_id,
+        doctor_id=doctor_id,
+        patient_id=patient_id,
+        chunks=chunks,
+        embeddings=embeddings,
+        metadata=metadata,
+        chunk_metadata=chunk_metadata,
+    )
+    if patient_id:
+        pairs.add((doctor_id, patient_id))
+    _refresh_centroids(supabase, pairs)
+
+    logger.info(f"Indexed transcription {transcription_id} from handoff: {count} chunks")
+    return count
+
+
 def index_patient_for_doctor(
     supabase: Client, patient_id: str, doctor_id: str
 ) -> int:
@@ -188,7 +343,7 @@ def index_patient_for_doctor(
     if not text:
         return 0
 
-    embeddings = embed_texts([text])
+    embeddings = _embed_chunks([text])
 
     metadata = {
         "type": "patient_info",
@@ -211,6 +366,7 @@ def index_patient_for_doctor(
         embeddings=embeddings,
         metadata=metadata,
     )
+    _refresh_centroids(supabase, {(doctor_id, patient_id)})
 
     logger.info(f"Indexed patient {patient_id} for doctor {doctor_id}")
     return count
@@ -8,28 +8,48 @@ Environment Variables:
   SUPABASE_URL              - Supabase project URL
   SUPABASE_SERVICE_KEY      - Supabase service role key (also used as internal API key)
   OLLAMA_MODEL              - Ollama LLM model (default: llama3.2:3b)
+  OLLAMA_HOST               - Ollama server (default: http://localhost:11434)
+  OLLAMA_KEEP_ALIVE         - keep_alive sent with every Ollama call (default: 1h)
+  OLLAMA_HOSTS              - Several Ollama servers with roles, e.g.
+                              http://a:11434=both,http://b:11434=generate
   OLLAMA_EMBEDDING_MODEL    - Ollama embedding model (default: nomic-embed-text)
+  EMBEDDING_BACKEND         - Embedding backend: ollama (default), onnx or fake
+  EMBEDDING_ONNX_PATH       - Directory with model.onnx and tokenizer.json for the onnx backend
+  RAG_TWO_STAGE             - Shortlist patients by centroid before chunk search (default: false)
+  RAG_PATIENT_SHORTLIST     - Patients kept by the first stage (default: 5)
+  RAG_CENTROID_SOURCE       - Centroids the shortlist ranks on: * for all documents (default)
+                              or one source table, e.g. treatment_summaries
+  RAG_PROMPT_MODE           - Fixed prefix as Ollama system prompt (system, default) or inline
+  CHUNK_SIZE_UNIT           - Chunk size unit: chars (default) or tokens
+  EMBEDDING_TOKENIZER_PATH  - tokenizer.json of the embedding model, for token-sized chunks
+  RAG_PROFILING_ENABLED     - Allow POST /admin/profile to sample requests with cProfile (default: false)
+  RAG_PROFILE_DIR           - Where sampled profiles are written (default: /tmp/rag_profiles)
 """
 
 import asyncio
 import json
 import os
 import logging
+import time
 from datetime import datetime
 from pathlib import Path
 
 from dotenv import load_dotenv
 from fastapi import FastAPI, HTTPException, Request, BackgroundTasks
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import StreamingResponse
+from fastapi.responses import Response, StreamingResponse
 from pydantic import BaseModel
 from supabase import create_client, Client
-import ollama
-
-from embedder import embed_single
+from embedder import embed_single, embed_texts, EMBEDDING_BACKEND, EMBEDDING_MODEL
+from ollama_pool import pool, KEEP_ALIVE
+from ollama_residency import ResidencyManager
+import metrics
+import tracing
 from indexer import (
     index_treatment_summary,
     index_transcription,
+    index_transcription_result,
+    fetch_transcription,
     index_patient_for_doctor,
     reindex_all,
 )
@@ -40,12 +60,21 @@ load_dotenv(Path(__file__).parent / ".env")
 # Logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger("rag_server")
+logger.addFilter(tracing.TraceLogFilter())
 
 # Environment
 SUPABASE_URL = os.environ.get("SUPABASE_URL", "")
 SUPABASE_SERVICE_KEY = os.environ.get("SUPABASE_SERVICE_KEY", "")
 OLLAMA_MODEL = os.environ.get("OLLAMA_MODEL", "llama3.2:3b")
-OLLAMA_HOST = os.environ.get("OLLAMA_HOST", "http://localhost:11434")
+TWO_STAGE_RETRIEVAL = os.environ.get("RAG_TWO_STAGE", "false").lower() in ("1", "true", "yes")
+PATIENT_SHORTLIST = int(os.environ.get("RAG_PATIENT_SHORTLIST", "5"))
+# '*' ranks patients on all their documents, or a source table to rank on that source only
+CENTROID_SOURCE = os.environ.get("RAG_CENTROID_SOURCE", "*")
+# "system": fixed instructions in Ollama's system field; "inline": at the start of the prompt
+PROMPT_MODE = os.environ.get("RAG_PROMPT_MODE", "system")
+BATCH_MAX_QUERIES = int(os.environ.get("RAG_BATCH_MAX_QUERIES", "500"))
+BATCH_SEARCH_CONCURRENCY = int(os.environ.get("RAG_BATCH_SEARCH_CONCURRENCY", "8"))
+BATCH_GENERATION_CONCURRENCY = int(os.environ.get("RAG_BATCH_GENERATION_CONCURRENCY", "2"))
 
 if not SUPABASE_URL or not SUPABASE_SERVICE_KEY:
     logger.warning(
@@ -55,44 +84,40 @@ if not SUPABASE_URL or not SUPABASE_SERVICE_KEY:
 # Supabase client (service role - bypasses RLS for fetching data)
 supabase: Client = create_client(SUPABASE_URL, SUPABASE_SERVICE_KEY)
 
-# Model warmup state
-model_ready = False
+# Shared by all batch requests so offline work can't crowd out interactive queries
+batch_generation_slots = asyncio.Semaphore(BATCH_GENERATION_CONCURRENCY)
+
+# Keep the LLM (and the embedding model, when Ollama serves it) loaded
+residency = ResidencyManager(
+    pool,
+    {
+        OLLAMA_MODEL: "generate",
+        **({EMBEDDING_MODEL: "embed"} if EMBEDDING_BACKEND == "ollama" else {}),
+    },
+)
 
 # FastAPI app
 app = FastAPI(title="MedClinic RAG Server", version="2.0.0")
 
+app.add_middleware(metrics.MetricsMiddleware, model=OLLAMA_MODEL)
+app.add_middleware(tracing.TraceMiddleware)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["Server-Timing", tracing.TRACE_HEADER],
 )
 
 
-async def _warmup_ollama():
-    """Pre-load the Ollama model into RAM on startup. Retries until Ollama is reachable."""
-    global model_ready
-    await asyncio.sleep(5)  # wait for server to fully initialize
-    attempt = 0
-    while not model_ready:
-        attempt += 1
-        try:
-            logger.info(f"Warming up Ollama model: {OLLAMA_MODEL} (attempt {attempt}, host: {OLLAMA_HOST})...")
-            client = ollama.Client(host=OLLAMA_HOST)
-            client.generate(model=OLLAMA_MODEL, prompt="היי", stream=False)
-            logger.info("LLM model warmed up, pre-loading embedding model...")
-            embed_single("warmup")
-            model_ready = True
-            logger.info("Ollama model is ready.")
-        except Exception as e:
-            logger.warning(f"Ollama warmup attempt {attempt} failed: {e}. Retrying in 30s...")
-            await asyncio.sleep(30)
-
-
 @app.on_event("startup")
 async def startup_event():
-    asyncio.create_task(_warmup_ollama())
+    pool.start_health_checks()
+    residency.start()
+    if EMBEDDING_BACKEND != "ollama":
+        # Load the in-process embedding model before the first query
+        asyncio.create_task(asyncio.to_thread(embed_single, "warmup"))
 
 
 # Models
@@ -102,9 +127,24 @@ class RAGQueryRequest(BaseModel):
     doctor_id: str
 
 
+class RAGBatchQuery(BaseModel):
+    id: str | None = None  # echoed back to match results to queries
+    query: str
+    top_k: int = 5
+    doctor_id: str
+
+
+class RAGBatchRequest(BaseModel):
+    queries: list[RAGBatchQuery]
+    generate: bool = True  # False returns sources only
+
+
 class RAGSource(BaseModel):
     patient_name: str
     date: str
+    # Position in the recording (seconds), for transcription chunks indexed with segments
+    start: float | None = None
+    end: float | None = None
 
 
 class RAGQueryResponse(BaseModel):
@@ -112,6 +152,8 @@ class RAGQueryResponse(BaseModel):
     sources: list[RAGSource]
     total_summaries_scanned: int
     model: str
+    # Prompt tokens evaluated/reused and prefill time for the generate call
+    prefill: dict | None = None
 
 
 class IndexRequest(BaseModel):
@@ -121,6 +163,24 @@ class IndexRequest(BaseModel):
     patient_id: str | None = None
 
 
+class TranscriptionSegment(BaseModel):
+    start: float
+    end: float
+    text: str
+
+
+class TranscriptionIndexRequest(BaseModel):
+    """Finished transcription handed over by the transcription service.
+
+    Doctor, patient and date are read from the saved row, which must have
+    been saved from ``job_id``.
+    """
+    transcription_id: str
+    job_id: str
+    transcription_text: str
+    segments: list[TranscriptionSegment] = []
+
+
 class IndexResponse(BaseModel):
     status: str
     chunks_created: int
@@ -138,25 +198,91 @@ def verify_internal_key(request: Request) -> None:
         raise HTTPException(status_code=401, detail="Unauthorized")
 
 
+def shortlist_patients(query_embedding: list[float], doctor_id: str) -> list[str]:
+    """Stage one: the doctor's patients whose centroid is closest to the query.
+
+    Returns an empty list if centroids are unavailable (migration not applied
+    or not yet backfilled), in which case the flat search is used.
+    """
+    try:
+        with tracing.span("shortlist"), \
+                metrics.timed(metrics.SEARCH_SECONDS, EMBEDDING_MODEL, rpc="match_patient_centroids"):
+            result = supabase.rpc(
+                "match_patient_centroids",
+                {
+                    "query_embedding": query_embedding,
+                    "filter_doctor_id": doctor_id,
+                    "match_count": PATIENT_SHORTLIST,
+                    "filter_source_table": CENTROID_SOURCE,
+                },
+            ).execute()
+    except Exception as e:
+        logger.warning(f"Patient shortlist unavailable, searching all chunks: {e}")
+        return []
+    return [row["patient_id"] for row in result.data or []]
+
+
 def vector_search(query: str, doctor_id: str, top_k: int = 10) -> list[dict]:
     """Embed the query and search document_chunks via pgvector."""
-    query_embedding = embed_single(query)
-
-    result = supabase.rpc(
-        "match_document_chunks",
-        {
-            "query_embedding": query_embedding,
-            "match_count": top_k,
-            "filter_doctor_id": doctor_id,
-            "similarity_threshold": 0.3,
-        },
-    ).execute()
+    with tracing.span("embed"), metrics.timed(metrics.EMBED_SECONDS, EMBEDDING_MODEL):
+        query_embedding = embed_single(query)
+    return search_chunks(query_embedding, doctor_id, top_k)
+
+
+def search_chunks(query_embedding: list[float], doctor_id: str, top_k: int = 10) -> list[dict]:
+    """Search document_chunks for an already embedded query.
+
+    With two-stage retrieval, patients are shortlisted by centroid first and
+    the chunk search is restricted to them (and to chunks with no patient).
+    If that finds fewer than ``top_k`` chunks above the threshold - typically
+    a question spanning more patients than the shortlist - the flat search
+    over all the doctor's chunks is used instead.
+    """
+    if TWO_STAGE_RETRIEVAL:
+        patient_ids = shortlist_patients(query_embedding, doctor_id)
+        if patient_ids:
+            rpc = "match_document_chunks_for_patients"
+            with tracing.span("search"), metrics.timed(metrics.SEARCH_SECONDS, EMBEDDING_MODEL, rpc=rpc):
+                result = supabase.rpc(
+                    rpc,
+                    {
+                        "query_embedding": query_embedding,
+                        "filter_doctor_id": doctor_id,
+                        "filter_patient_ids": patient_ids,
+                        "match_count": top_k,
+                        "similarity_threshold": 0.3,
+                    },
+                ).execute()
+            if len(result.data or []) >= top_k:
+                return result.data
+            logger.info(
+                f"Shortlist of {len(patient_ids)} patients gave {len(result.data or [])}/{top_k} "
+                f"chunks, searching all chunks"
+            )
+
+    with tracing.span("search"), \
+            metrics.timed(metrics.SEARCH_SECONDS, EMBEDDING_MODEL, rpc="match_document_chunks"):
+        result = supabase.rpc(
+            "match_document_chunks",
+            {
+                "query_embedding": query_embedding,
+                "match_count": top_k,
+                "filter_doctor_id": doctor_id,
+                "similarity_threshold": 0.3,
+            },
+        ).execute()
 
     return result.data or []
 
 
+def _format_offset(seconds: float) -> str:
+    minutes, secs = divmod(int(seconds), 60)
+    return f"{minutes:02d}:{secs:02d}"
+
+
 def build_context_from_chunks(chunks: list[dict]) -> tuple[str, list[RAGSource]]:
     """Build context string and source list from vector search results."""
+    build_start = time.perf_counter()
     context_parts = []
     sources: list[RAGSource] = []
     seen_sources: set[str] = set()
@@ -173,10 +299,17 @@ def build_context_from_chunks(chunks: list[dict]) -> tuple[str, list[RAGSource]]
             "patient_info": "פרטי מטופל",
         }.get(chunk_type, "מסמך")
 
+        start, end = meta.get("start"), meta.get("end")
+        time_line = (
+            f"זמן בהקלטה: {_format_offset(start)}-{_format_offset(end)}\n"
+            if start is not None and end is not None else ""
+        )
+
         context_parts.append(
             f"--- {type_label} #{i} (רלוונטיות: {chunk.get('similarity', 0):.2f}) ---\n"
             f"מטופל: {patient_name}\n"
             f"תאריך: {date_str}\n"
+            f"{time_line}"
             f"{chunk['content']}\n"
         )
 
@@ -184,86 +317,207 @@ def build_context_from_chunks(chunks: list[dict]) -> tuple[str, list[RAGSource]]
         source_key = chunk.get("source_id", str(i))
         if source_key not in seen_sources:
             seen_sources.add(source_key)
-            sources.append(RAGSource(patient_name=patient_name, date=date_str))
-
-    return "\n".join(context_parts), sources
+            sources.append(RAGSource(patient_name=patient_name, date=date_str, start=start, end=end))
 
+    context = "\n".join(context_parts)
+    metrics.observe(metrics.CONTEXT_CHARS, len(context), OLLAMA_MODEL)
+    tracing.record("context", time.perf_counter() - build_start)
+    return context, sources
 
-def _build_rag_prompt(query: str, context: str) -> str:
-    return f"""אתה עוזר רפואי חכם. ענה על השאלה בהתבסס על המידע הרפואי הבא:
 
-{context}
-
-שאלת הרופא: {query}
+# Fixed instructions, sent first and byte-identical on every request so
+# Ollama can reuse their evaluated tokens instead of prefilling them again
+RAG_SYSTEM_PREFIX = """אתה עוזר רפואי חכם. ענה על שאלת הרופא בהתבסס על המידע הרפואי שיסופק.
 
 חוקים:
 1. ענה רק בעברית
 2. התבסס רק על המידע שסופק
 3. אם אין מידע - אמר זאת
 4. ציין שמות מטופלים ותאריכים רלוונטיים
-5. תשובה קצרה ומדויקת (2-4 משפטים)
+5. תשובה קצרה ומדויקת (2-4 משפטים)"""
 
-תשובה:"""
 
+def _build_rag_request(query: str, context: str) -> dict:
+    """Generate arguments: the fixed prefix first, then the per-request part.
 
-def query_ollama(query: str, context: str) -> str:
-    """Send query to Ollama with medical context."""
-    client = ollama.Client(host=OLLAMA_HOST)
-    response = client.generate(
-        model=OLLAMA_MODEL,
-        prompt=_build_rag_prompt(query, context),
-    )
+    In "system" mode the prefix goes in Ollama's system field; in "inline"
+    mode it leads a single prompt. Either way requests share a token prefix.
+    """
+    question = f"""מידע רפואי:
+
+{context}
+
+שאלת הרופא: {query}
+
+תשובה:"""
+    if PROMPT_MODE == "system":
+        return {"system": RAG_SYSTEM_PREFIX, "prompt": question}
+    return {"prompt": f"{RAG_SYSTEM_PREFIX}\n\n{question}"}
+
+
+def _response_field(response, name: str):
+    if isinstance(response, dict):
+        return response.get(name)
+    return getattr(response, name, None)
+
+
+def _prefill_stats(response) -> dict:
+    """Prefill cost of a finished generate call and the prompt tokens it reused."""
+    evaluated = _response_field(response, "prompt_eval_count") or 0
+    duration_ns = _response_field(response, "prompt_eval_duration") or 0
+    stats = {
+        "prompt_mode": PROMPT_MODE,
+        "prompt_tokens_evaluated": evaluated,
+        "prefill_ms": round(duration_ns / 1e6, 1),
+    }
+    # context holds the prompt and response tokens; whatever part of the
+    # prompt wasn't evaluated came from Ollama's cache
+    context = _response_field(response, "context")
+    if context:
+        prompt_tokens = len(context) - (_response_field(response, "eval_count") or 0)
+        stats["prompt_tokens"] = prompt_tokens
+        stats["reused_prefix_tokens"] = max(prompt_tokens - evaluated, 0)
+    return stats
+
+
+def query_ollama(query: str, context: str) -> tuple[str, dict]:
+    """Send query to Ollama with medical context. Returns (answer, prefill stats)."""
+    with metrics.GENERATIONS_IN_FLIGHT.labels(OLLAMA_MODEL).track_inprogress():
+        def generate(host):
+            logger.info(f"[OLLAMA] Generate call to {host.url}, model={OLLAMA_MODEL}")
+            return host.client.generate(
+                model=OLLAMA_MODEL,
+                keep_alive=KEEP_ALIVE,
+                **_build_rag_request(query, context),
+            )
 
-    return response.response.strip()
+        with tracing.span("generate"):
+            response = pool.call("generate", OLLAMA_MODEL, generate)
+
+    metrics.record_generation(response, OLLAMA_MODEL)
+    tracing.record_ollama(response)
+    prefill = _prefill_stats(response)
+    logger.info(f"[OLLAMA] Prefill: {prefill}")
+    return response.response.strip(), prefill
 
 
 async def _stream_ollama_tokens(query: str, context: str):
     """Async generator — yields SSE lines for each Ollama token."""
-    logger.info(f"[OLLAMA] Starting generate call to {OLLAMA_HOST}, model={OLLAMA_MODEL}")
-    client = ollama.AsyncClient(host=OLLAMA_HOST)
     token_count = 0
-    try:
-        async for chunk in await client.generate(
-            model=OLLAMA_MODEL,
-            prompt=_build_rag_prompt(query, context),
-            stream=True,
-        ):
-            # chunk is a GenerateResponse Pydantic model
-            if isinstance(chunk, dict):
-                token = chunk.get("response", "")
-                done = chunk.get("done", False)
-            else:
-                token = getattr(chunk, "response", "") or ""
-                done = getattr(chunk, "done", False)
-
-            if token:
-                token_count += 1
-                if token_count <= 3:
-                    logger.info(f"[OLLAMA] Token #{token_count}: {repr(token)}")
-                yield f'data: {json.dumps({"type": "token", "text": token}, ensure_ascii=False)}\n\n'
-
-            if done:
-                break
-
-    except Exception as e:
-        logger.error(f"[OLLAMA] generate exception: {e}", exc_info=True)
-        raise
+    final = None
+    first_token_at = None
+    start = time.perf_counter()
+    # A failed host is retried once elsewhere, as long as no token was sent yet
+    tried = []
+    while True:
+        try:
+            with metrics.GENERATIONS_IN_FLIGHT.labels(OLLAMA_MODEL).track_inprogress(), \
+                    pool.acquire("generate", OLLAMA_MODEL, exclude=tried) as host:
+                tried.append(host)
+                logger.info(f"[OLLAMA] Starting generate call to {host.url}, model={OLLAMA_MODEL}")
+                async for chunk in await host.async_client.generate(
+                    model=OLLAMA_MODEL,
+                    stream=True,
+                    keep_alive=KEEP_ALIVE,
+                    **_build_rag_request(query, context),
+                ):
+                    # chunk is a GenerateResponse Pydantic model
+                    if isinstance(chunk, dict):
+                        token = chunk.get("response", "")
+                        done = chunk.get("done", False)
+                    else:
+                        token = getattr(chunk, "response", "") or ""
+                        done = getattr(chunk, "done", False)
+
+                    if token:
+                        if first_token_at is None:
+                            first_token_at = time.perf_counter()
+                        token_count += 1
+                        if token_count <= 3:
+                            logger.info(f"[OLLAMA] Token #{token_count}: {repr(token)}")
+                        yield f'data: {json.dumps({"type": "token", "text": token}, ensure_ascii=False)}\n\n'
+
+                    if done:
+                        final = chunk
+                        break
+            break
+        except Exception as e:
+            if token_count == 0 and pool.should_retry("generate", e, tried):
+                logger.warning(f"[OLLAMA] {tried[-1].url} failed, retrying on another host: {e}")
+                continue
+            logger.error(f"[OLLAMA] generate exception: {e}", exc_info=True)
+            raise
 
     logger.info(f"[OLLAMA] Generate complete, total tokens: {token_count}")
-    yield f'data: {json.dumps({"type": "done"})}\n\n'
+    done_event = {"type": "done"}
+    ttft = first_token_at - start if first_token_at is not None else None
+    metrics.record_generation(final, OLLAMA_MODEL, ttft=ttft)
+    tracing.record("generate", time.perf_counter() - start)
+    if ttft is not None:
+        tracing.record("ttft", ttft)
+    if final is not None:
+        tracing.record_ollama(final)
+        done_event["prefill"] = _prefill_stats(final)
+        logger.info(f"[OLLAMA] Prefill: {done_event['prefill']}")
+    yield f'data: {json.dumps(done_event)}\n\n'
+
+
+def _timing_event() -> str:
+    event = {"type": "timing", "trace_id": tracing.trace_id(), "timings": tracing.timings()}
+    return f'data: {json.dumps(event)}\n\n'
 
 
 # Routes
+@app.get("/metrics")
+async def metrics_endpoint():
+    """Prometheus metrics."""
+    body, content_type = metrics.render()
+    return Response(content=body, media_type=content_type)
+
+
+class ProfileRequest(BaseModel):
+    requests: int = 1  # 0 disarms
+
+
+@app.post("/admin/profile")
+async def arm_profiler(request: ProfileRequest, raw_request: Request):
+    """Profile the next N requests with cProfile (needs RAG_PROFILING_ENABLED)."""
+    verify_internal_key(raw_request)
+    if not tracing.PROFILING_ENABLED:
+        raise HTTPException(status_code=403, detail="Profiling is disabled (RAG_PROFILING_ENABLED)")
+    tracing.profiler.arm(max(request.requests, 0))
+    logger.info(f"Profiling armed for {request.requests} requests")
+    return tracing.profiler.stats()
+
+
+@app.get("/admin/profile")
+async def profiler_status(raw_request: Request):
+    verify_internal_key(raw_request)
+    return tracing.profiler.stats()
+
+
 @app.get("/health")
 async def health_check():
     """Health check endpoint - also used by ALB."""
-    return {"status": "ok", "model": OLLAMA_MODEL, "ready": model_ready}
+    return {
+        "status": "ok",
+        "model": OLLAMA_MODEL,
+        "ready": residency.ready,
+        "models": residency.stats(),
+        "ollama_hosts": pool.stats(),
+    }
 
 
 @app.get("/api/health")
 async def api_health_check():
     """Health check endpoint (legacy path)."""
-    return {"status": "ok", "model": OLLAMA_MODEL, "ready": model_ready}
+    return {
+        "status": "ok",
+        "model": OLLAMA_MODEL,
+        "ready": residency.ready,
+        "models": residency.stats(),
+        "ollama_hosts": pool.stats(),
+    }
 
 
 @app.post("/rag/query", response_model=RAGQueryResponse)
@@ -274,9 +528,9 @@ async def rag_query(request: RAGQueryRequest, raw_request: Request):
     doctor_id = request.doctor_id
     logger.info(f"RAG query for doctor {doctor_id}: {request.query[:100]}")
 
-    # Vector search for relevant chunks
+    # Vector search for relevant chunks (blocking calls run off the event loop)
     try:
-        chunks = vector_search(request.query, doctor_id, request.top_k)
+        chunks = await asyncio.to_thread(vector_search, request.query, doctor_id, request.top_k)
     except Exception as e:
         logger.error(f"Vector search error: {e}")
         raise HTTPException(
@@ -297,7 +551,7 @@ async def rag_query(request: RAGQueryRequest, raw_request: Request):
 
     # Query Ollama LLM
     try:
-        answer = query_ollama(request.query, context)
+        answer, prefill = await asyncio.to_thread(query_ollama, request.query, context)
     except Exception as e:
         logger.error(f"Ollama error: {e}")
         raise HTTPException(
@@ -312,6 +566,7 @@ async def rag_query(request: RAGQueryRequest, raw_request: Request):
         sources=sources,
         total_summaries_scanned=len(chunks),
         model=OLLAMA_MODEL,
+        prefill=prefill,
     )
 
 
@@ -323,6 +578,7 @@ async def rag_query_stream(request: RAGQueryRequest, raw_request: Request):
       sources  — sent immediately after vector search, contains sources + metadata
       token    — one per Ollama output token
       done     — stream complete
+      timing   — per-stage durations (ms) and the trace ID, after done
       error    — on failure
     """
     verify_internal_key(raw_request)
@@ -333,7 +589,9 @@ async def rag_query_stream(request: RAGQueryRequest, raw_request: Request):
     async def event_generator():
         # 1. Vector search (fast — embeddings only, no LLM)
         try:
-            chunks = vector_search(request.query, doctor_id, request.top_k)
+            chunks = await asyncio.to_thread(
+                vector_search, request.query, doctor_id, request.top_k
+            )
         except Exception as e:
             logger.error(f"Vector search error: {e}")
             yield f'data: {json.dumps({"type": "error", "message": "שגיאה בחיפוש וקטורי. ודא ש-Ollama פעיל."}, ensure_ascii=False)}\n\n'
@@ -343,10 +601,14 @@ async def rag_query_stream(request: RAGQueryRequest, raw_request: Request):
             yield f'data: {json.dumps({"type": "sources", "sources": [], "total_scanned": 0, "model": OLLAMA_MODEL}, ensure_ascii=False)}\n\n'
             yield f'data: {json.dumps({"type": "token", "text": "לא נמצא מידע רלוונטי. יש ליצור סיכומי טיפול או תמלולים לפני שניתן לחפש בהם."}, ensure_ascii=False)}\n\n'
             yield f'data: {json.dumps({"type": "done"})}\n\n'
+            yield _timing_event()
             return
 
         context, sources = build_context_from_chunks(chunks)
-        sources_data = [{"patient_name": s.patient_name, "date": s.date} for s in sources]
+        sources_data = [
+            {"patient_name": s.patient_name, "date": s.date, "start": s.start, "end": s.end}
+            for s in sources
+        ]
 
         # 2. Send sources immediately (before LLM starts)
         yield f'data: {json.dumps({"type": "sources", "sources": sources_data, "total_scanned": len(chunks), "model": OLLAMA_MODEL}, ensure_ascii=False)}\n\n'
@@ -379,6 +641,7 @@ async def rag_query_stream(request: RAGQueryRequest, raw_request: Request):
                     yield f'data: {json.dumps({"type": "error", "message": f"שגיאה בשרת ה-AI: {value}"}, ensure_ascii=False)}\n\n'
                     break
                 yield value
+            yield _timing_event()
         finally:
             produce_task.cancel()
 
@@ -389,6 +652,111 @@ async def rag_query_stream(request: RAGQueryRequest, raw_request: Request):
     )
 
 
+NO_INFO_ANSWER = "לא נמצא מידע רלוונטי. יש ליצור סיכומי טיפול או תמלולים לפני שניתן לחפש בהם."
+
+
+async def _run_batch_query(
+    index: int,
+    item: RAGBatchQuery,
+    query_embedding: list[float],
+    generate: bool,
+    search_slots: asyncio.Semaphore,
+) -> dict:
+    result = {"type": "result", "index": index, "id": item.id}
+    try:
+        async with search_slots:
+            chunks = await asyncio.to_thread(
+                search_chunks, query_embedding, item.doctor_id, item.top_k
+            )
+    except Exception as e:
+        logger.error(f"Batch vector search error (#{index}): {e}")
+        return {**result, "type": "error", "message": f"Vector search failed: {e}"}
+
+    context, sources = build_context_from_chunks(chunks)
+    result.update(
+        sources=[s.model_dump() for s in sources],
+        total_summaries_scanned=len(chunks),
+        model=OLLAMA_MODEL,
+    )
+    if not chunks:
+        return {**result, "answer": NO_INFO_ANSWER}
+    if not generate:
+        return result
+
+    try:
+        queued = metrics.GENERATION_QUEUE_DEPTH.labels(OLLAMA_MODEL)
+        queued.inc()
+        try:
+            await batch_generation_slots.acquire()
+        finally:
+            queued.dec()
+        try:
+            answer, prefill = await asyncio.to_thread(query_ollama, item.query, context)
+        finally:
+            batch_generation_slots.release()
+    except Exception as e:
+        logger.error(f"Batch generation error (#{index}): {e}")
+        return {**result, "type": "error", "message": f"Generation failed: {e}"}
+    return {**result, "answer": answer, "prefill": prefill}
+
+
+@app.post("/rag/query/batch")
+async def rag_query_batch(request: RAGBatchRequest, raw_request: Request):
+    """Answer many queries in one request, streamed back as NDJSON.
+
+    All queries are embedded in a single call, vector searches run
+    concurrently and generations go through a shared bounded pool. One JSON
+    line is written per query as soon as it completes (``index`` is its
+    position in the request); keepalive lines are sent while waiting.
+    """
+    verify_internal_key(raw_request)
+
+    if not request.queries:
+        raise HTTPException(status_code=400, detail="No queries")
+    if len(request.queries) > BATCH_MAX_QUERIES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Too many queries ({len(request.queries)} > {BATCH_MAX_QUERIES})",
+        )
+
+    logger.info(f"RAG batch: {len(request.queries)} queries, generate={request.generate}")
+
+    try:
+        with metrics.timed(metrics.EMBED_SECONDS, EMBEDDING_MODEL):
+            embeddings = await asyncio.to_thread(embed_texts, [q.query for q in request.queries])
+    except Exception as e:
+        logger.error(f"Batch embedding error: {e}")
+        raise HTTPException(status_code=503, detail="שגיאה ביצירת embeddings. ודא ש-Ollama פעיל.")
+
+    async def line_generator():
+        search_slots = asyncio.Semaphore(BATCH_SEARCH_CONCURRENCY)
+        tasks = {
+            asyncio.create_task(
+                _run_batch_query(i, item, embedding, request.generate, search_slots)
+            )
+            for i, (item, embedding) in enumerate(zip(request.queries, embeddings))
+        }
+        pending = set(tasks)
+        try:
+            while pending:
+                done, pending = await asyncio.wait(
+                    pending, timeout=20.0, return_when=asyncio.FIRST_COMPLETED
+                )
+                if not done:
+                    yield json.dumps({"type": "keepalive"}) + "\n"
+                for task in done:
+                    yield json.dumps(task.result(), ensure_ascii=False) + "\n"
+        finally:
+            for task in pending:
+                task.cancel()
+
+    return StreamingResponse(
+        line_generator(),
+        media_type="application/x-ndjson",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
 @app.post("/rag/index", response_model=IndexResponse)
 async def index_document(request: IndexRequest, raw_request: Request):
     """Index a single document into the vector store."""
@@ -425,6 +793,45 @@ async def index_document(request: IndexRequest, raw_request: Request):
     return IndexResponse(status="ok", chunks_created=count)
 
 
+@app.post("/rag/index/transcription", response_model=IndexResponse)
+def index_transcription_handoff(request: TranscriptionIndexRequest, raw_request: Request):
+    """Index a finished transcription pushed by the transcription service.
+
+    The result (with segment timestamps) arrives in the request, so there is
+    no round trip to the transcriptions table and chunks keep their position
+    in the recording.
+    """
+    verify_internal_key(raw_request)
+
+    logger.info(
+        f"Indexing transcriptions/{request.transcription_id} from handoff "
+        f"({len(request.segments)} segments)"
+    )
+
+    try:
+        transcription = fetch_transcription(supabase, request.transcription_id)
+    except Exception as e:
+        logger.error(f"Lookup error for transcriptions/{request.transcription_id}: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+    if not transcription:
+        raise HTTPException(status_code=404, detail="Transcription not found")
+    if transcription.get("job_id") != request.job_id:
+        raise HTTPException(status_code=409, detail="Transcription was not saved from this job")
+
+    try:
+        count = index_transcription_result(
+            supabase,
+            transcription,
+            transcription_text=request.transcription_text,
+            segments=[s.model_dump() for s in request.segments],
+        )
+    except Exception as e:
+        logger.error(f"Indexing error for transcriptions/{request.transcription_id}: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+    return IndexResponse(status="ok", chunks_created=count)
+
+
 @app.post("/rag/reindex-all")
 async def reindex_all_endpoint(raw_request: Request, background_tasks: BackgroundTasks):
     """Reindex all existing data. Runs in background so the server stays responsive."""
@@ -0,0 +1,129 @@
+"""
+Prometheus metrics for the RAG server.
+
+Per-stage histograms are labelled by endpoint and model. The endpoint
+comes from a context variable set by MetricsMiddleware, so code deep in
+the search and indexing paths (including worker threads started with
+asyncio.to_thread) records against the request that called it.
+"""
+
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from prometheus_client import Gauge, Histogram, CONTENT_TYPE_LATEST, generate_latest
+
+current_endpoint: ContextVar[str] = ContextVar("current_endpoint", default="background")
+
+LATENCY_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+GENERATION_BUCKETS = (0.1, 0.25, 0.5, 1, 2, 5, 10, 20, 30, 60, 120, 300)
+
+EMBED_SECONDS = Histogram(
+    "rag_query_embedding_seconds", "Query embedding time",
+    ["endpoint", "model"], buckets=LATENCY_BUCKETS,
+)
+SEARCH_SECONDS = Histogram(
+    "rag_vector_search_seconds", "Vector search RPC time",
+    ["endpoint", "model", "rpc"], buckets=LATENCY_BUCKETS,
+)
+CONTEXT_CHARS = Histogram(
+    "rag_context_chars", "Size of the context sent to the LLM, in characters",
+    ["endpoint", "model"], buckets=(250, 500, 1000, 2000, 4000, 8000, 16000, 32000),
+)
+TTFT_SECONDS = Histogram(
+    "rag_time_to_first_token_seconds", "Time from generate call to first token",
+    ["endpoint", "model"], buckets=GENERATION_BUCKETS,
+)
+TOKENS_PER_SECOND = Histogram(
+    "rag_generation_tokens_per_second", "LLM decode speed",
+    ["endpoint", "model"], buckets=(1, 2, 5, 10, 15, 20, 30, 50, 80, 120),
+)
+REQUEST_SECONDS = Histogram(
+    "rag_request_seconds", "Total request time, until the last byte is sent",
+    ["endpoint", "model"], buckets=GENERATION_BUCKETS,
+)
+INDEX_CHUNKS = Histogram(
+    "rag_index_chunks", "Chunks written per indexed document",
+    ["endpoint", "model"], buckets=(1, 2, 5, 10, 20, 50, 100, 200, 500),
+)
+INDEX_EMBEDDINGS_PER_SECOND = Histogram(
+    "rag_index_embeddings_per_second", "Embedding throughput while indexing",
+    ["endpoint", "model"], buckets=(1, 5, 10, 25, 50, 100, 250, 500, 1000),
+)
+
+GENERATIONS_IN_FLIGHT = Gauge(
+    "rag_generations_in_flight", "LLM generate calls in progress", ["model"],
+)
+GENERATION_QUEUE_DEPTH = Gauge(
+    "rag_generation_queue_depth", "Batch queries waiting for a generation slot", ["model"],
+)
+
+
+def observe(histogram: Histogram, value: float, model: str, **labels):
+    histogram.labels(endpoint=current_endpoint.get(), model=model, **labels).observe(value)
+
+
+@contextmanager
+def timed(histogram: Histogram, model: str, **labels):
+    """Observe the duration of the block, in seconds."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(histogram, time.perf_counter() - start, model, **labels)
+
+
+def record_generation(final, model: str, ttft: float | None = None):
+    """Record decode speed from Ollama's final response, and TTFT if measured."""
+    if ttft is not None:
+        observe(TTFT_SECONDS, ttft, model)
+    if isinstance(final, dict):
+        eval_count, eval_duration = final.get("eval_count"), final.get("eval_duration")
+    else:
+        eval_count = getattr(final, "eval_count", None)
+        eval_duration = getattr(final, "eval_duration", None)
+    if eval_count and eval_duration:
+        observe(TOKENS_PER_SECOND, eval_count / (eval_duration / 1e9), model)
+
+
+def render() -> tuple[bytes, str]:
+    return generate_latest(), CONTENT_TYPE_LATEST
+
+
+class MetricsMiddleware:
+    """Sets the endpoint for the request and records its total time.
+
+    Time is measured until the final body message, so streamed responses
+    count their whole duration. Unknown paths share one label.
+    """
+
+    def __init__(self, app, model: str):
+        self.app = app
+        self.model = model
+        self._endpoints: set[str] | None = None
+
+    def _endpoint(self, scope) -> str:
+        if self._endpoints is None:
+            self._endpoints = {getattr(r, "path", "") for r in scope["app"].routes}
+        return scope["path"] if scope["path"] in self._endpoints else "other"
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] == "/metrics":
+            await self.app(scope, receive, send)
+            return
+
+        endpoint = self._endpoint(scope)
+        token = current_endpoint.set(endpoint)
+        start = time.perf_counter()
+
+        async def send_and_time(message):
+            await send(message)
+            if message["type"] == "http.response.body" and not message.get("more_body", False):
+                REQUEST_SECONDS.labels(endpoint=endpoint, model=self.model).observe(
+                    time.perf_counter() - start
+                )
+
+        try:
+            await self.app(scope, receive, send_and_time)
+        finally:
+            current_endpoint.reset(token)
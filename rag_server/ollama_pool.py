@@ -0,0 +1,204 @@
+"""
+Routing across one or more Ollama hosts.
+
+Each host has a role (embed, generate or both). Requests go to the healthy
+host with the fewest outstanding requests, preferring hosts that already
+have the model loaded. A background probe checks every host's /api/ps,
+ejects hosts that keep failing and re-admits them once they answer again.
+Only connection errors, timeouts and 5xx responses count as host failures;
+a request that hits one is retried once on another healthy host.
+"""
+
+import os
+import logging
+import threading
+import time
+from contextlib import contextmanager
+
+import httpx
+import ollama
+
+logger = logging.getLogger("rag_server")
+
+# "http://a:11434=both,http://b:11434=generate"; falls back to OLLAMA_HOST with role both
+OLLAMA_HOSTS = os.environ.get("OLLAMA_HOSTS", "")
+OLLAMA_HOST = os.environ.get("OLLAMA_HOST", "http://localhost:11434")
+HEALTH_INTERVAL_SECONDS = float(os.environ.get("OLLAMA_HEALTH_INTERVAL_SECONDS", "10"))
+# Consecutive failures (probes or requests) before a host is ejected
+EJECT_AFTER_FAILURES = int(os.environ.get("OLLAMA_EJECT_AFTER_FAILURES", "2"))
+# A warm host is preferred unless it has this many more requests in flight than a cold one
+STICKY_SLACK = int(os.environ.get("OLLAMA_STICKY_SLACK", "2"))
+# Sent with every generate and embed call so models stay loaded between requests
+KEEP_ALIVE = os.environ.get("OLLAMA_KEEP_ALIVE", "1h")
+
+ROLES = ("embed", "generate")
+
+
+def _model_key(name: str) -> str:
+    return name if ":" in name else f"{name}:latest"
+
+
+def is_host_failure(error: Exception) -> bool:
+    """Whether an error says the host is unreachable or broken.
+
+    4xx responses (missing model, bad request) and errors in the caller's
+    own code say nothing about the host's health.
+    """
+    if isinstance(error, ollama.ResponseError):
+        return error.status_code >= 500
+    return isinstance(error, (ConnectionError, TimeoutError, httpx.TransportError))
+
+
+class OllamaHost:
+    def __init__(self, url: str, roles: set[str]):
+        self.url = url
+        self.roles = roles
+        self.outstanding = 0
+        self.healthy = True
+        self.failures = 0
+        self.loaded_models: set[str] = set()
+        self.last_error = ""
+        self.last_probe: float | None = None
+        self.client = ollama.Client(host=url)
+        self.async_client = ollama.AsyncClient(host=url)
+
+    def is_warm(self, model: str) -> bool:
+        return _model_key(model) in self.loaded_models
+
+    def stats(self) -> dict:
+        return {
+            "url": self.url,
+            "roles": sorted(self.roles),
+            "healthy": self.healthy,
+            "outstanding": self.outstanding,
+            "loaded_models": sorted(self.loaded_models),
+            "last_error": self.last_error or None,
+        }
+
+
+class OllamaPool:
+    def __init__(self, hosts: list[OllamaHost]):
+        if not hosts:
+            raise ValueError("At least one Ollama host is required")
+        self.hosts = hosts
+        self._lock = threading.Lock()
+        self._probe_thread: threading.Thread | None = None
+
+    @classmethod
+    def from_env(cls) -> "OllamaPool":
+        hosts = []
+        for entry in filter(None, (e.strip() for e in OLLAMA_HOSTS.split(","))):
+            url, _, role = entry.partition("=")
+            role = role or "both"
+            if role not in (*ROLES, "both"):
+                raise ValueError(f"Unknown Ollama host role '{role}' for {url}")
+            hosts.append(OllamaHost(url, set(ROLES) if role == "both" else {role}))
+        return cls(hosts or [OllamaHost(OLLAMA_HOST, set(ROLES))])
+
+    def _choose(self, role: str, model: str, exclude=()) -> OllamaHost:
+        candidates = [h for h in self.hosts if role in h.roles]
+        if not candidates:
+            raise RuntimeError(f"No Ollama host configured for role '{role}'")
+        candidates = [h for h in candidates if h not in exclude] or candidates
+        # With every host ejected, keep trying rather than failing outright
+        healthy = [h for h in candidates if h.healthy] or candidates
+
+        least = min(healthy, key=lambda h: h.outstanding)
+        warm = [h for h in healthy if h.is_warm(model)]
+        if warm:
+            best_warm = min(warm, key=lambda h: h.outstanding)
+            if best_warm.outstanding <= least.outstanding + STICKY_SLACK:
+                return best_warm
+        return least
+
+    @contextmanager
+    def acquire(self, role: str, model: str, exclude=()):
+        """Reserve the best host for a request; yields the OllamaHost.
+
+        ``exclude`` lists hosts already tried for this request.
+        """
+        with self._lock:
+            host = self._choose(role, model, exclude)
+            host.outstanding += 1
+        try:
+            yield host
+        except Exception as e:
+            if is_host_failure(e):
+                self._record_failure(host, e)
+            raise
+        else:
+            with self._lock:
+                host.failures = 0
+            # The model is loaded on this host now
+            self.mark_loaded(host, model)
+        finally:
+            with self._lock:
+                host.outstanding -= 1
+
+    def should_retry(self, role: str, error: Exception, tried: list[OllamaHost]) -> bool:
+        """Whether a failed request gets its one retry on another healthy host."""
+        if len(tried) != 1 or not is_host_failure(error):
+            return False
+        with self._lock:
+            return any(h.healthy and role in h.roles and h not in tried for h in self.hosts)
+
+    def call(self, role: str, model: str, fn):
+        """Run ``fn(host)`` on the best host, retrying once elsewhere if that host fails."""
+        tried: list[OllamaHost] = []
+        while True:
+            try:
+                with self.acquire(role, model, exclude=tried) as host:
+                    tried.append(host)
+                    return fn(host)
+            except Exception as e:
+                if not self.should_retry(role, e, tried):
+                    raise
+                logger.warning(f"Ollama host {tried[-1].url} failed, retrying on another host: {e}")
+
+    def mark_loaded(self, host: OllamaHost, model: str):
+        with self._lock:
+            host.loaded_models.add(_model_key(model))
+
+    def _record_failure(self, host: OllamaHost, error: Exception):
+        with self._lock:
+            host.failures += 1
+            host.last_error = str(error)
+            if host.healthy and host.failures >= EJECT_AFTER_FAILURES:
+                host.healthy = False
+                logger.warning(f"Ejecting Ollama host {host.url} after {host.failures} failures: {error}")
+
+    def probe(self, host: OllamaHost):
+        """Check a host and refresh its loaded models."""
+        try:
+            response = host.client.ps()
+        except Exception as e:
+            self._record_failure(host, e)
+            return
+        with self._lock:
+            host.loaded_models = {_model_key(m.model) for m in response.models}
+            host.last_probe = time.time()
+            host.failures = 0
+            host.last_error = ""
+            if not host.healthy:
+                host.healthy = True
+                logger.info(f"Re-admitting Ollama host {host.url}")
+
+    def _probe_loop(self):
+        while True:
+            for host in self.hosts:
+                self.probe(host)
+            time.sleep(HEALTH_INTERVAL_SECONDS)
+
+    def start_health_checks(self):
+        if self._probe_thread is None:
+            self._probe_thread = threading.Thread(
+                target=self._probe_loop, name="ollama-health", daemon=True
+            )
+            self._probe_thread.start()
+
+    def stats(self) -> list[dict]:
+        with self._lock:
+            return [h.stats() for h in self.hosts]
+
+
+pool = OllamaPool.from_env()
@@ -0,0 +1,150 @@
+"""
+Keeps the Ollama models resident.
+
+Ollama unloads a model once its keep_alive expires, and the next request
+pays a full reload. The residency manager checks every host's loaded
+models on a schedule, pings loaded models so their keep_alive is renewed,
+re-warms models that were unloaded anyway, and tracks per-model load state
+for /health.
+"""
+
+import os
+import logging
+import threading
+import time
+
+from ollama_pool import OllamaPool, KEEP_ALIVE
+
+logger = logging.getLogger("rag_server")
+
+RESIDENCY_INTERVAL_SECONDS = float(os.environ.get("OLLAMA_RESIDENCY_INTERVAL_SECONDS", "60"))
+# Wait before the first check so Ollama has time to start alongside us
+RESIDENCY_START_DELAY_SECONDS = float(os.environ.get("OLLAMA_RESIDENCY_START_DELAY_SECONDS", "5"))
+
+
+class ResidencyManager:
+    def __init__(self, pool: OllamaPool, models: dict[str, str]):
+        """
+        Args:
+            pool: Hosts to keep the models on.
+            models: Model name -> role ("generate" or "embed"). Each model
+                is kept resident on every host with that role.
+        """
+        self.pool = pool
+        self.models = models
+        self._lock = threading.Lock()
+        self._thread: threading.Thread | None = None
+        # (model, host url) -> state
+        self._state: dict[tuple[str, str], dict] = {
+            (model, host.url): {
+                "state": "unloaded",
+                "loaded_at": None,
+                "load_seconds": None,
+                "last_ping": None,
+                "reloads": 0,
+                "error": None,
+            }
+            for model, role in models.items()
+            for host in pool.hosts
+            if role in host.roles
+        }
+
+    def _set(self, model: str, url: str, **fields):
+        with self._lock:
+            self._state[(model, url)].update(fields)
+
+    def _request(self, host, model: str, role: str):
+        """Smallest request that loads the model and renews its keep_alive."""
+        if role == "generate":
+            # An empty prompt loads the model without generating
+            host.client.generate(model=model, prompt="", keep_alive=KEEP_ALIVE)
+        else:
+            host.client.embed(model=model, input="ping", keep_alive=KEEP_ALIVE)
+
+    def _warm(self, host, model: str, role: str) -> bool:
+        self._set(model, host.url, state="loading", error=None)
+        start = time.perf_counter()
+        try:
+            self._request(host, model, role)
+        except Exception as e:
+            self._set(model, host.url, state="error", error=str(e))
+            logger.warning(f"Warming {model} on {host.url} failed: {e}")
+            return False
+        elapsed = time.perf_counter() - start
+        now = time.time()
+        self._set(model, host.url, state="loaded", loaded_at=now, last_ping=now,
+                  load_seconds=round(elapsed, 2))
+        logger.info(f"{model} loaded on {host.url} in {elapsed:.1f}s")
+        return True
+
+    def _ping(self, host, model: str, role: str):
+        try:
+            self._request(host, model, role)
+            self._set(model, host.url, last_ping=time.time(), error=None)
+        except Exception as e:
+            self._set(model, host.url, error=str(e))
+            logger.warning(f"Keep-alive ping for {model} on {host.url} failed: {e}")
+
+    def check(self):
+        """One pass: refresh loaded models, re-warm unloaded ones, ping the rest."""
+        for host in self.pool.hosts:
+            self.pool.probe(host)
+            for model, role in self.models.items():
+                if role not in host.roles:
+                    continue
+                with self._lock:
+                    previous = self._state[(model, host.url)]["state"]
+
+                if not host.healthy:
+                    self._set(model, host.url, state="unreachable")
+                elif not host.is_warm(model):
+                    if previous == "loaded":
+                        logger.warning(f"{model} was unloaded from {host.url}, re-warming")
+                        with self._lock:
+                            self._state[(model, host.url)]["reloads"] += 1
+                    if self._warm(host, model, role):
+                        self.pool.mark_loaded(host, model)
+                else:
+                    if previous != "loaded":
+                        self._set(model, host.url, state="loaded", loaded_at=time.time())
+                    self._ping(host, model, role)
+
+    def _loop(self):
+        time.sleep(RESIDENCY_START_DELAY_SECONDS)
+        while True:
+            try:
+                self.check()
+            except Exception as e:
+                logger.error(f"Residency check failed: {e}")
+            time.sleep(RESIDENCY_INTERVAL_SECONDS)
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(
+                target=self._loop, name="ollama-residency", daemon=True
+            )
+            self._thread.start()
+
+    @property
+    def ready(self) -> bool:
+        """Every model is loaded on at least one host."""
+        with self._lock:
+            return all(
+                any(
+                    state["state"] == "loaded"
+                    for (name, _), state in self._state.items()
+                    if name == model
+                )
+                for model in self.models
+            )
+
+    def stats(self) -> dict:
+        with self._lock:
+            models: dict[str, dict] = {
+                model: {"role": role, "hosts": {}} for model, role in self.models.items()
+            }
+            for (model, url), state in self._state.items():
+                models[model]["hosts"][url] = dict(state)
+        for entry in models.values():
+            entry["loaded"] = any(h["state"] == "loaded" for h in entry["hosts"].values())
+        return models
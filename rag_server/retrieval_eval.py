@@ -0,0 +1,366 @@
+"""
+Retrieval quality vs. latency sweep.
+
+Embeds a corpus with labelled queries and measures each configuration of
+the retrieval knobs: chunk sizes, embedding dimension (Matryoshka
+truncation, nomic-embed-text v1.5), vector quantization, HNSW m /
+ef_construction / ef_search, top_k and the similarity threshold. Reports
+recall@k, MRR, index size, build time and search latency per configuration
+and marks the Pareto front (no other configuration is at least as good on
+all four of recall, MRR, p95 latency and index size).
+
+The corpus is the synthetic one from bench_corpus, or a de-identified
+export: --documents JSONL of {"id", "kind", "text"} (kind is
+treatment_summary or transcription) and --queries JSONL of
+{"query", "relevant": [document ids]}.
+
+Backends:
+  exact    - brute-force cosine in numpy (ground truth; no HNSW knobs)
+  hnswlib  - in-process HNSW (pip install hnswlib)
+  pgvector - HNSW in Postgres, like production (pip install "psycopg[binary]";
+             --database-url of a scratch database with the vector extension)
+
+Embeddings come from the configured EMBEDDING_BACKEND.
+
+Usage:
+  EMBEDDING_BACKEND=onnx python retrieval_eval.py --backend hnswlib \\
+      --m 8,16,32 --ef-construction 64,128 --ef-search 20,40,100 \\
+      --dimensions 768,256 --quantization float32,float16 --output sweep.json
+"""
+
+import argparse
+import csv
+import itertools
+import json
+import statistics
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+from bench_corpus import generate_corpus, labelled_queries
+from chunker import chunk_text, prepare_transcription_text, prepare_treatment_summary_text
+from embedder import embed_texts
+
+QUANTIZATION_BYTES = {"float32": 4.0, "float16": 2.0, "int8": 1.0, "binary": 1 / 8}
+
+
+def csv_list(cast):
+    return lambda value: [cast(v) for v in value.split(",") if v]
+
+
+def load_corpus(args) -> tuple[list[dict], list[dict]]:
+    """Documents as {id, kind, text} and queries as {query, relevant}."""
+    if args.documents:
+        documents = [json.loads(line) for line in Path(args.documents).read_text().splitlines() if line]
+        queries = [json.loads(line) for line in Path(args.queries).read_text().splitlines() if line]
+        for query in queries:
+            query["relevant"] = set(query["relevant"])
+        return documents, queries
+
+    corpus = generate_corpus(args.patients, args.visits, args.seed)
+    documents = [
+        {"id": row["id"], "kind": "treatment_summary", "text": prepare_treatment_summary_text(row)}
+        for row in corpus.summaries
+    ] + [
+        {"id": row["id"], "kind": "transcription", "text": prepare_transcription_text(row)}
+        for row in corpus.transcriptions
+    ]
+    return documents, labelled_queries(corpus, args.query_count, args.seed)
+
+
+class EmbeddingCache:
+    """Embeds each distinct text once across all chunk-size configurations."""
+
+    def __init__(self, batch_size: int = 32):
+        self.batch_size = batch_size
+        self.vectors: dict[str, np.ndarray] = {}
+        self.seconds = 0.0
+
+    def embed(self, texts: list[str]) -> np.ndarray:
+        missing = list(dict.fromkeys(t for t in texts if t not in self.vectors))
+        start = time.perf_counter()
+        for i in range(0, len(missing), self.batch_size):
+            batch = missing[i:i + self.batch_size]
+            for text, vector in zip(batch, embed_texts(batch)):
+                self.vectors[text] = np.asarray(vector, dtype=np.float32)
+        self.seconds += time.perf_counter() - start
+        return np.stack([self.vectors[t] for t in texts])
+
+
+def prepare_vectors(vectors: np.ndarray, dimension: int, quantization: str) -> np.ndarray:
+    """Truncate, renormalize and round-trip through the quantized format."""
+    vectors = vectors[:, :dimension]
+    vectors = vectors / np.clip(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12, None)
+    if quantization == "float16":
+        return vectors.astype(np.float16).astype(np.float32)
+    if quantization == "int8":
+        scale = np.clip(np.abs(vectors).max(axis=1, keepdims=True), 1e-12, None) / 127
+        return np.round(vectors / scale).astype(np.int8).astype(np.float32) * scale
+    if quantization == "binary":
+        # Cosine of sign vectors is 1 - 2 * hamming / dimension
+        return np.where(vectors > 0, 1.0, -1.0).astype(np.float32) / np.sqrt(dimension)
+    return vectors
+
+
+class ExactIndex:
+    tunable = False
+
+    def __init__(self, vectors: np.ndarray, quantization: str, **_):
+        self.vectors = vectors / np.clip(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12, None)
+        self.size_bytes = int(vectors.shape[0] * vectors.shape[1] * QUANTIZATION_BYTES[quantization])
+
+    def search(self, query: np.ndarray, k: int, ef_search: int) -> list[tuple[int, float]]:
+        similarities = self.vectors @ query
+        top = np.argpartition(-similarities, min(k, len(similarities) - 1))[:k]
+        top = top[np.argsort(-similarities[top])]
+        return [(int(i), float(similarities[i])) for i in top]
+
+    def close(self):
+        pass
+
+
+class HnswlibIndex:
+    tunable = True
+
+    def __init__(self, vectors: np.ndarray, quantization: str, m: int, ef_construction: int):
+        import hnswlib
+
+        self.index = hnswlib.Index(space="cosine", dim=vectors.shape[1])
+        self.index.init_index(max_elements=len(vectors), ef_construction=ef_construction, M=m)
+        self.index.add_items(vectors, np.arange(len(vectors)))
+        with tempfile.NamedTemporaryFile(suffix=".bin") as handle:
+            self.index.save_index(handle.name)
+            graph_bytes = Path(handle.name).stat().st_size
+        # hnswlib stores float32; count the vectors at the quantized width
+        float_bytes = vectors.shape[0] * vectors.shape[1] * 4
+        self.size_bytes = int(graph_bytes - float_bytes + float_bytes * QUANTIZATION_BYTES[quantization] / 4)
+
+    def search(self, query: np.ndarray, k: int, ef_search: int) -> list[tuple[int, float]]:
+        self.index.set_ef(max(ef_search, k))
+        labels, distances = self.index.knn_query(query, k=min(k, self.index.get_current_count()))
+        return [(int(i), 1 - float(d)) for i, d in zip(labels[0], distances[0])]
+
+    def close(self):
+        pass
+
+
+class PgvectorIndex:
+    """A scratch table and HNSW index in Postgres, queried like match_document_chunks."""
+
+    tunable = True
+    TYPES = {"float32": ("vector", "vector_cosine_ops"), "float16": ("halfvec", "halfvec_cosine_ops")}
+
+    def __init__(self, vectors: np.ndarray, quantization: str, m: int, ef_construction: int,
+                 database_url: str):
+        import psycopg
+
+        if quantization not in self.TYPES:
+            raise ValueError(f"pgvector backend supports {', '.join(self.TYPES)}, not {quantization}")
+        column_type, ops = self.TYPES[quantization]
+        self.column_type = column_type
+        dimension = vectors.shape[1]
+
+        self.connection = psycopg.connect(database_url, autocommit=True)
+        cursor = self.connection.cursor()
+        cursor.execute("DROP TABLE IF EXISTS retrieval_eval_chunks")
+        cursor.execute(
+            f"CREATE TABLE retrieval_eval_chunks (id INTEGER PRIMARY KEY, embedding {column_type}({dimension}))"
+        )
+        with cursor.copy("COPY retrieval_eval_chunks (id, embedding) FROM STDIN") as copy:
+            for i, vector in enumerate(vectors):
+                copy.write_row((i, "[" + ",".join(f"{v:.7g}" for v in vector) + "]"))
+        cursor.execute(
+            f"CREATE INDEX retrieval_eval_hnsw ON retrieval_eval_chunks "
+            f"USING hnsw (embedding {ops}) WITH (m = {int(m)}, ef_construction = {int(ef_construction)})"
+        )
+        cursor.execute("SELECT pg_relation_size('retrieval_eval_hnsw')")
+        self.size_bytes = cursor.fetchone()[0]
+
+    def search(self, query: np.ndarray, k: int, ef_search: int) -> list[tuple[int, float]]:
+        literal = "[" + ",".join(f"{v:.7g}" for v in query) + "]"
+        cursor = self.connection.cursor()
+        cursor.execute(f"SET hnsw.ef_search = {int(ef_search)}")
+        cursor.execute(
+            f"SELECT id, 1 - (embedding <=> %s::{self.column_type}) FROM retrieval_eval_chunks "
+            f"ORDER BY embedding <=> %s::{self.column_type} LIMIT %s",
+            (literal, literal, k),
+        )
+        return [(row[0], float(row[1])) for row in cursor.fetchall()]
+
+    def close(self):
+        self.connection.execute("DROP TABLE IF EXISTS retrieval_eval_chunks")
+        self.connection.close()
+
+
+BACKENDS = {"exact": ExactIndex, "hnswlib": HnswlibIndex, "pgvector": PgvectorIndex}
+
+
+def score(ranked_sources: list[str], relevant: set[str], k: int) -> tuple[float, float]:
+    """recall@k (hits over the relevant documents that fit in k) and reciprocal rank."""
+    top = ranked_sources[:k]
+    hits = len(relevant.intersection(top))
+    recall = hits / min(len(relevant), k) if relevant else 0.0
+    rank = next((i for i, source in enumerate(top, 1) if source in relevant), None)
+    return recall, 1 / rank if rank else 0.0
+
+
+def evaluate(index, chunk_sources: list[str], query_vectors: np.ndarray, queries: list[dict],
+             ef_search: int, top_ks: list[int], thresholds: list[float]) -> list[dict]:
+    """Search once at the largest k, then score every (top_k, threshold)."""
+    k_max = max(top_ks)
+    # Several chunks can come from one document; fetch extra so k documents survive
+    fetch = k_max * 3
+    latencies, hits = [], []
+    for vector in query_vectors:
+        start = time.perf_counter()
+        hits.append(index.search(vector, fetch, ef_search))
+        latencies.append((time.perf_counter() - start) * 1000)
+
+    ordered = sorted(latencies)
+    rows = []
+    for top_k, threshold in itertools.product(top_ks, thresholds):
+        recalls, reciprocal_ranks = [], []
+        for query, results in zip(queries, hits):
+            sources = list(dict.fromkeys(
+                chunk_sources[i] for i, similarity in results if similarity > threshold
+            ))
+            recall, rr = score(sources, query["relevant"], top_k)
+            recalls.append(recall)
+            reciprocal_ranks.append(rr)
+        rows.append({
+            "top_k": top_k,
+            "threshold": threshold,
+            "recall": round(statistics.mean(recalls), 4),
+            "mrr": round(statistics.mean(reciprocal_ranks), 4),
+            "latency_p50_ms": round(ordered[len(ordered) // 2], 3),
+            "latency_p95_ms": round(ordered[min(int(len(ordered) * 0.95), len(ordered) - 1)], 3),
+        })
+    return rows
+
+
+def pareto_front(rows: list[dict]) -> None:
+    """Mark rows not dominated on recall, MRR (higher) and p95 latency, index size (lower)."""
+    def key(row):
+        return (row["recall"], row["mrr"], -row["latency_p95_ms"], -row["index_bytes"])
+
+    for row in rows:
+        mine = key(row)
+        row["pareto"] = not any(
+            all(a >= b for a, b in zip(key(other), mine)) and key(other) != mine
+            for other in rows
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--backend", choices=BACKENDS, default="exact")
+    parser.add_argument("--database-url", default="", help="Scratch database for --backend pgvector")
+    parser.add_argument("--documents", help="JSONL corpus instead of the synthetic one")
+    parser.add_argument("--queries", help="JSONL labelled queries (with --documents)")
+    parser.add_argument("--patients", type=int, default=50)
+    parser.add_argument("--visits", type=int, default=4)
+    parser.add_argument("--query-count", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--chunk-sizes", type=csv_list(str), default=["300:500", "500:800", "800:1200"],
+                        help="treatment_summary:transcription sizes in characters")
+    parser.add_argument("--dimensions", type=csv_list(int), default=[768])
+    parser.add_argument("--quantization", type=csv_list(str), default=["float32"])
+    parser.add_argument("--m", type=csv_list(int), default=[16])
+    parser.add_argument("--ef-construction", type=csv_list(int), default=[64])
+    parser.add_argument("--ef-search", type=csv_list(int), default=[40])
+    parser.add_argument("--top-k", type=csv_list(int), default=[5, 10])
+    parser.add_argument("--thresholds", type=csv_list(float), default=[0.0, 0.2, 0.3, 0.4])
+    parser.add_argument("--output", help="Write all rows as .json or .csv")
+    args = parser.parse_args()
+
+    if args.documents and not args.queries:
+        parser.error("--queries is required with --documents")
+    if args.backend == "pgvector" and not args.database_url:
+        parser.error("--database-url is required for --backend pgvector")
+    for mode in args.quantization:
+        if mode not in QUANTIZATION_BYTES:
+            parser.error(f"Unknown quantization: {mode}")
+
+    documents, queries = load_corpus(args)
+    cache = EmbeddingCache()
+    query_embeddings = cache.embed([q["query"] for q in queries])
+    print(f"{len(documents)} documents, {len(queries)} queries")
+
+    backend = BACKENDS[args.backend]
+    index_params = (
+        list(itertools.product(args.m, args.ef_construction)) if backend.tunable else [(None, None)]
+    )
+    ef_searches = args.ef_search if backend.tunable else [None]
+    extra = {"database_url": args.database_url} if args.backend == "pgvector" else {}
+
+    rows = []
+    for sizes in args.chunk_sizes:
+        summary_size, transcription_size = (int(s) for s in sizes.split(":"))
+        chunk_size = {"treatment_summary": summary_size, "transcription": transcription_size}
+        chunk_sources, chunk_texts = [], []
+        for doc in documents:
+            for chunk in chunk_text(doc["text"], chunk_size=chunk_size[doc["kind"]]):
+                chunk_sources.append(doc["id"])
+                chunk_texts.append(chunk)
+        embeddings = cache.embed(chunk_texts)
+
+        for dimension, quantization, (m, ef_construction) in itertools.product(
+            args.dimensions, args.quantization, index_params
+        ):
+            vectors = prepare_vectors(embeddings, dimension, quantization)
+            query_vectors = prepare_vectors(query_embeddings, dimension, "float32")
+            start = time.perf_counter()
+            index = backend(vectors, quantization, m=m, ef_construction=ef_construction, **extra)
+            build_seconds = time.perf_counter() - start
+            try:
+                for ef_search in ef_searches:
+                    for row in evaluate(index, chunk_sources, query_vectors, queries,
+                                        ef_search or 0, args.top_k, args.thresholds):
+                        rows.append({
+                            "chunk_sizes": sizes,
+                            "chunks": len(chunk_texts),
+                            "dimension": dimension,
+                            "quantization": quantization,
+                            "m": m,
+                            "ef_construction": ef_construction,
+                            "ef_search": ef_search,
+                            **row,
+                            "index_bytes": index.size_bytes,
+                            "build_seconds": round(build_seconds, 3),
+                        })
+            finally:
+                index.close()
+            print(f"  built {sizes} d={dimension} {quantization} m={m} "
+                  f"efc={ef_construction} in {build_seconds:.2f}s", flush=True)
+
+    pareto_front(rows)
+    print(f"\nEmbedding time: {cache.seconds:.1f}s for {len(cache.vectors)} texts")
+    header = ("chunks", "dim", "quant", "m", "efc", "efs", "k", "thr",
+              "recall", "mrr", "p95 ms", "index KB", "build s")
+    print("  ".join(f"{h:>8}" for h in header))
+    for row in sorted(rows, key=lambda r: (-r["recall"], -r["mrr"], r["latency_p95_ms"])):
+        if not row["pareto"]:
+            continue
+        values = (row["chunk_sizes"], row["dimension"], row["quantization"], row["m"],
+                  row["ef_construction"], row["ef_search"], row["top_k"], row["threshold"],
+                  row["recall"], row["mrr"], row["latency_p95_ms"],
+                  round(row["index_bytes"] / 1024), row["build_seconds"])
+        print("  ".join(f"{str(v):>8}" for v in values))
+    print(f"{sum(r['pareto'] for r in rows)} Pareto-optimal of {len(rows)} configurations")
+
+    if args.output:
+        path = Path(args.output)
+        if path.suffix == ".csv":
+            with path.open("w", newline="") as handle:
+                writer = csv.DictWriter(handle, fieldnames=list(rows[0]))
+                writer.writeheader()
+                writer.writerows(rows)
+        else:
+            path.write_text(json.dumps(rows, indent=2))
+        print(f"Wrote {path}")
+
+
+if __name__ == "__main__":
+    main()
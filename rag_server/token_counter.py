@@ -0,0 +1,82 @@
+"""
+Token counting for chunk sizing.
+Loads the embedding model's tokenizer from a local tokenizer.json once and
+measures chunks in the tokens the embedding model actually sees.
+"""
+
+import os
+import logging
+from functools import lru_cache
+from typing import Callable
+
+logger = logging.getLogger("rag_server")
+
+# "chars" (default) or "tokens"
+CHUNK_SIZE_UNIT = os.environ.get("CHUNK_SIZE_UNIT", "chars")
+# tokenizer.json of the embedding model (nomic-embed-text uses a BERT WordPiece vocabulary)
+EMBEDDING_TOKENIZER_PATH = os.environ.get("EMBEDDING_TOKENIZER_PATH", "")
+
+# Chunk sizes per document type, in characters and in tokens
+CHUNK_SIZES = {
+    "treatment_summary": {
+        "chars": 500,
+        "tokens": int(os.environ.get("CHUNK_TOKENS_TREATMENT_SUMMARY", "256")),
+    },
+    "transcription": {
+        "chars": 800,
+        "tokens": int(os.environ.get("CHUNK_TOKENS_TRANSCRIPTION", "384")),
+    },
+}
+
+
+@lru_cache(maxsize=1)
+def load_tokenizer(path: str):
+    """Load a tokenizer.json once; the vocabulary stays cached for the process."""
+    from tokenizers import Tokenizer
+
+    tokenizer = Tokenizer.from_file(path)
+    logger.info(f"Loaded tokenizer from {path} (vocab size {tokenizer.get_vocab_size()})")
+    return tokenizer
+
+
+@lru_cache(maxsize=65536)
+def count_tokens(text: str) -> int:
+    """Number of model tokens in text, without special tokens.
+
+    Raises:
+        RuntimeError: If no tokenizer is configured.
+    """
+    if not EMBEDDING_TOKENIZER_PATH:
+        raise RuntimeError("EMBEDDING_TOKENIZER_PATH is not set")
+    tokenizer = load_tokenizer(EMBEDDING_TOKENIZER_PATH)
+    return len(tokenizer.encode(text, add_special_tokens=False).ids)
+
+
+@lru_cache(maxsize=1)
+def tokens_available() -> bool:
+    """True if token-based sizing can be used."""
+    if not EMBEDDING_TOKENIZER_PATH:
+        return False
+    try:
+        load_tokenizer(EMBEDDING_TOKENIZER_PATH)
+        return True
+    except Exception as e:
+        logger.warning(f"Tokenizer unavailable, sizing chunks in characters: {e}")
+        return False
+
+
+def chunk_sizing(kind: str, unit: str | None = None) -> tuple[int, Callable[[str], int]]:
+    """Chunk size and length function for a document type.
+
+    Args:
+        kind: Key of CHUNK_SIZES ("treatment_summary" or "transcription").
+        unit: "chars" or "tokens"; defaults to CHUNK_SIZE_UNIT. Falls back
+            to characters if the tokenizer can't be loaded.
+
+    Returns:
+        (chunk_size, length_function) for the streaming chunker.
+    """
+    unit = unit or CHUNK_SIZE_UNIT
+    if unit == "tokens" and tokens_available():
+        return CHUNK_SIZES[kind]["tokens"], count_tokens
+    return CHUNK_SIZES[kind]["chars"], len
@@ -0,0 +1,206 @@
+"""
+Per-request tracing and opt-in profiling for the RAG server.
+
+Every request gets a trace ID, taken from the X-Request-ID header the
+Next.js proxy sends or generated here. The trace collects how long each
+stage took (embedding, search, context building, Ollama load/prefill/decode).
+It is returned as a Server-Timing header, or as an SSE "timing" event for
+streamed responses, and the ID prefixes every rag_server log line.
+
+Profiling is armed through an admin endpoint for the next N requests and
+writes one cProfile file per request to RAG_PROFILE_DIR.
+"""
+
+import cProfile
+import logging
+import os
+import re
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from contextvars import ContextVar
+from pathlib import Path
+
+logger = logging.getLogger("rag_server")
+
+TRACE_HEADER = "X-Request-ID"
+# Profiling stays off unless enabled, even with the internal key
+PROFILING_ENABLED = os.environ.get("RAG_PROFILING_ENABLED", "false").lower() == "true"
+PROFILE_DIR = Path(os.environ.get("RAG_PROFILE_DIR", "/tmp/rag_profiles"))
+
+_VALID_TRACE_ID = re.compile(r"^[A-Za-z0-9._-]{1,64}$")
+
+
+class Trace:
+    def __init__(self, trace_id: str):
+        self.trace_id = trace_id
+        self.start = time.perf_counter()
+        self._spans: dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def add(self, name: str, seconds: float):
+        """Add time to a stage. Repeated stages (e.g. in a batch) are summed."""
+        with self._lock:
+            self._spans[name] = self._spans.get(name, 0.0) + seconds
+
+    def timings(self) -> dict[str, float]:
+        """Stage durations in milliseconds, plus the total so far."""
+        with self._lock:
+            timings = {name: round(seconds * 1000, 1) for name, seconds in self._spans.items()}
+        timings["total"] = round((time.perf_counter() - self.start) * 1000, 1)
+        return timings
+
+    def server_timing(self) -> str:
+        return ", ".join(f"{name};dur={ms}" for name, ms in self.timings().items())
+
+
+current_trace: ContextVar[Trace | None] = ContextVar("current_trace", default=None)
+
+
+def trace_id() -> str | None:
+    trace = current_trace.get()
+    return trace.trace_id if trace else None
+
+
+def timings() -> dict[str, float]:
+    trace = current_trace.get()
+    return trace.timings() if trace else {}
+
+
+def record(name: str, seconds: float):
+    trace = current_trace.get()
+    if trace is not None:
+        trace.add(name, seconds)
+
+
+@contextmanager
+def span(name: str):
+    """Record the duration of the block as a stage of the current trace."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(name, time.perf_counter() - start)
+
+
+def record_ollama(response):
+    """Record Ollama's own load, prefill and decode durations (nanoseconds)."""
+    for field, name in (
+        ("load_duration", "ollama_load"),
+        ("prompt_eval_duration", "prefill"),
+        ("eval_duration", "decode"),
+    ):
+        if isinstance(response, dict):
+            value = response.get(field)
+        else:
+            value = getattr(response, field, None)
+        if value:
+            record(name, value / 1e9)
+
+
+class TraceLogFilter(logging.Filter):
+    """Prefixes log messages with the current trace ID."""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        current = trace_id()
+        if current:
+            record.msg = f"[{current}] {record.msg}"
+        return True
+
+
+class Profiler:
+    """Profiles the next N requests, one at a time, with cProfile.
+
+    cProfile sees everything on the event loop thread while a request is
+    profiled, including other requests interleaved with it, but not work
+    handed to worker threads.
+    """
+
+    def __init__(self, directory: Path = PROFILE_DIR):
+        self.directory = directory
+        self.remaining = 0
+        self.active = False
+        self.written: list[str] = []
+        self._lock = threading.Lock()
+
+    def arm(self, count: int):
+        with self._lock:
+            self.remaining = count
+
+    def claim(self) -> bool:
+        """Take a sample slot for this request, if one is left and none is running."""
+        with self._lock:
+            if self.remaining <= 0 or self.active:
+                return False
+            self.remaining -= 1
+            self.active = True
+            return True
+
+    def finish(self, profile: cProfile.Profile, trace_id: str, path: str):
+        profile.disable()
+        try:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            name = f"{time.strftime('%Y%m%d-%H%M%S')}-{path.strip('/').replace('/', '_')}-{trace_id}.prof"
+            profile.dump_stats(str(self.directory / name))
+            self.written.append(name)
+            logger.info(f"Wrote profile {self.directory / name}")
+        except OSError as e:
+            logger.error(f"Could not write profile: {e}")
+        finally:
+            with self._lock:
+                self.active = False
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "enabled": PROFILING_ENABLED,
+                "remaining": self.remaining,
+                "active": self.active,
+                "directory": str(self.directory),
+                "profiles": list(self.written[-20:]),
+            }
+
+
+profiler = Profiler()
+
+
+class TraceMiddleware:
+    """Starts a trace per request and reports it in the response headers.
+
+    Server-Timing is sent with the response headers, so it covers the work
+    done before the response started: all of it for JSON endpoints, none of
+    the generation for streams (those send a timing event instead).
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        incoming = dict(scope["headers"]).get(TRACE_HEADER.lower().encode(), b"").decode("latin-1")
+        trace = Trace(incoming if _VALID_TRACE_ID.match(incoming) else uuid.uuid4().hex)
+        token = current_trace.set(trace)
+
+        profile = None
+        if PROFILING_ENABLED and scope["path"] != "/metrics" and profiler.claim():
+            profile = cProfile.Profile()
+            profile.enable()
+
+        async def send_with_trace(message):
+            if message["type"] == "http.response.start":
+                headers = list(message.get("headers", []))
+                headers.append((TRACE_HEADER.lower().encode(), trace.trace_id.encode()))
+                headers.append((b"server-timing", trace.server_timing().encode()))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_trace)
+        finally:
+            if profile is not None:
+                profiler.finish(profile, trace.trace_id, scope["path"])
+            current_trace.reset(token)
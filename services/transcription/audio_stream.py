@@ -0,0 +1,138 @@
+"""
+Audio decoding with ffmpeg
+Turns container bytes (webm/ogg/mp3/wav...) into 16 kHz mono PCM, either
+incrementally while they are still arriving or for a complete file ahead
+of inference
+"""
+
+import queue
+import subprocess
+from pathlib import Path
+from threading import Thread
+
+import numpy as np
+
+from transcriber import SAMPLE_RATE
+
+# One second of 16-bit PCM per read
+READ_SIZE = SAMPLE_RATE * 2
+
+
+class PcmStream:
+    """Pipe container bytes through ffmpeg and read back float32 PCM chunks.
+
+    Writers call ``write`` as bytes arrive and ``close_input`` when done;
+    a reader thread drains ffmpeg's stdout into a queue so writes never
+    wait on the consumer. ``chunks`` yields arrays until ffmpeg exits.
+    """
+
+    def __init__(self):
+        self.process = subprocess.Popen(
+            [
+                "ffmpeg", "-hide_banner", "-loglevel", "error",
+                "-i", "pipe:0",
+                "-f", "s16le", "-ac", "1", "-ar", str(SAMPLE_RATE),
+                "pipe:1",
+            ],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+        )
+        self._pcm: queue.Queue = queue.Queue()
+        self._stderr: list[bytes] = []
+        self.input_closed = False
+
+        Thread(target=self._read_stdout, daemon=True).start()
+        Thread(target=self._read_stderr, daemon=True).start()
+
+    def _read_stdout(self):
+        while True:
+            data = self.process.stdout.read(READ_SIZE)
+            if not data:
+                break
+            data = data[:len(data) - len(data) % 2]
+            pcm = np.frombuffer(data, dtype=np.int16).astype(np.float32) / 32768.0
+            self._pcm.put(pcm)
+        self._pcm.put(None)
+
+    def _read_stderr(self):
+        for line in self.process.stderr:
+            self._stderr.append(line)
+
+    def write(self, data: bytes) -> bool:
+        """Feed container bytes. Returns False once ffmpeg has stopped accepting input."""
+        if self.input_closed:
+            return False
+        try:
+            self.process.stdin.write(data)
+            self.process.stdin.flush()
+            return True
+        except (BrokenPipeError, ValueError):
+            # ffmpeg gave up (e.g. MP4 with its index at the end of the file)
+            self.input_closed = True
+            return False
+
+    def close_input(self):
+        if not self.input_closed:
+            self.input_closed = True
+            try:
+                self.process.stdin.close()
+            except (BrokenPipeError, ValueError):
+                pass
+
+    def chunks(self):
+        """Yield decoded PCM arrays until ffmpeg reaches end of stream."""
+        while True:
+            pcm = self._pcm.get()
+            if pcm is None:
+                break
+            yield pcm
+        self.process.wait()
+
+    @property
+    def failed(self) -> bool:
+        return self.process.poll() not in (None, 0)
+
+    @property
+    def error(self) -> str:
+        return b"".join(self._stderr).decode(errors="replace").strip()
+
+    def abort(self):
+        self.input_closed = True
+        self.process.kill()
+
+
+def decode_file(path: str, scratch_path: str, mmap_threshold_seconds: float = 600) -> np.ndarray:
+    """Decode a complete audio file to 16 kHz mono float32.
+
+    ffmpeg writes raw PCM to ``scratch_path``. Short recordings are loaded
+    into memory and the scratch file removed; longer ones are returned as a
+    read-only memory map of the scratch file so queued jobs don't pin
+    hundreds of MB of RAM (the caller removes the file when done).
+    """
+    process = subprocess.run(
+        [
+            "ffmpeg", "-hide_banner", "-loglevel", "error", "-y",
+            "-i", path,
+            "-f", "f32le", "-ac", "1", "-ar", str(SAMPLE_RATE),
+            scratch_path,
+        ],
+        capture_output=True,
+    )
+    if process.returncode != 0:
+        Path(scratch_path).unlink(missing_ok=True)
+        raise RuntimeError(
+            f"Audio decoding failed: {process.stderr.decode(errors='replace').strip()}"
+        )
+
+    samples = Path(scratch_path).stat().st_size // 4
+    if samples == 0:
+        Path(scratch_path).unlink(missing_ok=True)
+        raise RuntimeError("Audio decoding produced no samples")
+
+    if samples < mmap_threshold_seconds * SAMPLE_RATE:
+        audio = np.fromfile(scratch_path, dtype=np.float32)
+        Path(scratch_path).unlink(missing_ok=True)
+        return audio
+
+    return np.memmap(scratch_path, dtype=np.float32, mode="r", shape=(samples,))
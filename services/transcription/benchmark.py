@@ -0,0 +1,354 @@
+"""
+Transcription throughput benchmark
+Runs recordings through the service's decode pool and inference workers
+in-process and sweeps compute_type, beam_size, cpu_threads and inference
+workers. Each configuration runs in a fresh process, so its peak memory and
+CPU time are its own. Reports real-time factor, turnaround, queue wait, CPU
+utilization and peak RSS, and recommends the configuration with the highest
+sustained throughput that fits the host's memory (and turnaround target)
+
+Fixture audio is synthesized per length and format (Hebrew speech with
+espeak-ng when installed, speech-like babble otherwise) and cached in
+--fixture-dir; pass --fixtures to use real (de-identified) recordings.
+
+Usage:
+  python benchmark.py --model Systran/faster-whisper-medium \\
+      --compute-types int8,int8_float32 --beam-sizes 5,1 \\
+      --cpu-threads 2,4 --workers 1,2 --concurrency 4 --output bench.json
+"""
+
+import argparse
+import itertools
+import json
+import os
+import resource
+import shutil
+import subprocess
+import tempfile
+import time
+import wave
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+from pathlib import Path
+from threading import Semaphore
+
+import numpy as np
+
+from transcriber import SAMPLE_RATE
+
+ENCODERS = {
+    "wav": ["-c:a", "pcm_s16le"],
+    "mp3": ["-c:a", "libmp3lame", "-b:a", "64k"],
+    "webm": ["-c:a", "libopus", "-b:a", "32k"],
+}
+FIXTURE_EXTENSIONS = {".mp4", ".mp3", ".wav", ".m4a", ".flac", ".ogg", ".webm"}
+
+SPEECH_TEXT = (
+    "שלום, אני מרגיש כאבי ראש וסחרחורת כבר שבועיים. "
+    "הרופא בדק את לחץ הדם והמליץ על מעקב ביתי והפחתת מלח. "
+    "נקבע ביקור חוזר בעוד חודש ובדיקות דם כלליות. "
+)
+
+
+def csv_list(cast):
+    return lambda value: [cast(v) for v in value.split(",") if v]
+
+
+def percentile(values: list[float], pct: float) -> float | None:
+    if not values:
+        return None
+    ordered = sorted(values)
+    return round(ordered[min(int(len(ordered) * pct / 100), len(ordered) - 1)], 3)
+
+
+def write_babble(path: Path, seconds: float, seed: int = 0):
+    """Speech-like audio: voiced syllables on a wandering pitch, with pauses"""
+    rng = np.random.default_rng(seed)
+    pieces, total = [], int(seconds * SAMPLE_RATE)
+    length = 0
+    while length < total:
+        n = int(rng.uniform(0.12, 0.3) * SAMPLE_RATE)
+        t = np.arange(n) / SAMPLE_RATE
+        f0 = rng.uniform(100, 220)
+        tone = sum(np.sin(2 * np.pi * f0 * h * t) / h for h in range(1, 6))
+        envelope = np.sin(np.pi * np.arange(n) / n)
+        pieces.append(tone * envelope * 0.2)
+        gap = int(rng.choice([0.03, 0.05, 0.4], p=[0.6, 0.3, 0.1]) * SAMPLE_RATE)
+        pieces.append(np.zeros(gap))
+        length += n + gap
+    audio = np.concatenate(pieces)[:total]
+    audio += rng.standard_normal(total) * 0.003
+    with wave.open(str(path), "wb") as out:
+        out.setnchannels(1)
+        out.setsampwidth(2)
+        out.setframerate(SAMPLE_RATE)
+        out.writeframes((np.clip(audio, -1, 1) * 32767).astype(np.int16).tobytes())
+
+
+def write_source(path: Path, seconds: float):
+    """A WAV of about ``seconds`` of speech, looped from espeak-ng if available"""
+    if shutil.which("espeak-ng") is None:
+        write_babble(path, seconds)
+        return
+    with tempfile.TemporaryDirectory() as scratch:
+        spoken = Path(scratch) / "speech.wav"
+        subprocess.run(["espeak-ng", "-v", "he", "-w", str(spoken), SPEECH_TEXT * 3],
+                       check=True, capture_output=True)
+        subprocess.run(
+            ["ffmpeg", "-hide_banner", "-loglevel", "error", "-y",
+             "-stream_loop", "-1", "-i", str(spoken), "-t", str(seconds),
+             "-ac", "1", "-ar", str(SAMPLE_RATE), str(path)],
+            check=True, capture_output=True,
+        )
+
+
+def build_fixtures(directory: Path, lengths: list[float], formats: list[str]) -> list[Path]:
+    """Encode one recording per (length, format), reusing files from earlier runs"""
+    directory.mkdir(parents=True, exist_ok=True)
+    fixtures = []
+    for seconds in lengths:
+        source = directory / f"source_{seconds:g}s.wav"
+        if not source.exists():
+            write_source(source, seconds)
+        for fmt in formats:
+            path = directory / f"speech_{seconds:g}s.{fmt}"
+            if not path.exists():
+                subprocess.run(
+                    ["ffmpeg", "-hide_banner", "-loglevel", "error", "-y",
+                     "-i", str(source), *ENCODERS[fmt], str(path)],
+                    check=True, capture_output=True,
+                )
+            fixtures.append(path)
+    return fixtures
+
+
+def cpu_seconds() -> float:
+    """CPU time of this process plus reaped children (the ffmpeg decodes)"""
+    total = 0.0
+    for who in (resource.RUSAGE_SELF, resource.RUSAGE_CHILDREN):
+        usage = resource.getrusage(who)
+        total += usage.ru_utime + usage.ru_stime
+    return total
+
+
+def run_configuration(config: dict, fixtures: list[str], options: dict) -> dict:
+    """Load the model for one configuration and push every job through the pipeline.
+
+    Runs in its own process; jobs are kept ``concurrency`` in flight.
+    """
+    import telemetry
+    from audio_stream import decode_file
+    from pipeline import TranscriptionPipeline
+    from transcriber import Transcriber
+
+    transcriber = Transcriber(
+        model_name=options["model"],
+        compute_type=config["compute_type"],
+        beam_size=config["beam_size"],
+        num_workers=config["workers"],
+        cpu_threads=config["cpu_threads"],
+    )
+    transcriber.preload()
+    if transcriber.state != "ready":
+        return {**config, "error": transcriber.load_error}
+
+    job_telemetry = telemetry.JobTelemetry()
+    jobs: dict[str, dict] = {}
+    slots = Semaphore(options["concurrency"])
+    scratch = Path(tempfile.mkdtemp(prefix="transcription-bench-"))
+
+    def decode(job_id: str):
+        job_telemetry.mark(job_id, "decode_started")
+        job_telemetry.track_memory(job_id)
+        started = time.monotonic()
+        audio = decode_file(jobs[job_id]["path"], str(scratch / f"{job_id}.pcm"))
+        jobs[job_id]["decode_seconds"] = time.monotonic() - started
+        job_telemetry.mark(job_id, "decoded")
+        return audio
+
+    def infer(job_id: str, audio):
+        job = jobs[job_id]
+        try:
+            if isinstance(audio, Exception):
+                raise audio
+            job["queue_wait_seconds"] = job_telemetry.queue_wait(job_id)
+            started = time.monotonic()
+            result = transcriber.transcribe(job["path"], audio=audio)
+            job["inference_seconds"] = time.monotonic() - started
+            job["audio_seconds"] = result["duration_seconds"]
+        except Exception as e:
+            job["error"] = str(e)
+        finally:
+            job_telemetry.finish(job_id)
+            del audio
+            (scratch / f"{job_id}.pcm").unlink(missing_ok=True)
+            job["turnaround_seconds"] = time.monotonic() - job["submitted"]
+            slots.release()
+
+    pipeline = TranscriptionPipeline(
+        decode, infer,
+        decode_workers=options["decode_workers"],
+        inference_workers=config["workers"],
+        queue_size=options["queue_size"],
+    )
+
+    cpu_before = cpu_seconds()
+    started = time.monotonic()
+    for i, path in enumerate(fixtures * options["repeat"]):
+        slots.acquire()
+        job_id = f"job-{i}"
+        jobs[job_id] = {"path": path, "submitted": time.monotonic()}
+        job_telemetry.mark(job_id, "submitted")
+        pipeline.submit(job_id)
+    for _ in range(options["concurrency"]):
+        slots.acquire()
+    wall = time.monotonic() - started
+    cpu = cpu_seconds() - cpu_before
+    shutil.rmtree(scratch, ignore_errors=True)
+
+    finished = [job for job in jobs.values() if "error" not in job]
+    rtfs = [job["inference_seconds"] / job["audio_seconds"]
+            for job in finished if job["audio_seconds"]]
+    audio_seconds = sum(job["audio_seconds"] for job in finished)
+    return {
+        **config,
+        "jobs": len(jobs),
+        "errors": len(jobs) - len(finished),
+        "load_seconds": transcriber.load_seconds,
+        "throughput": round(audio_seconds / wall, 3),
+        "rtf_mean": round(sum(rtfs) / len(rtfs), 3) if rtfs else None,
+        "rtf_p95": percentile(rtfs, 95),
+        "turnaround_p50": percentile([j["turnaround_seconds"] for j in finished], 50),
+        "turnaround_p95": percentile([j["turnaround_seconds"] for j in finished], 95),
+        "queue_wait_p50": percentile([j["queue_wait_seconds"] for j in finished
+                                      if j["queue_wait_seconds"] is not None], 50),
+        "queue_wait_p95": percentile([j["queue_wait_seconds"] for j in finished
+                                      if j["queue_wait_seconds"] is not None], 95),
+        "decode_p50": percentile([j["decode_seconds"] for j in finished], 50),
+        "cpu_utilization": round(cpu / (wall * (os.cpu_count() or 1)), 3),
+        # ru_maxrss is in KiB on Linux; covers model load as well as the jobs
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024),
+    }
+
+
+def host_memory_mb() -> float | None:
+    try:
+        with open("/proc/meminfo") as meminfo:
+            for line in meminfo:
+                if line.startswith("MemTotal:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return None
+
+
+def recommend(results: list[dict], memory_limit_mb: float | None,
+              target_turnaround: float) -> dict | None:
+    """Highest throughput among error-free runs within memory and turnaround limits"""
+    eligible = [
+        r for r in results
+        if "error" not in r and not r["errors"]
+        and (memory_limit_mb is None or r["peak_rss_mb"] <= memory_limit_mb)
+        and (target_turnaround <= 0 or r["turnaround_p95"] <= target_turnaround)
+    ]
+    return max(eligible, key=lambda r: r["throughput"], default=None)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--model", default="Systran/faster-whisper-medium")
+    parser.add_argument("--compute-types", type=csv_list(str), default=["int8"])
+    parser.add_argument("--beam-sizes", type=csv_list(int), default=[5])
+    parser.add_argument("--cpu-threads", type=csv_list(int), default=[0],
+                        help="Threads per inference worker (0 = library default)")
+    parser.add_argument("--workers", type=csv_list(int), default=[1],
+                        help="Inference worker counts")
+    parser.add_argument("--decode-workers", type=int, default=2)
+    parser.add_argument("--queue-size", type=int, default=2)
+    parser.add_argument("--concurrency", type=int, default=2, help="Jobs kept in flight")
+    parser.add_argument("--repeat", type=int, default=1, help="Submissions of each fixture")
+    parser.add_argument("--lengths", type=csv_list(float), default=[30, 120, 600],
+                        help="Synthetic fixture lengths in seconds")
+    parser.add_argument("--formats", type=csv_list(str), default=list(ENCODERS))
+    parser.add_argument("--fixture-dir", default=str(Path(tempfile.gettempdir()) / "transcription-bench-fixtures"))
+    parser.add_argument("--fixtures", help="Directory of recordings to use instead")
+    parser.add_argument("--target-turnaround", type=float, default=0,
+                        help="Only recommend configs whose p95 turnaround is within this")
+    parser.add_argument("--memory-limit-mb", type=float,
+                        help="Only recommend configs under this peak RSS (default 80%% of RAM)")
+    parser.add_argument("--output", help="Write all results as JSON")
+    args = parser.parse_args()
+
+    unknown = set(args.formats) - set(ENCODERS)
+    if unknown:
+        parser.error(f"Unknown formats: {', '.join(sorted(unknown))}")
+
+    if args.fixtures:
+        fixtures = sorted(p for p in Path(args.fixtures).iterdir()
+                          if p.suffix.lower() in FIXTURE_EXTENSIONS)
+        if not fixtures:
+            parser.error(f"No recordings in {args.fixtures}")
+    else:
+        fixtures = build_fixtures(Path(args.fixture_dir), args.lengths, args.formats)
+    print(f"{len(fixtures)} fixtures x {args.repeat}, concurrency {args.concurrency}, "
+          f"{os.cpu_count()} CPUs")
+
+    options = {
+        "model": args.model,
+        "concurrency": args.concurrency,
+        "repeat": args.repeat,
+        "decode_workers": args.decode_workers,
+        "queue_size": args.queue_size,
+    }
+    results = []
+    for compute_type, beam_size, cpu_threads, workers in itertools.product(
+        args.compute_types, args.beam_sizes, args.cpu_threads, args.workers
+    ):
+        config = {"compute_type": compute_type, "beam_size": beam_size,
+                  "cpu_threads": cpu_threads, "workers": workers}
+        print(f"Running {config}", flush=True)
+        with ProcessPoolExecutor(max_workers=1, mp_context=get_context("spawn")) as executor:
+            try:
+                result = executor.submit(
+                    run_configuration, config, [str(p) for p in fixtures], options
+                ).result()
+            except Exception as e:
+                result = {**config, "error": str(e)}
+        results.append(result)
+        if "error" in result:
+            print(f"  failed: {result['error']}")
+        else:
+            print(f"  throughput {result['throughput']}x real time, RTF {result['rtf_mean']}, "
+                  f"turnaround p95 {result['turnaround_p95']}s, "
+                  f"queue wait p95 {result['queue_wait_p95']}s, "
+                  f"CPU {result['cpu_utilization']:.0%}, peak {result['peak_rss_mb']} MB, "
+                  f"{result['errors']} errors")
+
+    memory_limit = args.memory_limit_mb
+    if memory_limit is None and host_memory_mb():
+        memory_limit = host_memory_mb() * 0.8
+    best = recommend(results, memory_limit, args.target_turnaround)
+
+    print()
+    if best is None:
+        print("No configuration met the limits")
+    else:
+        print(f"Recommended for this host ({best['throughput']}x real time):")
+        print(f"  TRANSCRIPTION_COMPUTE_TYPE={best['compute_type']}")
+        print(f"  TRANSCRIPTION_BEAM_SIZES={best['beam_size']}")
+        print(f"  TRANSCRIPTION_CPU_THREADS={best['cpu_threads']}")
+        print(f"  TRANSCRIPTION_INFERENCE_WORKERS={best['workers']}")
+        if len(args.compute_types) > 1 or len(args.beam_sizes) > 1:
+            print("  compute_type and beam_size also change accuracy - check transcripts "
+                  "before trading them for speed")
+
+    if args.output:
+        Path(args.output).write_text(json.dumps(
+            {"cpus": os.cpu_count(), "options": options, "results": results,
+             "recommended": best}, indent=2, ensure_ascii=False,
+        ))
+        print(f"Wrote {args.output}")
+
+
+if __name__ == "__main__":
+    main()
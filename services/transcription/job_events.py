@@ -0,0 +1,40 @@
+"""
+Per-job event fan-out for Server-Sent Events
+Worker threads publish progress and segment deltas; each SSE connection
+owns an asyncio queue that receives them on its event loop
+"""
+
+import asyncio
+from collections import defaultdict
+from threading import Lock
+
+
+class JobEvents:
+    def __init__(self):
+        self._subscribers: dict[str, list[tuple[asyncio.AbstractEventLoop, asyncio.Queue]]] = defaultdict(list)
+        self._lock = Lock()
+
+    def subscribe(self, job_id: str) -> asyncio.Queue:
+        """Register a queue on the running event loop for a job's events"""
+        queue: asyncio.Queue = asyncio.Queue()
+        with self._lock:
+            self._subscribers[job_id].append((asyncio.get_running_loop(), queue))
+        return queue
+
+    def unsubscribe(self, job_id: str, queue: asyncio.Queue):
+        with self._lock:
+            subscribers = self._subscribers.get(job_id, [])
+            self._subscribers[job_id] = [s for s in subscribers if s[1] is not queue]
+            if not self._subscribers[job_id]:
+                del self._subscribers[job_id]
+
+    def publish(self, job_id: str, event: dict):
+        """Deliver an event to every subscriber. Safe to call from any thread."""
+        with self._lock:
+            subscribers = list(self._subscribers.get(job_id, []))
+        for loop, queue in subscribers:
+            try:
+                loop.call_soon_threadsafe(queue.put_nowait, event)
+            except RuntimeError:
+                # Subscriber's loop already closed
+                pass
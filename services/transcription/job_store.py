@@ -0,0 +1,192 @@
+"""
+Bounded job store
+Keeps a compact record per job in memory and moves the large fields
+(transcript text and segments) to SQLite once a job finishes. Finished
+jobs expire after a TTL, and the in-memory table is capped with LRU
+eviction; expired jobs lose their database row and output files too
+"""
+
+import json
+import sqlite3
+import time
+from collections import OrderedDict
+from pathlib import Path
+from threading import Lock
+
+TERMINAL_STATUSES = ("completed", "error")
+
+
+class JobStore:
+    def __init__(self, db_path: Path, ttl_seconds: float, max_jobs: int):
+        self.db_path = Path(db_path)
+        self.ttl_seconds = ttl_seconds
+        self.max_jobs = max_jobs
+        self._lock = Lock()
+        self._records: OrderedDict[str, dict] = OrderedDict()
+
+        self._db = sqlite3.connect(str(self.db_path), check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            " id TEXT PRIMARY KEY,"
+            " record TEXT NOT NULL,"
+            " transcription_text TEXT,"
+            " segments TEXT,"
+            " finished_at REAL)"
+        )
+        self._db.commit()
+        self._load()
+
+    def _load(self):
+        """Restore finished jobs from a previous run (only finished jobs are persisted)"""
+        rows = self._db.execute(
+            "SELECT id, record FROM jobs ORDER BY finished_at"
+        ).fetchall()
+        for job_id, record_json in rows:
+            self._records[job_id] = json.loads(record_json)
+
+    # --- mapping interface over the compact records ---
+
+    def __contains__(self, job_id: str) -> bool:
+        return job_id in self._records
+
+    def __getitem__(self, job_id: str) -> dict:
+        with self._lock:
+            record = self._records[job_id]
+            self._records.move_to_end(job_id)
+        return record
+
+    def get(self, job_id: str, default=None):
+        try:
+            return self[job_id]
+        except KeyError:
+            return default
+
+    def __setitem__(self, job_id: str, record: dict):
+        with self._lock:
+            self._records[job_id] = record
+            self._records.move_to_end(job_id)
+        self._evict_over_capacity()
+
+    def __len__(self) -> int:
+        return len(self._records)
+
+    def items(self) -> list[tuple[str, dict]]:
+        with self._lock:
+            return list(self._records.items())
+
+    # --- large fields ---
+
+    def finish(self, job_id: str):
+        """Persist a finished job and drop its large fields from memory"""
+        record = self._records[job_id]
+        text = record.get("transcription_text")
+        segments = record.get("segments")
+        compact = {
+            **record,
+            "transcription_text": None,
+            "segments": None,
+            "has_result": text is not None,
+            "finished_at": time.time(),
+        }
+
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO jobs (id, record, transcription_text, segments, finished_at)"
+                " VALUES (?, ?, ?, ?, ?)",
+                (
+                    job_id,
+                    json.dumps(compact, ensure_ascii=False),
+                    text,
+                    json.dumps(segments, ensure_ascii=False) if segments is not None else None,
+                    compact["finished_at"],
+                ),
+            )
+            self._db.commit()
+            # Only drop the in-memory copies once the row is readable
+            record.update(compact)
+
+    def text(self, job_id: str) -> str | None:
+        record = self._records.get(job_id)
+        if record is None:
+            return None
+        if record.get("transcription_text") is not None or not record.get("has_result"):
+            return record.get("transcription_text")
+        with self._lock:
+            row = self._db.execute(
+                "SELECT transcription_text FROM jobs WHERE id = ?", (job_id,)
+            ).fetchone()
+        return row[0] if row else None
+
+    def segments(self, job_id: str) -> list[dict] | None:
+        record = self._records.get(job_id)
+        if record is None:
+            return None
+        if record.get("segments") is not None or not record.get("has_result"):
+            return record.get("segments")
+        with self._lock:
+            row = self._db.execute(
+                "SELECT segments FROM jobs WHERE id = ?", (job_id,)
+            ).fetchone()
+        return json.loads(row[0]) if row and row[0] else None
+
+    # --- eviction ---
+
+    def _evict_over_capacity(self) -> list[str]:
+        """LRU-evict finished jobs while the in-memory table is over capacity"""
+        evicted = []
+        with self._lock:
+            if len(self._records) <= self.max_jobs:
+                return evicted
+            for job_id, record in list(self._records.items()):
+                if len(self._records) - len(evicted) <= self.max_jobs:
+                    break
+                if record["status"] in TERMINAL_STATUSES:
+                    evicted.append(job_id)
+        for job_id in evicted:
+            self.delete(job_id)
+        return evicted
+
+    def expire(self) -> list[str]:
+        """Remove finished jobs older than the TTL. Returns the evicted IDs."""
+        cutoff = time.time() - self.ttl_seconds
+        expired = [
+            job_id for job_id, record in self.items()
+            if record["status"] in TERMINAL_STATUSES
+            and record.get("finished_at", time.time()) < cutoff
+        ]
+        for job_id in expired:
+            self.delete(job_id)
+        return expired + self._evict_over_capacity()
+
+    def delete(self, job_id: str):
+        with self._lock:
+            record = self._records.pop(job_id, None)
+            self._db.execute("DELETE FROM jobs WHERE id = ?", (job_id,))
+            self._db.commit()
+        if record:
+            paths = set((record.get("word_files") or {}).values())
+            if record.get("word_file_path"):
+                paths.add(record["word_file_path"])
+            for path in paths:
+                Path(path).unlink(missing_ok=True)
+
+    def stats(self) -> dict:
+        with self._lock:
+            active_segments = sum(len(r.get("segments") or []) for r in self._records.values())
+            active_text_bytes = sum(
+                len((r.get("transcription_text") or "").encode()) for r in self._records.values()
+            )
+            statuses: dict[str, int] = {}
+            for record in self._records.values():
+                statuses[record["status"]] = statuses.get(record["status"], 0) + 1
+            persisted = self._db.execute("SELECT COUNT(*) FROM jobs").fetchone()[0]
+        return {
+            "jobs_in_memory": len(self._records),
+            "jobs_by_status": statuses,
+            "jobs_persisted": persisted,
+            "in_memory_segments": active_segments,
+            "in_memory_text_bytes": active_text_bytes,
+            "db_bytes": self.db_path.stat().st_size if self.db_path.exists() else 0,
+            "ttl_seconds": self.ttl_seconds,
+            "max_jobs": self.max_jobs,
+        }
@@ -0,0 +1,105 @@
+"""
+Two-stage transcription pipeline
+A decode pool turns uploaded containers into 16 kHz mono PCM and hands it
+to the inference workers through a bounded queue, so ffmpeg decoding of the
+next job overlaps with Whisper inference on the current one
+"""
+
+import queue
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from threading import Lock, Semaphore, Thread
+
+
+class TranscriptionPipeline:
+    def __init__(
+        self,
+        decode_fn,
+        infer_fn,
+        decode_workers: int = 2,
+        inference_workers: int = 1,
+        queue_size: int = 2,
+        ready=None,
+    ):
+        """
+        Args:
+            decode_fn: ``decode_fn(job_id) -> audio`` run on the decode pool.
+                May return None to skip decoding (e.g. cached result).
+            infer_fn: ``infer_fn(job_id, audio)`` run on an inference worker.
+                ``audio`` is the exception instead if decoding failed.
+            decode_workers: Parallel decodes.
+            inference_workers: Parallel inference threads.
+            queue_size: Decoded jobs allowed to wait for inference. Decode
+                workers block when it is full, bounding PCM held in memory.
+            ready: Optional ``threading.Event``; inference waits for it so
+                jobs queue up until the model is loaded and warm.
+        """
+        self.decode_fn = decode_fn
+        self.infer_fn = infer_fn
+        self.inference_workers = inference_workers
+        self.ready = ready
+        self._decode_pool = ThreadPoolExecutor(
+            max_workers=decode_workers, thread_name_prefix="decode"
+        )
+        self._decoded: queue.Queue = queue.Queue(maxsize=queue_size)
+        # Inference slots, shared with work that runs outside the queue
+        self._slots = Semaphore(inference_workers)
+        self._lock = Lock()
+        self._decoding = 0
+        self._inferring = 0
+
+        for i in range(inference_workers):
+            Thread(target=self._inference_loop, name=f"inference-{i}", daemon=True).start()
+
+    def submit(self, job_id: str):
+        with self._lock:
+            self._decoding += 1
+        self._decode_pool.submit(self._decode, job_id)
+
+    def _decode(self, job_id: str):
+        try:
+            audio = self.decode_fn(job_id)
+        except Exception as e:
+            audio = e
+        finally:
+            with self._lock:
+                self._decoding -= 1
+        # Blocks while inference is behind - backpressure on the decode stage
+        self._decoded.put((job_id, audio))
+
+    def _inference_loop(self):
+        while True:
+            job_id, audio = self._decoded.get()
+            try:
+                with self.slot():
+                    self.infer_fn(job_id, audio)
+            except Exception as e:
+                print(f"Inference worker error for job {job_id}: {e}")
+
+    @contextmanager
+    def slot(self):
+        """Hold one of the inference slots.
+
+        Queued jobs run inside a slot; callers transcribing outside the queue
+        (e.g. streaming uploads, window by window) take one too, so total
+        concurrent inference stays at ``inference_workers``. Waits for
+        ``ready`` first.
+        """
+        if self.ready is not None:
+            self.ready.wait()
+        with self._slots:
+            with self._lock:
+                self._inferring += 1
+            try:
+                yield
+            finally:
+                with self._lock:
+                    self._inferring -= 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "decoding": self._decoding,
+                "decoded_waiting": self._decoded.qsize(),
+                "inferring": self._inferring,
+            }
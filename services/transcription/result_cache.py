@@ -0,0 +1,152 @@
+"""
+Content-addressed transcription result cache
+Results are keyed by the audio content hash plus model and decoding
+parameters, stored on disk and evicted least-recently-used once the
+cache grows past its size limit
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+from collections import OrderedDict
+from contextlib import contextmanager
+from pathlib import Path
+from threading import Lock
+
+
+class ResultCache:
+    def __init__(self, cache_dir: Path, max_bytes: int):
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self._lock = Lock()
+        # key -> total bytes on disk, least recently used first
+        self._entries: OrderedDict[str, int] = OrderedDict()
+        # key -> [lock, waiters] so identical uploads transcribe only once
+        self._inflight: dict[str, list] = {}
+        self._load()
+
+    def _load(self):
+        """Rebuild the LRU order from file modification times"""
+        sizes: dict[str, int] = {}
+        mtimes: dict[str, float] = {}
+        for path in self.cache_dir.iterdir():
+            if path.suffix == ".tmp":
+                path.unlink(missing_ok=True)
+                continue
+            key = path.name.split(".", 1)[0]
+            stat = path.stat()
+            sizes[key] = sizes.get(key, 0) + stat.st_size
+            mtimes[key] = max(mtimes.get(key, 0), stat.st_mtime)
+        for key in sorted(sizes, key=mtimes.get):
+            self._entries[key] = sizes[key]
+
+    @staticmethod
+    def hash_bytes(data: bytes) -> str:
+        return hashlib.sha256(data).hexdigest()
+
+    @staticmethod
+    def make_key(audio_hash: str, **params) -> str:
+        """Cache key for an audio hash and the parameters that affect the result"""
+        payload = json.dumps({"audio": audio_hash, **params}, sort_keys=True)
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+    @staticmethod
+    def docx_fingerprint(**details) -> str:
+        """Identify a rendered document by the details printed on it"""
+        payload = json.dumps(details, sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(payload.encode()).hexdigest()[:16]
+
+    @contextmanager
+    def claim(self, key: str):
+        """Serialize work on one key so concurrent identical uploads share a result"""
+        with self._lock:
+            entry = self._inflight.setdefault(key, [Lock(), 0])
+            entry[1] += 1
+        try:
+            with entry[0]:
+                yield
+        finally:
+            with self._lock:
+                entry[1] -= 1
+                if entry[1] == 0:
+                    del self._inflight[key]
+
+    def _result_path(self, key: str) -> Path:
+        return self.cache_dir / f"{key}.json"
+
+    def _docx_path(self, key: str, fingerprint: str) -> Path:
+        return self.cache_dir / f"{key}.{fingerprint}.docx"
+
+    @contextmanager
+    def _temp_file(self):
+        """A temp file of this writer's own, removed unless it was moved into place"""
+        fd, tmp = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+        os.close(fd)
+        try:
+            yield tmp
+        finally:
+            Path(tmp).unlink(missing_ok=True)
+
+    def _touch(self, key: str, path: Path):
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+
+    def get(self, key: str) -> dict | None:
+        path = self._result_path(key)
+        try:
+            result = json.loads(path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return None
+        self._touch(key, path)
+        return result
+
+    def put(self, key: str, result: dict):
+        with self._temp_file() as tmp:
+            with open(tmp, "w", encoding="utf-8") as f:
+                f.write(json.dumps(result, ensure_ascii=False))
+            os.replace(tmp, self._result_path(key))
+        self._add(key)
+
+    def get_docx(self, key: str, fingerprint: str) -> Path | None:
+        path = self._docx_path(key, fingerprint)
+        if not path.exists():
+            return None
+        self._touch(key, path)
+        return path
+
+    def put_docx(self, key: str, fingerprint: str, docx_path: str):
+        with self._temp_file() as tmp:
+            shutil.copyfile(docx_path, tmp)
+            os.replace(tmp, self._docx_path(key, fingerprint))
+        self._add(key)
+
+    def _add(self, key: str):
+        size = sum(p.stat().st_size for p in self.cache_dir.glob(f"{key}.*")
+                   if p.suffix != ".tmp")
+        with self._lock:
+            self._entries[key] = size
+            self._entries.move_to_end(key)
+            evicted = []
+            while sum(self._entries.values()) > self.max_bytes and len(self._entries) > 1:
+                old_key, _ = self._entries.popitem(last=False)
+                evicted.append(old_key)
+
+        for old_key in evicted:
+            for path in self.cache_dir.glob(f"{old_key}.*"):
+                path.unlink(missing_ok=True)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": sum(self._entries.values()),
+                "max_bytes": self.max_bytes,
+            }
@@ -3,19 +3,41 @@ FastAPI Transcription Service
 Local-only transcription server using Faster Whisper
 """
 
+import os
+import json
+import resource
+import hashlib
+import tempfile
+import time
 import uuid
+import queue
 import asyncio
+import zipfile
+import urllib.request
+import urllib.error
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
 from datetime import datetime
-from threading import Thread
+from threading import Thread, Event
 
-from fastapi import FastAPI, UploadFile, File, Form, HTTPException
+import numpy as np
+from fastapi import (
+    FastAPI, UploadFile, File, Form, HTTPException, Request,
+    WebSocket, WebSocketDisconnect,
+)
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, StreamingResponse, JSONResponse, Response
+from pydantic import BaseModel
 import uvicorn
 
-from transcriber import Transcriber
-from word_generator import generate_word_document
+from transcriber import Transcriber, IncrementalDecoder, TierPolicy, SAMPLE_RATE
+from audio_stream import PcmStream, decode_file
+from job_events import JobEvents
+from job_store import JobStore, TERMINAL_STATUSES
+from result_cache import ResultCache
+from pipeline import TranscriptionPipeline
+from word_generator import render_word_document, LAYOUTS
+import telemetry
 
 app = FastAPI(title="DOCTOR SEARCH - Transcription Service")
 
@@ -32,72 +54,784 @@ app.add_middleware(
 BASE_DIR = Path(__file__).parent
 UPLOADS_DIR = BASE_DIR / "uploads"
 OUTPUTS_DIR = BASE_DIR / "outputs"
+CACHE_DIR = Path(os.environ.get("TRANSCRIPTION_CACHE_DIR", BASE_DIR / "cache"))
 UPLOADS_DIR.mkdir(exist_ok=True)
 OUTPUTS_DIR.mkdir(exist_ok=True)
 
-# In-memory job store
-jobs: dict = {}
+# Finished results keyed by audio hash + decoding params (re-uploads skip Whisper)
+CACHE_MAX_MB = int(os.environ.get("TRANSCRIPTION_CACHE_MAX_MB", "1024"))
+result_cache = ResultCache(CACHE_DIR, CACHE_MAX_MB * 1024 * 1024)
+
+# Job store: compact records in memory, transcripts in SQLite, TTL + LRU eviction
+JOB_DB_PATH = Path(os.environ.get("TRANSCRIPTION_JOB_DB", BASE_DIR / "jobs.db"))
+JOB_TTL_HOURS = float(os.environ.get("TRANSCRIPTION_JOB_TTL_HOURS", "24"))
+MAX_JOBS = int(os.environ.get("TRANSCRIPTION_MAX_JOBS", "1000"))
+GC_INTERVAL_SECONDS = float(os.environ.get("TRANSCRIPTION_GC_INTERVAL_SECONDS", "600"))
+jobs = JobStore(JOB_DB_PATH, ttl_seconds=JOB_TTL_HOURS * 3600, max_jobs=MAX_JOBS)
+
+# SSE subscribers per job (progress, segment deltas, status changes)
+events = JobEvents()
+
+# Streaming ingest sessions still receiving bytes: job_id -> session dict
+ingests: dict = {}
+
+# Pipeline sizing: decode pool, inference workers and decoded jobs allowed to queue
+DECODE_WORKERS = int(os.environ.get("TRANSCRIPTION_DECODE_WORKERS", "2"))
+INFERENCE_WORKERS = int(os.environ.get("TRANSCRIPTION_INFERENCE_WORKERS", "1"))
+DECODED_QUEUE_SIZE = int(os.environ.get("TRANSCRIPTION_DECODED_QUEUE_SIZE", "2"))
+# Decoded audio longer than this is memory-mapped from a scratch file
+MMAP_THRESHOLD_SECONDS = float(os.environ.get("TRANSCRIPTION_MMAP_THRESHOLD_SECONDS", "600"))
 
-# Shared transcriber instance (loads model once)
-transcriber = Transcriber()
+# Streaming uploads with no bytes for this long are aborted and the job failed
+INGEST_IDLE_TIMEOUT_SECONDS = float(os.environ.get("TRANSCRIPTION_INGEST_IDLE_TIMEOUT_SECONDS", "300"))
+
+# Until the model is warm, uploads are queued; set to reject them with 503 instead
+REJECT_UNTIL_READY = os.environ.get("TRANSCRIPTION_REJECT_UNTIL_READY", "").lower() in ("1", "true", "yes")
+
+# CTranslate2 quantization and CPU threads per inference worker (0 = library default)
+COMPUTE_TYPE = os.environ.get("TRANSCRIPTION_COMPUTE_TYPE", "int8")
+CPU_THREADS = int(os.environ.get("TRANSCRIPTION_CPU_THREADS", "0"))
+
+# Model tiers, fastest to most accurate: "name=model,name=model"
+TIERS = os.environ.get("TRANSCRIPTION_TIERS", "medium=Systran/faster-whisper-medium")
+# Beam sizes the policy may pick from, e.g. "5,1"
+BEAM_SIZES = [int(b) for b in os.environ.get("TRANSCRIPTION_BEAM_SIZES", "5").split(",")]
+# Target upload-to-result time in seconds; 0 always uses the most accurate option
+TARGET_TURNAROUND = float(os.environ.get("TRANSCRIPTION_TARGET_TURNAROUND_SECONDS", "0"))
+# Re-run jobs finished on a faster option with the most accurate one when idle
+UPGRADE_WHEN_IDLE = os.environ.get("TRANSCRIPTION_UPGRADE_WHEN_IDLE", "").lower() in ("1", "true", "yes")
+
+# Shared transcriber instances, one per tier (each loads its model once)
+transcribers: dict[str, Transcriber] = {}
+for tier_spec in TIERS.split(","):
+    tier_name, _, tier_model = tier_spec.strip().partition("=")
+    transcribers[tier_name] = Transcriber(
+        model_name=tier_model,
+        compute_type=COMPUTE_TYPE,
+        beam_size=max(BEAM_SIZES),
+        num_workers=INFERENCE_WORKERS,
+        cpu_threads=CPU_THREADS,
+    )
+
+policy = TierPolicy(
+    transcribers,
+    beam_sizes=BEAM_SIZES,
+    target_turnaround=TARGET_TURNAROUND,
+    workers=INFERENCE_WORKERS,
+)
+
+# Most accurate tier - used by streaming and live sessions
+transcriber = transcribers[policy.best[0]]
+
+# Set once preloading has finished; tiers that failed to load are dropped
+models_ready = Event()
+# Tiers dropped at startup (name -> load error), and the error when none loaded
+failed_tiers: dict[str, str] = {}
+model_load_error: str | None = None
+
+# Live (WebSocket) sessions in progress
+live_sessions: set[str] = set()
+
+# Decoded audio seconds per job waiting for or in inference (queue pressure)
+queued_audio: dict[str, float] = {}
+
+# Per-job stage timings and RSS sampling
+job_telemetry = telemetry.JobTelemetry()
+
+# Jobs finished on a faster option, waiting for an idle upgrade
+upgrade_queue: queue.Queue = queue.Queue()
 
 ALLOWED_EXTENSIONS = {".mp4", ".mp3", ".wav", ".m4a", ".flac", ".ogg", ".webm"}
 
+# Documents rendered in parallel for a bulk export
+EXPORT_WORKERS = int(os.environ.get("TRANSCRIPTION_EXPORT_WORKERS", "4"))
+
+# RAG server that receives finished transcriptions for indexing
+RAG_SERVER_URL = os.environ.get("RAG_SERVER_URL", "http://localhost:8001")
+
+# Live (WebSocket) audio formats: raw PCM or Opus in a WebM/Ogg container
+LIVE_FORMATS = {"pcm_s16le", "pcm_f32le", "opus"}
+
+# Seconds of new audio between partial (uncommitted) transcripts on live sessions
+LIVE_PARTIAL_INTERVAL = 3.0
+
+
+def update_job(job_id: str, **fields):
+    """Update a job and push status/progress changes to SSE subscribers.
+
+    Finished jobs are persisted and their large fields leave memory.
+    """
+    job = jobs[job_id]
+    job.update(fields)
+
+    if "status" in fields:
+        if job["status"] in TERMINAL_STATUSES:
+            jobs.finish(job_id)
+        event = {
+            "type": "status",
+            "status": job["status"],
+            "progress": job["progress"],
+            "error_message": job["error_message"],
+        }
+        if job["status"] == "completed":
+            event["transcription_text"] = jobs.text(job_id)
+            event["duration_seconds"] = job["duration_seconds"]
+            event["tier"] = job["tier"]
+            event["upgraded"] = job["upgraded"]
+        events.publish(job_id, event)
+    elif "progress" in fields:
+        events.publish(job_id, {"type": "progress", "progress": job["progress"]})
+
+
+def mark_collected(job_id: str):
+    """The transcript has reached a client; it must not change under it any more"""
+    job = jobs.get(job_id)
+    if job is not None and job["status"] == "completed":
+        job["collected"] = True
+
+
+def record_timing(job_id: str, **fields):
+    """Add stage timings to a job's telemetry (seconds, rounded)"""
+    job = jobs[job_id]
+    job["telemetry"] = {
+        **(job.get("telemetry") or {}),
+        **{k: round(v, 3) if isinstance(v, float) else v for k, v in fields.items()},
+    }
+
+
+def add_segments(job_id: str, segments: list[dict]):
+    """Append newly decoded segments to a job and publish them as a delta"""
+    if not segments:
+        return
+    job = jobs[job_id]
+    if job["segments"] is None:
+        job["segments"] = []
+    start_index = len(job["segments"])
+    job["segments"].extend(segments)
+    events.publish(job_id, {
+        "type": "segments",
+        "start_index": start_index,
+        "segments": segments,
+    })
+
+
+def complete_job(job_id: str, result: dict, cache_key: str | None = None):
+    """Store a transcription result on the job and mark it completed.
+
+    The Word document is rendered lazily on first download; ``cache_key``
+    lets that render reuse a document cached for the same audio.
+    """
+    # A re-run (tier upgrade) invalidates documents rendered from the old result
+    for path in jobs[job_id]["word_files"].values():
+        Path(path).unlink(missing_ok=True)
 
-def run_transcription(job_id: str, file_path: str, doctor_name: str,
-                      doctor_specialization: str, patient_name: str,
-                      original_filename: str):
-    """Run transcription in a background thread"""
+    jobs[job_id].update(
+        progress=100,
+        transcription_text=result["text"],
+        segments=result["segments"],
+        duration_seconds=result["duration_seconds"],
+        cache_key=cache_key,
+        word_files={},
+        word_file_path=None,
+        completed_at=datetime.now().isoformat(),
+    )
+    update_job(job_id, status="completed")
+
+
+def write_output(output_path: Path, data: bytes):
+    """Atomically replace an output file.
+
+    Each writer gets its own temp file, so concurrent renders of the same
+    document (a download racing an export) never see a partial file.
+    """
+    fd, tmp_name = tempfile.mkstemp(dir=output_path.parent, prefix=f"{output_path.name}.",
+                                    suffix=".tmp")
     try:
-        jobs[job_id]["status"] = "processing"
-        jobs[job_id]["progress"] = 0
+        with os.fdopen(fd, "wb") as tmp:
+            tmp.write(data)
+        os.replace(tmp_name, output_path)
+    except BaseException:
+        Path(tmp_name).unlink(missing_ok=True)
+        raise
 
-        def on_progress(pct):
-            jobs[job_id]["progress"] = round(pct, 1)
 
-        result = transcriber.transcribe(
-            audio_path=file_path,
-            language="he",
-            on_progress=on_progress,
-        )
+def render_job_document(job_id: str, layout: str = "text") -> Path:
+    """Render (or reuse) a completed job's Word document for a layout"""
+    job = jobs[job_id]
+    if layout in job["word_files"] and Path(job["word_files"][layout]).exists():
+        return Path(job["word_files"][layout])
+
+    suffix = "" if layout == "text" else f".{layout}"
+    output_path = OUTPUTS_DIR / f"{job_id}{suffix}.docx"
+    created_at = datetime.fromisoformat(job["completed_at"])
+    fingerprint = ResultCache.docx_fingerprint(
+        doctor_name=job["doctor_name"],
+        doctor_specialization=job["doctor_specialization"],
+        patient_name=job["patient_name"],
+        original_filename=job["original_filename"],
+        # The document prints the time of day too, not just the date
+        created_at=created_at.strftime("%Y-%m-%d %H:%M"),
+        layout=layout,
+    )
+    cache_key = job.get("cache_key")
+    started = time.monotonic()
+    cached_docx = result_cache.get_docx(cache_key, fingerprint) if cache_key else None
 
-        jobs[job_id]["progress"] = 100
-        jobs[job_id]["transcription_text"] = result["text"]
-        jobs[job_id]["segments"] = result["segments"]
-        jobs[job_id]["duration_seconds"] = result["duration_seconds"]
-
-        # Generate Word document
-        word_path = generate_word_document(
-            transcription_text=result["text"],
-            doctor_name=doctor_name,
-            doctor_specialization=doctor_specialization,
-            patient_name=patient_name,
-            original_filename=original_filename,
-            duration_seconds=result["duration_seconds"],
-            output_path=str(OUTPUTS_DIR / f"{job_id}.docx"),
+    if cached_docx:
+        write_output(output_path, Path(cached_docx).read_bytes())
+    else:
+        data = render_word_document(
+            transcription_text=jobs.text(job_id) or "",
+            doctor_name=job["doctor_name"],
+            doctor_specialization=job["doctor_specialization"],
+            patient_name=job["patient_name"],
+            original_filename=job["original_filename"],
+            duration_seconds=job["duration_seconds"] or 0,
+            segments=jobs.segments(job_id) if layout == "segments" else None,
+            layout=layout,
+            created_at=created_at,
         )
+        write_output(output_path, data)
+        if cache_key:
+            result_cache.put_docx(cache_key, fingerprint, str(output_path))
+
+    elapsed = time.monotonic() - started
+    telemetry.DOCX_RENDER_SECONDS.labels(layout, str(bool(cached_docx)).lower()).observe(elapsed)
+    renders = (job.get("telemetry") or {}).get("docx_render_seconds") or {}
+    record_timing(job_id, docx_render_seconds={**renders, layout: round(elapsed, 3)})
+
+    job["word_files"] = {**job["word_files"], layout: str(output_path)}
+    if layout == "text":
+        job["word_file_path"] = str(output_path)
+    return output_path
+
+
+def file_cache_key(audio_hash: str, tier: str | None = None,
+                   beam_size: int | None = None) -> str:
+    tier_transcriber = transcribers[tier] if tier else transcriber
+    return ResultCache.make_key(
+        audio_hash, mode="file", language="he",
+        **tier_transcriber.decoding_params(beam_size),
+    )
+
+
+def stream_cache_key(audio_hash: str) -> str:
+    """Windowed streaming results are cached apart from whole-file ones"""
+    return ResultCache.make_key(
+        audio_hash, mode="stream", language="he", **transcriber.decoding_params(),
+    )
+
+
+def cached_result(audio_hash: str, at_least: tuple[str, int] | None = None):
+    """Best cached (key, result, tier, beam_size) for the audio, or None.
+
+    With ``at_least``, only results from that option or a more accurate one count.
+    """
+    options = policy.options()
+    if at_least is not None:
+        options = options[:policy.rank(at_least) + 1]
+    for tier, beam_size in options:
+        key = file_cache_key(audio_hash, tier, beam_size)
+        result = result_cache.get(key)
+        if result is not None:
+            return key, result, tier, beam_size
+    return None
 
-        jobs[job_id]["word_file_path"] = word_path
-        jobs[job_id]["status"] = "completed"
+
+def decode_job(job_id: str):
+    """Decode stage: turn the uploaded file into 16 kHz PCM for inference"""
+    job = jobs[job_id]
+    job_telemetry.mark(job_id, "decode_started")
+    job_telemetry.track_memory(job_id)
+    # A cached result needs no audio at all
+    if cached_result(job["audio_hash"]) is not None:
+        job_telemetry.mark(job_id, "decoded")
+        return None
+    started = time.monotonic()
+    audio = decode_file(
+        job["file_path"],
+        str(UPLOADS_DIR / f"{job_id}.pcm"),
+        mmap_threshold_seconds=MMAP_THRESHOLD_SECONDS,
+    )
+    decode_seconds = time.monotonic() - started
+    telemetry.DECODE_SECONDS.observe(decode_seconds)
+    record_timing(job_id, decode_seconds=decode_seconds)
+    job_telemetry.mark(job_id, "decoded")
+    queued_audio[job_id] = len(audio) / SAMPLE_RATE
+    return audio
+
+
+def record_inference(job_id: str, tier: str, beam_size: int,
+                     inference_seconds: float, rtf: float | None):
+    labels = (tier, transcribers[tier].compute_type, str(beam_size))
+    telemetry.INFERENCE_SECONDS.labels(*labels).observe(inference_seconds)
+    if rtf is not None:
+        telemetry.REAL_TIME_FACTOR.labels(*labels).observe(rtf)
+    record_timing(job_id, inference_seconds=inference_seconds)
+
+
+def run_transcription(job_id: str, audio):
+    """Inference stage: transcribe decoded audio (or reuse a cached result)"""
+    job = jobs[job_id]
+    file_path = job["file_path"]
+    keep_file = False
+    try:
+        if isinstance(audio, Exception):
+            raise audio
+
+        queue_wait = job_telemetry.queue_wait(job_id)
+        if queue_wait is not None:
+            telemetry.QUEUE_WAIT_SECONDS.observe(queue_wait)
+            record_timing(job_id, queue_wait_seconds=queue_wait)
+
+        update_job(job_id, status="processing", progress=0, segments=[])
+
+        # Identical uploads in flight wait here and then hit the cache
+        with result_cache.claim(job["audio_hash"]):
+            waited = (datetime.now() - datetime.fromisoformat(job["created_at"])).total_seconds()
+            backlog = sum(seconds for other, seconds in list(queued_audio.items())
+                          if other != job_id)
+            tier, beam_size = policy.choose(
+                queued_audio.get(job_id, 0.0), waited, backlog
+            )
+
+            hit = cached_result(job["audio_hash"], at_least=(tier, beam_size))
+            if hit is not None:
+                cache_key, result, tier, beam_size = hit
+                jobs[job_id]["cache_hit"] = True
+                add_segments(job_id, result["segments"])
+            else:
+                require_model()
+                if audio is None:
+                    # Cached when decoded, evicted since - decode inline
+                    audio = decode_file(
+                        file_path,
+                        str(UPLOADS_DIR / f"{job_id}.pcm"),
+                        mmap_threshold_seconds=MMAP_THRESHOLD_SECONDS,
+                    )
+
+                def on_progress(pct):
+                    update_job(job_id, progress=round(pct, 1))
+
+                started = time.monotonic()
+                result = transcribers[tier].transcribe(
+                    audio_path=file_path,
+                    language="he",
+                    on_progress=on_progress,
+                    on_segment=lambda segment: add_segments(job_id, [segment]),
+                    audio=audio,
+                    beam_size=beam_size,
+                )
+                inference_seconds = time.monotonic() - started
+                jobs[job_id]["real_time_factor"] = policy.record(
+                    tier, beam_size, result["duration_seconds"], inference_seconds
+                )
+                record_inference(job_id, tier, beam_size, inference_seconds,
+                                 jobs[job_id]["real_time_factor"])
+                cache_key = file_cache_key(job["audio_hash"], tier, beam_size)
+                result_cache.put(cache_key, result)
+
+        jobs[job_id].update(tier=tier, beam_size=beam_size)
+        # Before completion, so the peak is persisted with the job
+        record_timing(job_id, peak_rss_bytes=job_telemetry.finish(job_id))
+        complete_job(job_id, result, cache_key=cache_key)
+
+        if UPGRADE_WHEN_IDLE and (tier, beam_size) != policy.best:
+            keep_file = True
+            upgrade_queue.put(job_id)
 
     except Exception as e:
-        jobs[job_id]["status"] = "error"
-        jobs[job_id]["error_message"] = str(e)
+        update_job(job_id, status="error", error_message=str(e))
         print(f"Transcription error for job {job_id}: {e}")
 
     finally:
-        # Clean up uploaded file
+        job_telemetry.finish(job_id)
+        # Clean up uploaded file and decoded scratch PCM
+        queued_audio.pop(job_id, None)
+        del audio
+        paths = [UPLOADS_DIR / f"{job_id}.pcm"]
+        if not keep_file:
+            paths.append(file_path)
+        for path in paths:
+            try:
+                Path(path).unlink(missing_ok=True)
+            except Exception:
+                pass
+
+
+def pipeline_idle() -> bool:
+    stats = pipeline.stats()
+    return not (stats["decoding"] or stats["decoded_waiting"]
+                or stats["inferring"] or ingests or live_sessions)
+
+
+def run_upgrades():
+    """Re-transcribe downgraded jobs on the most accurate option while idle.
+
+    Only jobs whose transcript no client has collected yet are upgraded:
+    once the web app has saved and indexed the text, a later change would
+    never reach the database or the RAG index.
+    """
+    while True:
+        job_id = upgrade_queue.get()
+        while not pipeline_idle():
+            time.sleep(5)
+
+        job = jobs.get(job_id)
+        if job is None:
+            continue
+        file_path = job["file_path"]
+        if job.get("collected"):
+            print(f"Job {job_id}: transcript already collected, skipping upgrade")
+            Path(file_path).unlink(missing_ok=True)
+            continue
+        scratch_path = UPLOADS_DIR / f"{job_id}.upgrade.pcm"
+        tier, beam_size = policy.best
+        audio = None
+        try:
+            audio = decode_file(file_path, str(scratch_path),
+                                mmap_threshold_seconds=MMAP_THRESHOLD_SECONDS)
+            started = time.monotonic()
+            result = transcribers[tier].transcribe(
+                audio_path=file_path, language="he", audio=audio, beam_size=beam_size,
+            )
+            inference_seconds = time.monotonic() - started
+            rtf = policy.record(tier, beam_size, result["duration_seconds"], inference_seconds)
+            record_inference(job_id, tier, beam_size, inference_seconds, rtf)
+            cache_key = file_cache_key(job["audio_hash"], tier, beam_size)
+            result_cache.put(cache_key, result)
+
+            if jobs.get(job_id, {}).get("collected"):
+                # Collected while the upgrade ran; the cache keeps the better result
+                print(f"Job {job_id}: collected during upgrade, keeping original result")
+                continue
+            jobs[job_id].update(tier=tier, beam_size=beam_size,
+                                real_time_factor=rtf, upgraded=True)
+            complete_job(job_id, result, cache_key=cache_key)
+            print(f"Upgraded job {job_id} to {tier} (beam {beam_size})")
+        except Exception as e:
+            # The job keeps its original result
+            print(f"Upgrade failed for job {job_id}: {e}")
+        finally:
+            del audio
+            for path in (file_path, scratch_path):
+                Path(path).unlink(missing_ok=True)
+
+
+pipeline = TranscriptionPipeline(
+    decode_job,
+    run_transcription,
+    decode_workers=DECODE_WORKERS,
+    inference_workers=INFERENCE_WORKERS,
+    queue_size=DECODED_QUEUE_SIZE,
+    ready=models_ready,
+)
+telemetry.watch_pipeline(pipeline.stats)
+
+
+def preload_models():
+    """Load and warm every tier, then release the inference workers.
+
+    Tiers that fail to load are dropped and jobs run on the rest. If none
+    loads, queued and new jobs fail with the load error instead of waiting.
+    """
+    global transcriber, model_load_error
+    for tier_name, tier_transcriber in transcribers.items():
+        tier_transcriber.preload()
+        if tier_transcriber.load_seconds is not None:
+            telemetry.MODEL_LOAD_SECONDS.labels(
+                tier_name, tier_transcriber.compute_type
+            ).set(tier_transcriber.load_seconds)
+
+    for tier_name, tier_transcriber in list(transcribers.items()):
+        if tier_transcriber.state != "ready":
+            failed_tiers[tier_name] = tier_transcriber.load_error or tier_transcriber.state
+    if len(failed_tiers) == len(transcribers):
+        model_load_error = "; ".join(f"{name}: {error}" for name, error in failed_tiers.items())
+        print(f"No transcription model loaded, failing jobs: {model_load_error}")
+    elif failed_tiers:
+        for tier_name in failed_tiers:
+            del transcribers[tier_name]
+        transcriber = transcribers[policy.best[0]]
+        print(f"Serving without tiers {', '.join(failed_tiers)}; "
+              f"best option is now {policy.best[0]}")
+    models_ready.set()
+
+
+def require_model():
+    """Raise if no model could be loaded (called once the workers are released)"""
+    if model_load_error:
+        raise RuntimeError(f"Transcription model failed to load: {model_load_error}")
+
+
+def models_state() -> str:
+    if model_load_error:
+        return "error"
+    states = {t.state for t in transcribers.values()}
+    for state in ("error", "loading", "not_loaded"):
+        if state in states:
+            return state
+    return "ready"
+
+
+def directory_usage(directory: Path, pattern: str = "*") -> dict:
+    files = [p for p in directory.glob(pattern) if p.is_file()]
+    return {"files": len(files), "bytes": sum(p.stat().st_size for p in files)}
+
+
+def collect_garbage():
+    """Expire old jobs and remove output/upload files no live job refers to"""
+    expired = jobs.expire()
+
+    # Grace period so files being written for a brand-new job are left alone
+    cutoff = time.time() - 3600
+    removed = 0
+    candidates = list(OUTPUTS_DIR.glob("*.docx")) + list(UPLOADS_DIR.iterdir())
+    for path in candidates:
+        job_id = path.name.split(".", 1)[0]
+        if (path.is_file() and job_id not in jobs and job_id not in ingests
+                and path.stat().st_mtime < cutoff):
+            path.unlink(missing_ok=True)
+            removed += 1
+
+    if expired or removed:
+        print(f"GC: expired {len(expired)} jobs, removed {removed} orphaned files")
+
+
+def run_gc():
+    while True:
+        time.sleep(GC_INTERVAL_SECONDS)
+        try:
+            collect_garbage()
+        except Exception as e:
+            print(f"GC error: {e}")
+
+
+@app.on_event("startup")
+async def startup_event():
+    # Load and warm the models before the first job instead of inside it
+    Thread(target=preload_models, daemon=True).start()
+    Thread(target=run_gc, daemon=True).start()
+    Thread(target=reap_idle_ingests, daemon=True).start()
+    if UPGRADE_WHEN_IDLE:
+        Thread(target=run_upgrades, daemon=True).start()
+
+
+def ensure_accepting_jobs():
+    if model_load_error:
+        raise HTTPException(
+            status_code=503,
+            detail=f"Transcription model failed to load: {model_load_error}",
+        )
+    if REJECT_UNTIL_READY and not models_ready.is_set():
+        raise HTTPException(
+            status_code=503,
+            detail=f"Transcription model is not ready ({models_state()})",
+        )
+
+
+def run_streaming_transcription(job_id: str, ingest: dict, file_path: str):
+    """Transcribe a streaming upload window by window as its audio decodes.
+
+    Each window takes an inference slot from the pipeline, so streams share
+    the worker limit (and readiness gate) with queued jobs.
+    """
+    pcm_stream = ingest["pcm_stream"]
+    job_telemetry.track_memory(job_id)
+    started = time.monotonic()
+    try:
+        # Created once a slot is held, so it uses a tier that actually loaded
+        decoder = None
+        for pcm in pcm_stream.chunks():
+            with pipeline.slot():
+                require_model()
+                decoder = decoder or IncrementalDecoder(transcriber, language="he")
+                committed = decoder.feed(pcm)
+            add_segments(job_id, committed)
+
+        # Only trust the incremental result once every byte has been received
+        ingest["upload_done"].wait()
+        if ingest["abandoned"]:
+            raise RuntimeError(
+                f"Upload abandoned: no data for {INGEST_IDLE_TIMEOUT_SECONDS:g}s"
+            )
+
+        if pcm_stream.failed:
+            # Some containers can't be decoded from a pipe (e.g. MP4 with its
+            # index at the end); fall back to the complete file on disk
+            print(f"Streaming decode failed for job {job_id}, "
+                  f"transcribing full file: {pcm_stream.error}")
+            update_job(job_id, status="processing", segments=[])
+
+            def on_progress(pct):
+                update_job(job_id, progress=round(pct, 1))
+
+            with pipeline.slot():
+                require_model()
+                result = transcriber.transcribe(
+                    audio_path=file_path,
+                    language="he",
+                    on_progress=on_progress,
+                    on_segment=lambda segment: add_segments(job_id, [segment]),
+                )
+            cache_key = file_cache_key(ingest["hash"].hexdigest())
+        else:
+            with pipeline.slot():
+                require_model()
+                decoder = decoder or IncrementalDecoder(transcriber, language="he")
+                committed = decoder.finish()
+            add_segments(job_id, committed)
+            result = decoder.result()
+            cache_key = stream_cache_key(ingest["hash"].hexdigest())
+
+        # Identical streaming uploads (and their documents) can reuse this result
+        result_cache.put(cache_key, result)
+        jobs[job_id].update(tier=policy.best[0], beam_size=transcriber.beam_size)
+
+        # Decoding overlaps the upload, so this is wall time from the first byte
+        inference_seconds = time.monotonic() - started
+        rtf = (round(inference_seconds / result["duration_seconds"], 3)
+               if result["duration_seconds"] else None)
+        jobs[job_id]["real_time_factor"] = rtf
+        record_inference(job_id, policy.best[0], transcriber.beam_size, inference_seconds, rtf)
+        record_timing(job_id, peak_rss_bytes=job_telemetry.finish(job_id))
+
+        complete_job(job_id, result, cache_key=cache_key)
+
+    except Exception as e:
+        update_job(job_id, status="error", error_message=str(e))
+        print(f"Streaming transcription error for job {job_id}: {e}")
+
+    finally:
+        job_telemetry.finish(job_id)
+        pcm_stream.abort()
         try:
             Path(file_path).unlink(missing_ok=True)
         except Exception:
             pass
 
 
+def close_ingest(ingest: dict):
+    """End the upload side of a streaming ingest"""
+    ingest["file"].close()
+    ingest["pcm_stream"].close_input()
+    ingest["upload_done"].set()
+
+
+def reap_idle_ingests():
+    """Abort streaming uploads whose client stopped sending without completing"""
+    while True:
+        time.sleep(min(INGEST_IDLE_TIMEOUT_SECONDS / 4, 30))
+        now = time.monotonic()
+        for job_id, ingest in list(ingests.items()):
+            if now - ingest["last_activity"] < INGEST_IDLE_TIMEOUT_SECONDS:
+                continue
+            if ingests.pop(job_id, None) is None:
+                continue
+            print(f"Job {job_id}: upload idle for {INGEST_IDLE_TIMEOUT_SECONDS:g}s, aborting")
+            ingest["abandoned"] = True
+            # Kills ffmpeg, which ends the transcription thread's chunk loop
+            ingest["pcm_stream"].abort()
+            close_ingest(ingest)
+
+
+def new_job(job_id: str, original_filename: str, status: str = "pending",
+            doctor_name: str = "", doctor_specialization: str = "",
+            patient_name: str = "") -> dict:
+    return {
+        "id": job_id,
+        "status": status,
+        "progress": 0,
+        "original_filename": original_filename,
+        "doctor_name": doctor_name,
+        "doctor_specialization": doctor_specialization,
+        "patient_name": patient_name,
+        "transcription_text": None,
+        "segments": None,
+        "duration_seconds": None,
+        "word_file_path": None,
+        "word_files": {},
+        "cache_key": None,
+        "completed_at": None,
+        "error_message": None,
+        "cache_hit": False,
+        "tier": None,
+        "beam_size": None,
+        "real_time_factor": None,
+        "upgraded": False,
+        # Transcript delivered to a client (status, SSE, download, export, index)
+        "collected": False,
+        # queue_wait_seconds, decode_seconds, inference_seconds,
+        # docx_render_seconds (per layout), peak_rss_bytes
+        "telemetry": {},
+        "created_at": datetime.now().isoformat(),
+    }
+
+
+def validate_extension(filename: str) -> str:
+    ext = Path(filename or "").suffix.lower()
+    if ext not in ALLOWED_EXTENSIONS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unsupported file type: {ext}. Allowed: {', '.join(ALLOWED_EXTENSIONS)}"
+        )
+    return ext
+
+
 @app.get("/api/health")
 async def health_check():
     return {"status": "ok", "service": "transcription"}
 
 
+@app.get("/api/stats")
+async def service_stats():
+    """Memory and disk usage of the job store, output files and caches"""
+    rss_kb = None
+    try:
+        with open("/proc/self/status") as status:
+            for line in status:
+                if line.startswith("VmRSS:"):
+                    rss_kb = int(line.split()[1])
+    except OSError:
+        pass
+
+    return {
+        "memory": {
+            "rss_bytes": rss_kb * 1024 if rss_kb is not None else None,
+            "peak_rss_bytes": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024,
+        },
+        "jobs": jobs.stats(),
+        "disk": {
+            "outputs": directory_usage(OUTPUTS_DIR),
+            "uploads": directory_usage(UPLOADS_DIR),
+            "result_cache": result_cache.stats(),
+        },
+        "pipeline": pipeline.stats(),
+    }
+
+
+@app.get("/metrics")
+async def metrics():
+    """Prometheus metrics: stage histograms, queue depth, workers, model load time"""
+    body, content_type = telemetry.render()
+    return Response(content=body, media_type=content_type)
+
+
+@app.get("/api/ready")
+async def readiness_check():
+    """Readiness probe: 200 once the model is loaded and warmed up, 503 before"""
+    body = {
+        "service": "transcription",
+        "state": models_state(),
+        "tiers": {name: t.readiness() for name, t in transcribers.items()},
+        "failed_tiers": failed_tiers,
+        "policy": policy.stats(),
+    }
+    if not models_ready.is_set() or model_load_error:
+        return JSONResponse(status_code=503, content=body)
+    return body
+
+
 @app.post("/api/transcribe")
 async def start_transcription(
     file: UploadFile = File(...),
@@ -106,77 +840,467 @@ async def start_transcription(
     patient_name: str = Form(""),
 ):
     # Validate file extension
-    ext = Path(file.filename or "").suffix.lower()
-    if ext not in ALLOWED_EXTENSIONS:
-        raise HTTPException(
-            status_code=400,
-            detail=f"Unsupported file type: {ext}. Allowed: {', '.join(ALLOWED_EXTENSIONS)}"
-        )
+    ext = validate_extension(file.filename)
+
+    content = await file.read()
+    audio_hash = ResultCache.hash_bytes(content)
 
-    # Generate job ID
+    # A cached result needs neither the model nor an inference worker
+    hit = cached_result(audio_hash)
+    if hit is None:
+        ensure_accepting_jobs()
+
+    # Generate job ID and initialize job
     job_id = str(uuid.uuid4())
+    jobs[job_id] = new_job(job_id, file.filename, doctor_name=doctor_name,
+                           doctor_specialization=doctor_specialization,
+                           patient_name=patient_name)
+    jobs[job_id]["audio_hash"] = audio_hash
+
+    if hit is not None:
+        cache_key, result, tier, beam_size = hit
+        jobs[job_id].update(cache_hit=True, tier=tier, beam_size=beam_size)
+        complete_job(job_id, result, cache_key=cache_key)
+        return {"job_id": job_id, "status": "completed"}
 
     # Save uploaded file
     file_path = UPLOADS_DIR / f"{job_id}{ext}"
-    content = await file.read()
     file_path.write_bytes(content)
+    jobs[job_id]["file_path"] = str(file_path)
 
-    # Initialize job
-    jobs[job_id] = {
-        "id": job_id,
-        "status": "pending",
-        "progress": 0,
-        "original_filename": file.filename,
-        "transcription_text": None,
-        "segments": None,
-        "duration_seconds": None,
-        "word_file_path": None,
-        "error_message": None,
-        "created_at": datetime.now().isoformat(),
+    # Decode and transcribe in the background pipeline
+    job_telemetry.mark(job_id, "submitted")
+    pipeline.submit(job_id)
+
+    return {"job_id": job_id, "status": "pending"}
+
+
+@app.post("/api/transcribe/stream")
+async def start_streaming_transcription(
+    filename: str = Form(...),
+    doctor_name: str = Form(""),
+    doctor_specialization: str = Form(""),
+    patient_name: str = Form(""),
+):
+    """Open a streaming upload. Audio is sent with PUT /api/transcribe/stream/{job_id}
+    and transcription runs while the bytes are still arriving."""
+    ensure_accepting_jobs()
+    ext = validate_extension(filename)
+
+    job_id = str(uuid.uuid4())
+    file_path = UPLOADS_DIR / f"{job_id}{ext}"
+
+    jobs[job_id] = new_job(job_id, filename, status="receiving",
+                           doctor_name=doctor_name,
+                           doctor_specialization=doctor_specialization,
+                           patient_name=patient_name)
+    jobs[job_id]["bytes_received"] = 0
+
+    ingest = {
+        "pcm_stream": PcmStream(),
+        "upload_done": Event(),
+        "hash": hashlib.sha256(),
+        "file": open(file_path, "wb"),
+        "lock": asyncio.Lock(),
+        "last_activity": time.monotonic(),
+        "abandoned": False,
     }
+    ingests[job_id] = ingest
 
-    # Start transcription in background thread
     thread = Thread(
-        target=run_transcription,
-        args=(job_id, str(file_path), doctor_name,
-              doctor_specialization, patient_name, file.filename),
+        target=run_streaming_transcription,
+        args=(job_id, ingest, str(file_path)),
         daemon=True,
     )
     thread.start()
 
-    return {"job_id": job_id, "status": "pending"}
+    return {"job_id": job_id, "status": "receiving", "offset": 0}
+
+
+def _write_ingest_chunk(ingest: dict, chunk: bytes):
+    if ingest["abandoned"]:
+        raise HTTPException(status_code=410, detail="Upload session expired")
+    ingest["last_activity"] = time.monotonic()
+    ingest["file"].write(chunk)
+    ingest["hash"].update(chunk)
+    ingest["pcm_stream"].write(chunk)
+
+
+@app.put("/api/transcribe/stream/{job_id}")
+async def append_streaming_upload(job_id: str, request: Request, offset: int | None = None):
+    """Append bytes to a streaming upload.
+
+    The body may be sent with chunked transfer encoding; bytes are forwarded to
+    the decoder as they arrive. Pass ``offset`` to resume after a dropped
+    connection - it must equal the number of bytes already received.
+    """
+    ingest = ingests.get(job_id)
+    if ingest is None:
+        raise HTTPException(status_code=404, detail="Upload session not found")
+
+    async with ingest["lock"]:
+        ingest["last_activity"] = time.monotonic()
+        received = jobs[job_id]["bytes_received"]
+        if offset is not None and offset != received:
+            raise HTTPException(
+                status_code=409,
+                detail=f"Offset mismatch: {received} bytes received so far",
+            )
+
+        async for chunk in request.stream():
+            if not chunk:
+                continue
+            await asyncio.to_thread(_write_ingest_chunk, ingest, chunk)
+            jobs[job_id]["bytes_received"] += len(chunk)
+
+    return {"job_id": job_id, "offset": jobs[job_id]["bytes_received"]}
+
+
+@app.get("/api/transcribe/stream/{job_id}")
+async def get_streaming_upload(job_id: str):
+    """Report how many bytes were received, so a client knows where to resume"""
+    if job_id not in jobs:
+        raise HTTPException(status_code=404, detail="Job not found")
+
+    job = jobs[job_id]
+    return {
+        "job_id": job_id,
+        "status": job["status"],
+        "offset": job.get("bytes_received", 0),
+    }
+
+
+@app.post("/api/transcribe/stream/{job_id}/complete")
+async def complete_streaming_upload(job_id: str):
+    """Mark a streaming upload as finished; the result is ready shortly after"""
+    ingest = ingests.pop(job_id, None)
+    if ingest is None:
+        raise HTTPException(status_code=404, detail="Upload session not found")
+
+    async with ingest["lock"]:
+        close_ingest(ingest)
+
+    update_job(job_id, status="processing")
+    return {"job_id": job_id, "status": "processing"}
+
+
+def pcm_from_frame(data: bytes, fmt: str, sample_rate: int) -> np.ndarray:
+    """Convert a raw PCM WebSocket frame to 16 kHz mono float32"""
+    if fmt == "pcm_s16le":
+        data = data[:len(data) - len(data) % 2]
+        pcm = np.frombuffer(data, dtype=np.int16).astype(np.float32) / 32768.0
+    else:
+        data = data[:len(data) - len(data) % 4]
+        pcm = np.frombuffer(data, dtype=np.float32)
+
+    if sample_rate != SAMPLE_RATE and len(pcm):
+        # Linear resampling is enough for speech recognition input
+        target_len = int(len(pcm) * SAMPLE_RATE / sample_rate)
+        pcm = np.interp(
+            np.linspace(0, len(pcm) - 1, target_len),
+            np.arange(len(pcm)),
+            pcm,
+        ).astype(np.float32)
+    return pcm
+
+
+@app.websocket("/api/transcribe/live")
+async def live_transcription(websocket: WebSocket):
+    """Real-time transcription over a WebSocket.
+
+    Protocol:
+      1. client sends a JSON config: {"format": "pcm_s16le" | "pcm_f32le" | "opus",
+         "sample_rate": 16000, "filename", "doctor_name", "doctor_specialization",
+         "patient_name"} - sample_rate applies to PCM formats only
+      2. server replies {"type": "started", "job_id"}
+      3. client streams binary audio frames; server sends
+         {"type": "partial", "segments"} previews and {"type": "final", "segments"}
+         once segments are committed
+      4. client sends {"type": "stop"} (or disconnects); the remaining audio is
+         decoded and the session becomes a regular completed job, with
+         {"type": "completed", "job_id", "transcription_text", "duration_seconds"}
+    """
+    await websocket.accept()
+    loop = asyncio.get_running_loop()
+
+    if model_load_error or (REJECT_UNTIL_READY and not models_ready.is_set()):
+        await websocket.send_json({
+            "type": "error",
+            "message": f"Transcription model is not ready ({models_state()})",
+        })
+        await websocket.close(code=1013)
+        return
+
+    try:
+        config = await websocket.receive_json()
+        if not isinstance(config, dict):
+            raise ValueError("config must be a JSON object")
+        fmt = config.get("format", "pcm_s16le")
+        if fmt not in LIVE_FORMATS:
+            raise ValueError(
+                f"Unsupported format: {fmt}. Allowed: {', '.join(sorted(LIVE_FORMATS))}"
+            )
+        sample_rate = int(config.get("sample_rate", SAMPLE_RATE))
+        if not 8000 <= sample_rate <= 192000:
+            raise ValueError(f"Unsupported sample_rate: {sample_rate}")
+    except WebSocketDisconnect:
+        return
+    except (ValueError, TypeError, KeyError) as e:
+        # Bad JSON, a binary first frame or an invalid field
+        await websocket.send_json({"type": "error", "message": f"Invalid config: {e}"})
+        await websocket.close(code=1003)
+        return
+    doctor_name = config.get("doctor_name", "")
+    doctor_specialization = config.get("doctor_specialization", "")
+    patient_name = config.get("patient_name", "")
+    original_filename = config.get("filename") or (
+        f"live_{datetime.now().strftime('%Y%m%d_%H%M%S')}.webm"
+    )
+
+    job_id = str(uuid.uuid4())
+    jobs[job_id] = new_job(job_id, original_filename, status="live",
+                           doctor_name=doctor_name,
+                           doctor_specialization=doctor_specialization,
+                           patient_name=patient_name)
+    await websocket.send_json({"type": "started", "job_id": job_id})
+    live_sessions.add(job_id)
+    job_telemetry.track_memory(job_id)
+
+    decoder = IncrementalDecoder(transcriber, language="he")
+    # Time spent decoding windows and previews, for inference time and RTF
+    inference_seconds = 0.0
+
+    def infer_in_slot(fn, *args):
+        # Takes an inference slot like queued jobs and streaming uploads,
+        # so live sessions stay within the worker limit
+        nonlocal inference_seconds
+        with pipeline.slot():
+            started = time.monotonic()
+            try:
+                return fn(*args)
+            finally:
+                inference_seconds += time.monotonic() - started
+
+    async def infer(fn, *args):
+        return await asyncio.to_thread(infer_in_slot, fn, *args)
+    pcm_queue: asyncio.Queue = asyncio.Queue()
+    connected = True
+
+    async def send(message: dict):
+        nonlocal connected
+        if not connected:
+            return
+        try:
+            await websocket.send_json(message)
+        except Exception:
+            connected = False
+
+    pcm_stream = None
+    if fmt == "opus":
+        pcm_stream = PcmStream()
+
+        def forward_pcm():
+            for pcm in pcm_stream.chunks():
+                loop.call_soon_threadsafe(pcm_queue.put_nowait, pcm)
+            loop.call_soon_threadsafe(pcm_queue.put_nowait, None)
+
+        Thread(target=forward_pcm, daemon=True).start()
+
+    async def decode_loop():
+        since_partial = 0
+        done = False
+        while not done:
+            pieces = [await pcm_queue.get()]
+            while not pcm_queue.empty():
+                pieces.append(pcm_queue.get_nowait())
+            if pieces[-1] is None:
+                done = True
+                pieces.pop()
+            if not pieces:
+                continue
+
+            pcm = np.concatenate(pieces)
+            committed = await infer(decoder.feed, pcm)
+            if committed:
+                add_segments(job_id, committed)
+                await send({"type": "final", "segments": committed})
+
+            since_partial += len(pcm)
+            if (not done and pcm_queue.empty()
+                    and since_partial >= LIVE_PARTIAL_INTERVAL * SAMPLE_RATE):
+                since_partial = 0
+                partial = await infer(decoder.partial)
+                await send({"type": "partial", "segments": partial})
+
+        committed = await infer(decoder.finish)
+        if committed:
+            add_segments(job_id, committed)
+            await send({"type": "final", "segments": committed})
+
+    decode_task = asyncio.create_task(decode_loop())
+
+    try:
+        while True:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                connected = False
+                break
+            if message.get("bytes"):
+                if pcm_stream is not None:
+                    await asyncio.to_thread(pcm_stream.write, message["bytes"])
+                else:
+                    await pcm_queue.put(
+                        pcm_from_frame(message["bytes"], fmt, sample_rate)
+                    )
+            elif message.get("text"):
+                try:
+                    control = json.loads(message["text"])
+                except ValueError:
+                    continue
+                if control.get("type") == "stop":
+                    break
+    except WebSocketDisconnect:
+        connected = False
+
+    # End of audio - the visit is finished whether or not the client said so
+    if pcm_stream is not None:
+        pcm_stream.close_input()
+    else:
+        await pcm_queue.put(None)
+
+    try:
+        update_job(job_id, status="processing")
+        await decode_task
+        result = decoder.result()
+        rtf = (round(inference_seconds / result["duration_seconds"], 3)
+               if result["duration_seconds"] else None)
+        jobs[job_id].update(tier=policy.best[0], beam_size=transcriber.beam_size,
+                            real_time_factor=rtf)
+        record_inference(job_id, policy.best[0], transcriber.beam_size, inference_seconds, rtf)
+        record_timing(job_id, peak_rss_bytes=job_telemetry.finish(job_id))
+        complete_job(job_id, result)
+        await send({
+            "type": "completed",
+            "job_id": job_id,
+            "transcription_text": jobs.text(job_id),
+            "duration_seconds": jobs[job_id]["duration_seconds"],
+        })
+    except Exception as e:
+        update_job(job_id, status="error", error_message=str(e))
+        print(f"Live transcription error for job {job_id}: {e}")
+        await send({"type": "error", "message": str(e)})
+    finally:
+        live_sessions.discard(job_id)
+        job_telemetry.finish(job_id)
+        if pcm_stream is not None:
+            pcm_stream.abort()
+
+    if connected:
+        await websocket.close()
 
 
 @app.get("/api/status/{job_id}")
-async def get_status(job_id: str):
+async def get_status(job_id: str, lite: bool = False):
+    """Job status. With ``lite=true`` the transcript is only included once the
+    job has completed, keeping frequent polls small."""
     if job_id not in jobs:
         raise HTTPException(status_code=404, detail="Job not found")
 
     job = jobs[job_id]
+    include_text = not lite or job["status"] == "completed"
+    if include_text:
+        mark_collected(job_id)
     return {
         "id": job["id"],
         "status": job["status"],
         "progress": job["progress"],
         "original_filename": job["original_filename"],
-        "transcription_text": job["transcription_text"],
+        "transcription_text": jobs.text(job_id) if include_text else None,
         "duration_seconds": job["duration_seconds"],
         "error_message": job["error_message"],
+        "cache_hit": job["cache_hit"],
+        "tier": job["tier"],
+        "beam_size": job["beam_size"],
+        "real_time_factor": job["real_time_factor"],
+        "upgraded": job["upgraded"],
+        "telemetry": job.get("telemetry") or {},
         "created_at": job["created_at"],
     }
 
 
+@app.get("/api/status/{job_id}/events")
+async def stream_status(job_id: str):
+    """Stream job progress as Server-Sent Events.
+
+    Events:
+      snapshot  — sent first: status, progress and the segments decoded so far
+      progress  — progress percentage changed
+      segments  — newly decoded segments (delta, with their start_index)
+      status    — status changed; on completion carries the full transcript
+    The stream ends after a completed or error status.
+    """
+    if job_id not in jobs:
+        raise HTTPException(status_code=404, detail="Job not found")
+
+    async def event_generator():
+        queue = events.subscribe(job_id)
+        try:
+            job = jobs[job_id]
+            snapshot = {
+                "type": "snapshot",
+                "status": job["status"],
+                "progress": job["progress"],
+                "segments": list(jobs.segments(job_id) or []),
+                "error_message": job["error_message"],
+            }
+            if job["status"] == "completed":
+                snapshot["transcription_text"] = jobs.text(job_id)
+                snapshot["duration_seconds"] = job["duration_seconds"]
+                snapshot["tier"] = job["tier"]
+                snapshot["upgraded"] = job["upgraded"]
+                mark_collected(job_id)
+            yield f"data: {json.dumps(snapshot, ensure_ascii=False)}\n\n"
+            if job["status"] in ("completed", "error"):
+                return
+
+            while True:
+                try:
+                    event = await asyncio.wait_for(queue.get(), timeout=20.0)
+                except asyncio.TimeoutError:
+                    # SSE comment as heartbeat - keeps proxies from closing the stream
+                    yield ": keepalive\n\n"
+                    continue
+                yield f"data: {json.dumps(event, ensure_ascii=False)}\n\n"
+                if event["type"] == "status" and event["status"] in ("completed", "error"):
+                    mark_collected(job_id)
+                    break
+        finally:
+            events.unsubscribe(job_id, queue)
+
+    return StreamingResponse(
+        event_generator(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
 @app.get("/api/download/{job_id}")
-async def download_word(job_id: str):
+async def download_word(job_id: str, layout: str = "text"):
+    """Download the Word document, rendering it on first request.
+
+    ``layout=segments`` gives one timestamped paragraph per segment.
+    """
+    if layout not in LAYOUTS:
+        raise HTTPException(status_code=400, detail=f"Unknown layout: {layout}")
     if job_id not in jobs:
         raise HTTPException(status_code=404, detail="Job not found")
 
     job = jobs[job_id]
-    if job["status"] != "completed" or not job["word_file_path"]:
+    if job["status"] != "completed":
         raise HTTPException(status_code=400, detail="Transcription not ready")
 
-    word_path = Path(job["word_file_path"])
-    if not word_path.exists():
-        raise HTTPException(status_code=404, detail="Word file not found")
+    word_path = await asyncio.to_thread(render_job_document, job_id, layout)
+    mark_collected(job_id)
 
     filename = f"transcription_{job['original_filename'].rsplit('.', 1)[0]}.docx"
     return FileResponse(
@@ -186,6 +1310,182 @@ async def download_word(job_id: str):
     )
 
 
+class ExportRequest(BaseModel):
+    """Jobs to export: explicit IDs, or a filter over completed jobs"""
+    job_ids: list[str] | None = None
+    patient_name: str | None = None
+    doctor_name: str | None = None
+    date_from: str | None = None  # YYYY-MM-DD, inclusive, on created_at
+    date_to: str | None = None
+    layout: str = "text"
+
+
+class ZipStream:
+    """Write-only, non-seekable file object for ``zipfile``.
+
+    Without ``seek`` zipfile writes data descriptors after each member, so
+    the archive can be sent as it is produced; ``drain`` hands over the
+    bytes written so far.
+    """
+
+    def __init__(self):
+        self._chunks: list[bytes] = []
+        self._offset = 0
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        self._offset += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._offset
+
+    def flush(self):
+        pass
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def select_export_jobs(request: ExportRequest) -> list[str]:
+    if request.job_ids is not None:
+        candidates = [(job_id, jobs.get(job_id)) for job_id in request.job_ids]
+    else:
+        candidates = jobs.items()
+
+    selected = []
+    for job_id, job in candidates:
+        if job is None or job["status"] != "completed":
+            continue
+        day = job["created_at"][:10]
+        if request.patient_name and job["patient_name"] != request.patient_name:
+            continue
+        if request.doctor_name and job["doctor_name"] != request.doctor_name:
+            continue
+        if request.date_from and day < request.date_from:
+            continue
+        if request.date_to and day > request.date_to:
+            continue
+        selected.append(job_id)
+    return selected
+
+
+def export_entry_name(job_id: str) -> str:
+    job = jobs[job_id]
+    parts = [
+        job["created_at"][:10],
+        job["patient_name"] or "",
+        job["original_filename"].rsplit(".", 1)[0],
+        job_id[:8],
+    ]
+    name = "_".join(p for p in parts if p)
+    return "".join("_" if c in '\\/:*?"<>|' else c for c in name) + ".docx"
+
+
+def stream_export_zip(job_ids: list[str], layout: str):
+    """Yield a ZIP archive of the jobs' documents, adding each as its render finishes"""
+    buffer = ZipStream()
+    pool = ThreadPoolExecutor(max_workers=EXPORT_WORKERS, thread_name_prefix="export")
+    try:
+        futures = {pool.submit(render_job_document, job_id, layout): job_id for job_id in job_ids}
+        with zipfile.ZipFile(buffer, "w", compression=zipfile.ZIP_DEFLATED) as archive:
+            for future in as_completed(futures):
+                job_id = futures[future]
+                try:
+                    path = future.result()
+                except Exception as e:
+                    print(f"Export: failed to render job {job_id}: {e}")
+                    continue
+                archive.write(path, arcname=export_entry_name(job_id))
+                mark_collected(job_id)
+                yield buffer.drain()
+        # Central directory, written when the archive closes
+        yield buffer.drain()
+    finally:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+@app.post("/api/export")
+async def export_transcriptions(request: ExportRequest):
+    """Stream a ZIP of Word documents for a list of jobs or a filter"""
+    if request.layout not in LAYOUTS:
+        raise HTTPException(status_code=400, detail=f"Unknown layout: {request.layout}")
+
+    filters = (request.patient_name, request.doctor_name, request.date_from, request.date_to)
+    if request.job_ids is None and not any(filters):
+        # Never fall back to every job in the service
+        raise HTTPException(status_code=400, detail="Specify job_ids or a filter")
+
+    job_ids = select_export_jobs(request)
+    if not job_ids:
+        raise HTTPException(status_code=404, detail="No completed transcriptions match")
+
+    filename = f"transcriptions_{datetime.now().strftime('%Y%m%d_%H%M%S')}.zip"
+    return StreamingResponse(
+        stream_export_zip(job_ids, request.layout),
+        media_type="application/zip",
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
+
+
+class IndexHandoffRequest(BaseModel):
+    """Where the web app saved the transcription, for the RAG index"""
+    source_id: str
+
+
+def post_to_rag(path: str, payload: dict, internal_key: str) -> dict:
+    request = urllib.request.Request(
+        f"{RAG_SERVER_URL}{path}",
+        data=json.dumps(payload, ensure_ascii=False).encode("utf-8"),
+        headers={"Content-Type": "application/json", "X-Internal-Key": internal_key},
+        method="POST",
+    )
+    with urllib.request.urlopen(request, timeout=300) as response:
+        return json.loads(response.read())
+
+
+@app.post("/api/index/{job_id}")
+async def index_transcription(job_id: str, body: IndexHandoffRequest, request: Request):
+    """Hand a finished transcription, segments included, to the RAG indexer.
+
+    The caller's ``X-Internal-Key`` is passed through to the RAG server,
+    which only accepts it for the row saved from this job.
+    """
+    if job_id not in jobs:
+        raise HTTPException(status_code=404, detail="Job not found")
+
+    job = jobs[job_id]
+    if job["status"] != "completed":
+        raise HTTPException(status_code=400, detail="Transcription not ready")
+    mark_collected(job_id)
+
+    # The RAG server takes doctor, patient and date from the saved row
+    payload = {
+        "transcription_id": body.source_id,
+        "job_id": job_id,
+        "transcription_text": jobs.text(job_id) or "",
+        "segments": [
+            {"start": s["start"], "end": s["end"], "text": s["text"]}
+            for s in jobs.segments(job_id) or []
+        ],
+    }
+
+    try:
+        result = await asyncio.to_thread(
+            post_to_rag, "/rag/index/transcription", payload,
+            request.headers.get("X-Internal-Key", ""),
+        )
+    except urllib.error.HTTPError as e:
+        raise HTTPException(status_code=e.code, detail=f"RAG indexing failed: {e.reason}")
+    except (urllib.error.URLError, OSError) as e:
+        raise HTTPException(status_code=503, detail=f"RAG server unreachable: {e}")
+
+    print(f"Job {job_id}: indexed as transcription {body.source_id} ({result.get('chunks_created')} chunks)")
+    return result
+
+
 if __name__ == "__main__":
     print("=" * 50)
     print("DOCTOR SEARCH - Transcription Service")
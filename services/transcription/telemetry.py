@@ -0,0 +1,137 @@
+"""
+Job telemetry
+Per-job stage timings (queue wait, decode, inference, DOCX render) and peak
+process RSS while the job ran, plus Prometheus metrics for the service:
+stage histograms labelled by tier and compute type, and gauges for queue
+depth, active workers and model load time
+"""
+
+import time
+from threading import Lock, Thread
+
+from prometheus_client import Gauge, Histogram, CONTENT_TYPE_LATEST, generate_latest
+
+STAGE_BUCKETS = (0.1, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600, 1800)
+
+QUEUE_WAIT_SECONDS = Histogram(
+    "transcription_queue_wait_seconds",
+    "Time a job waited for a decode slot and then for an inference worker",
+    buckets=STAGE_BUCKETS,
+)
+DECODE_SECONDS = Histogram(
+    "transcription_decode_seconds", "ffmpeg decode time per job",
+    buckets=STAGE_BUCKETS,
+)
+INFERENCE_SECONDS = Histogram(
+    "transcription_inference_seconds", "Whisper inference time per job",
+    ["tier", "compute_type", "beam_size"], buckets=STAGE_BUCKETS,
+)
+REAL_TIME_FACTOR = Histogram(
+    "transcription_real_time_factor", "Inference time divided by audio duration",
+    ["tier", "compute_type", "beam_size"],
+    buckets=(0.05, 0.1, 0.2, 0.3, 0.5, 0.75, 1, 1.5, 2, 3, 5),
+)
+DOCX_RENDER_SECONDS = Histogram(
+    "transcription_docx_render_seconds", "Word document render time",
+    ["layout", "cached"], buckets=(0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10),
+)
+JOB_PEAK_RSS_BYTES = Histogram(
+    "transcription_job_peak_rss_bytes", "Peak process RSS while a job was decoding or transcribing",
+    buckets=[gb * 2**30 for gb in (0.5, 1, 1.5, 2, 3, 4, 6, 8, 12, 16)],
+)
+
+MODEL_LOAD_SECONDS = Gauge(
+    "transcription_model_load_seconds", "Model load and warmup time", ["tier", "compute_type"],
+)
+PROCESS_RSS_BYTES = Gauge("transcription_process_rss_bytes", "Current process RSS")
+
+
+def rss_bytes() -> int | None:
+    """Current resident set size of this process (Linux only)"""
+    try:
+        with open("/proc/self/status") as status:
+            for line in status:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return None
+
+
+class JobTelemetry:
+    """Collects each job's stage timings and samples RSS while jobs run.
+
+    RSS is process-wide, so with several jobs in flight each one's peak
+    includes the others; it still bounds what the task needs for that mix.
+    """
+
+    def __init__(self, sample_interval: float = 0.5):
+        self.sample_interval = sample_interval
+        self._lock = Lock()
+        self._marks: dict[str, dict[str, float]] = {}
+        self._peaks: dict[str, int] = {}
+        self._sampler: Thread | None = None
+
+    def mark(self, job_id: str, event: str):
+        """Record when a job reached a pipeline event (submitted, decoded, ...)"""
+        with self._lock:
+            self._marks.setdefault(job_id, {})[event] = time.monotonic()
+
+    def queue_wait(self, job_id: str) -> float | None:
+        """Time spent waiting for a decode slot plus time the decoded audio
+        waited for an inference worker, up to now"""
+        with self._lock:
+            marks = dict(self._marks.get(job_id, {}))
+        if "submitted" not in marks or "decode_started" not in marks:
+            return None
+        wait = marks["decode_started"] - marks["submitted"]
+        if "decoded" in marks:
+            wait += time.monotonic() - marks["decoded"]
+        return wait
+
+    def track_memory(self, job_id: str):
+        """Start sampling RSS on behalf of a job"""
+        with self._lock:
+            self._peaks.setdefault(job_id, rss_bytes() or 0)
+            if self._sampler is None:
+                self._sampler = Thread(target=self._sample_loop, name="rss-sampler", daemon=True)
+                self._sampler.start()
+
+    def _sample_loop(self):
+        while True:
+            time.sleep(self.sample_interval)
+            current = rss_bytes()
+            if current is None:
+                continue
+            PROCESS_RSS_BYTES.set(current)
+            with self._lock:
+                for job_id, peak in self._peaks.items():
+                    if current > peak:
+                        self._peaks[job_id] = current
+
+    def finish(self, job_id: str) -> int | None:
+        """Stop tracking a job; returns its peak RSS"""
+        current = rss_bytes() or 0
+        with self._lock:
+            self._marks.pop(job_id, None)
+            peak = self._peaks.pop(job_id, None)
+        if peak is None:
+            return None
+        peak = max(peak, current)
+        JOB_PEAK_RSS_BYTES.observe(peak)
+        return peak
+
+
+def watch_pipeline(stats_fn):
+    """Queue depth and active worker gauges, read from the pipeline on scrape"""
+    depth = Gauge("transcription_queue_depth", "Jobs waiting in the pipeline", ["stage"])
+    depth.labels("decode").set_function(lambda: stats_fn()["decoding"])
+    depth.labels("inference").set_function(lambda: stats_fn()["decoded_waiting"])
+    Gauge(
+        "transcription_active_workers", "Inference workers transcribing a job",
+    ).set_function(lambda: stats_fn()["inferring"])
+
+
+def render() -> tuple[bytes, str]:
+    PROCESS_RSS_BYTES.set(rss_bytes() or 0)
+    return generate_latest(), CONTENT_TYPE_LATEST
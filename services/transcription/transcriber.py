@@ -3,8 +3,16 @@ Transcription engine using faster-whisper
 Based on the existing transcribe.py project
 """
 
-from faster_whisper import WhisperModel
+import time
 from pathlib import Path
+from threading import Event, Lock
+
+from faster_whisper import WhisperModel
+
+import numpy as np
+
+# faster-whisper works on 16 kHz mono float32 audio
+SAMPLE_RATE = 16000
 
 
 class Transcriber:
@@ -13,40 +21,107 @@ class Transcriber:
         model_name: str = "Systran/faster-whisper-medium",
         device: str = "cpu",
         compute_type: str = "int8",
+        beam_size: int = 5,
+        num_workers: int = 1,
+        cpu_threads: int = 0,
     ):
         self.model_name = model_name
         self.device = device
         self.compute_type = compute_type
+        self.beam_size = beam_size
+        self.num_workers = num_workers
+        # 0 lets CTranslate2 pick its default
+        self.cpu_threads = cpu_threads
         self.model = None
 
+        # Readiness: "not_loaded" -> "loading" -> "ready" (or "error")
+        self.state = "not_loaded"
+        self.load_seconds: float | None = None
+        self.load_error: str | None = None
+        self.ready = Event()
+        self._load_lock = Lock()
+
     def load_model(self):
-        if self.model is None:
-            print(f"Loading model: {self.model_name}...")
-            self.model = WhisperModel(
-                self.model_name,
-                device=self.device,
-                compute_type=self.compute_type,
-            )
-            print("Model loaded successfully")
+        with self._load_lock:
+            if self.model is None:
+                print(f"Loading model: {self.model_name}...")
+                self.model = WhisperModel(
+                    self.model_name,
+                    device=self.device,
+                    compute_type=self.compute_type,
+                    num_workers=self.num_workers,
+                    cpu_threads=self.cpu_threads,
+                )
+                print("Model loaded successfully")
+
+    def warmup(self):
+        """Run one short decode so the first real job doesn't pay for lazy init"""
+        # One second of quiet noise - pure silence is skipped before the decoder runs
+        rng = np.random.default_rng(0)
+        audio = (rng.standard_normal(SAMPLE_RATE) * 0.01).astype(np.float32)
+        segments_iter, _ = self.model.transcribe(audio, language="he", beam_size=self.beam_size)
+        for _ in segments_iter:
+            pass
+
+    def preload(self):
+        """Load and warm the model, tracking readiness. Meant for a startup thread."""
+        self.state = "loading"
+        started = time.monotonic()
+        try:
+            self.load_model()
+            self.warmup()
+        except Exception as e:
+            self.state = "error"
+            self.load_error = str(e)
+            print(f"Model preload failed: {e}")
+            return
+        self.load_seconds = round(time.monotonic() - started, 2)
+        self.state = "ready"
+        self.ready.set()
+        print(f"Model ready in {self.load_seconds}s")
+
+    def readiness(self) -> dict:
+        return {
+            "state": self.state,
+            "model": self.model_name,
+            "compute_type": self.compute_type,
+            "load_seconds": self.load_seconds,
+            "error": self.load_error,
+        }
+
+    def decoding_params(self, beam_size: int | None = None) -> dict:
+        """Settings that change the transcription output (used for result caching)"""
+        return {
+            "model": self.model_name,
+            "compute_type": self.compute_type,
+            "beam_size": beam_size or self.beam_size,
+        }
 
     def transcribe(
         self,
         audio_path: str,
         language: str = "he",
         on_progress=None,
+        on_segment=None,
+        audio: np.ndarray | None = None,
+        beam_size: int | None = None,
     ) -> dict:
+        """Transcribe a file, or ``audio`` already decoded to 16 kHz mono
+        float32 (``audio_path`` is then only used for logging).
+        ``beam_size`` overrides the instance default for this call."""
         self.load_model()
 
-        path = Path(audio_path)
-        if not path.exists():
-            raise FileNotFoundError(f"File not found: {audio_path}")
+        if audio is None:
+            path = Path(audio_path)
+            if not path.exists():
+                raise FileNotFoundError(f"File not found: {audio_path}")
 
         print(f"Transcribing: {audio_path}")
 
         segments_iter, info = self.model.transcribe(
-            audio_path,
+            audio_path if audio is None else audio,
             language=language,
-            beam_size=5,
+            beam_size=beam_size or self.beam_size,
         )
 
         detected_language = info.language
@@ -58,13 +133,17 @@ class Transcriber:
 
         for segment in segments_iter:
             text = segment.text.strip()
-            segments.append({
+            segment_dict = {
                 "start": round(segment.start, 2),
                 "end": round(segment.end, 2),
                 "text": text,
-            })
+            }
+            segments.append(segment_dict)
             transcript_parts.append(text)
 
+            if on_segment:
+                on_segment(segment_dict)
+
             if on_progress and duration > 0:
                 progress = min(segment.end / duration * 100, 100)
                 on_progress(progress)
@@ -78,3 +157,222 @@ class Transcriber:
             "language_probability": round(language_probability, 2),
             "duration_seconds": round(duration, 1),
         }
+
+    def decode_segments(
+        self,
+        audio: np.ndarray,
+        language: str = "he",
+        offset: float = 0.0,
+    ) -> list[dict]:
+        """Transcribe an in-memory 16 kHz mono buffer.
+
+        Segment times are shifted by ``offset`` seconds so callers decoding a
+        window of a longer stream get stream-relative timestamps.
+        """
+        self.load_model()
+
+        segments_iter, _ = self.model.transcribe(
+            audio,
+            language=language,
+            beam_size=self.beam_size,
+        )
+
+        return [
+            {
+                "start": round(offset + segment.start, 2),
+                "end": round(offset + segment.end, 2),
+                "text": segment.text.strip(),
+            }
+            for segment in segments_iter
+        ]
+
+
+# Rough CPU/int8 real-time factors (processing seconds per audio second) at
+# beam_size=5, used until a tier has measured jobs of its own
+PRIOR_RTF = {"tiny": 0.05, "base": 0.08, "small": 0.2, "medium": 0.5, "large": 1.0}
+# Greedy decoding costs roughly this fraction of beam search
+GREEDY_RTF_FACTOR = 0.6
+
+
+class TierPolicy:
+    """Choose a model tier and beam size per job to meet a turnaround target.
+
+    ``tiers`` is ordered fastest to most accurate. Options are tried from the
+    most accurate down; the first whose predicted turnaround fits the target
+    wins. Predicted turnaround is the time the job already waited plus the
+    time to process it and the decoded backlog behind it at the option's
+    real-time factor. Each option's real-time factor is a moving average of
+    measured jobs, starting from a model-size prior.
+    """
+
+    def __init__(
+        self,
+        tiers: dict[str, Transcriber],
+        beam_sizes: list[int] | None = None,
+        target_turnaround: float = 0.0,
+        workers: int = 1,
+    ):
+        self.tiers = tiers
+        self.beam_sizes = sorted(beam_sizes or [5], reverse=True)
+        self.target_turnaround = target_turnaround
+        self.workers = max(workers, 1)
+        self._rtf: dict[tuple[str, int], float] = {}
+        self._lock = Lock()
+
+    def options(self) -> list[tuple[str, int]]:
+        """All (tier, beam_size) options, most accurate first"""
+        return [
+            (tier, beam)
+            for tier in reversed(list(self.tiers))
+            for beam in self.beam_sizes
+        ]
+
+    @property
+    def best(self) -> tuple[str, int]:
+        return self.options()[0]
+
+    def rank(self, option: tuple[str, int]) -> int:
+        """Position of an option in accuracy order (0 = most accurate)"""
+        return self.options().index(option)
+
+    def estimated_rtf(self, tier: str, beam_size: int) -> float:
+        with self._lock:
+            measured = self._rtf.get((tier, beam_size))
+        if measured is not None:
+            return measured
+        model_name = self.tiers[tier].model_name.lower()
+        prior = next((rtf for size, rtf in PRIOR_RTF.items() if size in model_name), 0.5)
+        return prior * (GREEDY_RTF_FACTOR if beam_size == 1 else 1.0)
+
+    def choose(
+        self,
+        audio_seconds: float,
+        waited_seconds: float = 0.0,
+        backlog_seconds: float = 0.0,
+    ) -> tuple[str, int]:
+        if self.target_turnaround <= 0:
+            return self.best
+        options = self.options()
+        for tier, beam in options:
+            rtf = self.estimated_rtf(tier, beam)
+            predicted = waited_seconds + (audio_seconds + backlog_seconds) * rtf / self.workers
+            if predicted <= self.target_turnaround:
+                return tier, beam
+        return options[-1]
+
+    def record(self, tier: str, beam_size: int, audio_seconds: float,
+               elapsed_seconds: float, alpha: float = 0.3) -> float | None:
+        """Fold a finished job into the option's moving average. Returns its RTF."""
+        if audio_seconds <= 0:
+            return None
+        rtf = elapsed_seconds / audio_seconds
+        with self._lock:
+            previous = self._rtf.get((tier, beam_size))
+            self._rtf[(tier, beam_size)] = (
+                rtf if previous is None else alpha * rtf + (1 - alpha) * previous
+            )
+        return round(rtf, 3)
+
+    def stats(self) -> dict:
+        return {
+            "target_turnaround_seconds": self.target_turnaround,
+            "options": [
+                {"tier": tier, "beam_size": beam,
+                 "real_time_factor": round(self.estimated_rtf(tier, beam), 3)}
+                for tier, beam in self.options()
+            ],
+        }
+
+
+class IncrementalDecoder:
+    """Sliding-window decoder for audio that arrives a piece at a time.
+
+    PCM is buffered until a full window is available and then decoded.
+    Segments that end well before the window edge are committed; the buffer
+    is trimmed to the end of the last committed segment so the next window
+    starts on a segment boundary instead of mid-word.
+    """
+
+    def __init__(
+        self,
+        transcriber: Transcriber,
+        language: str = "he",
+        window_seconds: float = 30.0,
+        margin_seconds: float = 5.0,
+    ):
+        self.transcriber = transcriber
+        self.language = language
+        self.window_samples = int(window_seconds * SAMPLE_RATE)
+        self.margin_seconds = margin_seconds
+        self.segments: list[dict] = []
+        self.samples_received = 0
+        self._buffer = np.zeros(0, dtype=np.float32)
+        self._offset = 0.0  # stream time of self._buffer[0], in seconds
+
+    @property
+    def duration(self) -> float:
+        return self.samples_received / SAMPLE_RATE
+
+    def feed(self, pcm: np.ndarray) -> list[dict]:
+        """Append PCM and decode every full window. Returns newly committed segments."""
+        self._buffer = np.concatenate((self._buffer, pcm.astype(np.float32, copy=False)))
+        self.samples_received += len(pcm)
+
+        committed = []
+        while len(self._buffer) >= self.window_samples:
+            committed.extend(self._decode_window(final=False))
+        return committed
+
+    def partial(self) -> list[dict]:
+        """Decode the uncommitted tail without committing it (for live previews)."""
+        if not len(self._buffer):
+            return []
+        return self.transcriber.decode_segments(
+            self._buffer, self.language, offset=self._offset
+        )
+
+    def finish(self) -> list[dict]:
+        """Decode whatever is left in the buffer and commit all of it."""
+        if not len(self._buffer):
+            return []
+        return self._decode_window(final=True)
+
+    def _decode_window(self, final: bool) -> list[dict]:
+        window = self._buffer if final else self._buffer[:self.window_samples]
+        window_seconds = len(window) / SAMPLE_RATE
+        segments = self.transcriber.decode_segments(
+            window, self.language, offset=self._offset
+        )
+
+        if final:
+            keep = segments
+            cut_seconds = window_seconds
+        else:
+            horizon = self._offset + window_seconds - self.margin_seconds
+            keep = [s for s in segments if s["end"] <= horizon]
+            if not keep and segments:
+                # A single segment spans the whole window - commit it anyway
+                keep = segments[:1]
+            if keep:
+                cut_seconds = keep[-1]["end"] - self._offset
+            else:
+                # Silence: drop the settled part of the window
+                cut_seconds = window_seconds - self.margin_seconds
+
+        cut = min(max(int(cut_seconds * SAMPLE_RATE), 1), len(self._buffer))
+        self._buffer = self._buffer[cut:]
+        self._offset += cut / SAMPLE_RATE
+
+        keep = [s for s in keep if s["text"]]
+        self.segments.extend(keep)
+        return keep
+
+    def result(self) -> dict:
+        """Build a result dict shaped like ``Transcriber.transcribe`` output."""
+        return {
+            "text": " ".join(s["text"] for s in self.segments),
+            "segments": self.segments,
+            "language": self.language,
+            "language_probability": None,
+            "duration_seconds": round(self.duration, 1),
+        }
@@ -8,8 +8,17 @@ from docx.shared import Pt, Inches, RGBColor
 from docx.enum.text import WD_ALIGN_PARAGRAPH
 from docx.oxml.ns import qn
 from datetime import datetime
+from functools import lru_cache
+from io import BytesIO
 from pathlib import Path
 
+# Placeholder paragraphs in the cached template, replaced per document
+DETAILS_MARKER = '{{DETAILS}}'
+BODY_MARKER = '{{BODY}}'
+
+# Body layouts: one paragraph of running text, or one timestamped paragraph per segment
+LAYOUTS = ('text', 'segments')
+
 
 def set_rtl_paragraph(paragraph):
     """Set paragraph to RTL direction"""
@@ -18,15 +27,17 @@ def set_rtl_paragraph(paragraph):
     pPr.append(bidi)
 
 
-def generate_word_document(
-    transcription_text: str,
-    doctor_name: str = "",
-    doctor_specialization: str = "",
-    patient_name: str = "",
-    original_filename: str = "",
-    duration_seconds: float = 0,
-    output_path: str = None,
-) -> str:
+def add_separator(doc):
+    sep = doc.add_paragraph()
+    sep.alignment = WD_ALIGN_PARAGRAPH.CENTER
+    run = sep.add_run('─' * 50)
+    run.font.color.rgb = RGBColor(156, 163, 175)
+
+
+@lru_cache(maxsize=1)
+def build_template() -> bytes:
+    """Build the static parts of the document once: fonts, RTL section,
+    header, separators and footer, with placeholders for the details and body"""
     doc = Document()
 
     # Set default font
@@ -58,13 +69,92 @@ def generate_word_document(
     run.font.size = Pt(16)
 
     # --- Separator ---
-    sep = doc.add_paragraph()
-    sep.alignment = WD_ALIGN_PARAGRAPH.CENTER
-    run = sep.add_run('─' * 50)
+    add_separator(doc)
+
+    # --- Details ---
+    doc.add_paragraph(DETAILS_MARKER)
+
+    # --- Separator ---
+    add_separator(doc)
+
+    # --- Transcription Title ---
+    title = doc.add_paragraph()
+    set_rtl_paragraph(title)
+    title.alignment = WD_ALIGN_PARAGRAPH.RIGHT
+    run = title.add_run('תוכן התמלול:')
+    run.bold = True
+    run.font.size = Pt(14)
+
+    # --- Transcription Content ---
+    doc.add_paragraph(BODY_MARKER)
+
+    # --- Footer ---
+    doc.add_paragraph()
+    add_separator(doc)
+
+    footer = doc.add_paragraph()
+    set_rtl_paragraph(footer)
+    footer.alignment = WD_ALIGN_PARAGRAPH.CENTER
+    run = footer.add_run('מסמך זה נוצר באופן אוטומטי על ידי מערכת DOCTOR SEARCH')
+    run.font.size = Pt(9)
     run.font.color.rgb = RGBColor(156, 163, 175)
 
+    privacy = doc.add_paragraph()
+    set_rtl_paragraph(privacy)
+    privacy.alignment = WD_ALIGN_PARAGRAPH.CENTER
+    run = privacy.add_run('מסמך חסוי - לשימוש רפואי בלבד')
+    run.bold = True
+    run.font.size = Pt(9)
+    run.font.color.rgb = RGBColor(220, 38, 38)
+
+    buffer = BytesIO()
+    doc.save(buffer)
+    return buffer.getvalue()
+
+
+def find_paragraph(doc, marker: str):
+    for paragraph in doc.paragraphs:
+        if paragraph.text == marker:
+            return paragraph
+    raise ValueError(f'Template placeholder not found: {marker}')
+
+
+def remove_paragraph(paragraph):
+    element = paragraph._element
+    element.getparent().remove(element)
+
+
+def format_timestamp(seconds: float) -> str:
+    minutes, secs = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    if hours:
+        return f'{hours}:{minutes:02d}:{secs:02d}'
+    return f'{minutes:02d}:{secs:02d}'
+
+
+def render_word_document(
+    transcription_text: str,
+    doctor_name: str = "",
+    doctor_specialization: str = "",
+    patient_name: str = "",
+    original_filename: str = "",
+    duration_seconds: float = 0,
+    segments: list[dict] | None = None,
+    layout: str = 'text',
+    created_at: datetime | None = None,
+) -> bytes:
+    """Fill the cached template with the details and body; returns DOCX bytes.
+
+    ``layout='segments'`` writes one paragraph per segment prefixed with its
+    start time. ``created_at`` is the date shown on the document (default now).
+    """
+    if layout not in LAYOUTS:
+        raise ValueError(f'Unknown layout: {layout}')
+
+    doc = Document(BytesIO(build_template()))
+
     # --- Details ---
-    now = datetime.now()
+    now = created_at or datetime.now()
     date_str = now.strftime('%d/%m/%Y')
     time_str = now.strftime('%H:%M')
 
@@ -81,13 +171,14 @@ def generate_word_document(
         details.append(('מטופל/ת', patient_name))
     if original_filename:
         details.append(('קובץ מקור', original_filename))
-    if duration_seconds > 0:
+    if duration_seconds and duration_seconds > 0:
         minutes = int(duration_seconds // 60)
         seconds = int(duration_seconds % 60)
         details.append(('משך ההקלטה', f'{minutes} דקות ו-{seconds} שניות'))
 
+    details_marker = find_paragraph(doc, DETAILS_MARKER)
     for label, value in details:
-        p = doc.add_paragraph()
+        p = details_marker.insert_paragraph_before()
         set_rtl_paragraph(p)
         p.alignment = WD_ALIGN_PARAGRAPH.RIGHT
         run_label = p.add_run(f'{label}: ')
@@ -95,58 +186,66 @@ def generate_word_document(
         run_label.font.size = Pt(11)
         run_value = p.add_run(value)
         run_value.font.size = Pt(11)
-
-    # --- Separator ---
-    sep2 = doc.add_paragraph()
-    sep2.alignment = WD_ALIGN_PARAGRAPH.CENTER
-    run = sep2.add_run('─' * 50)
-    run.font.color.rgb = RGBColor(156, 163, 175)
-
-    # --- Transcription Title ---
-    title = doc.add_paragraph()
-    set_rtl_paragraph(title)
-    title.alignment = WD_ALIGN_PARAGRAPH.RIGHT
-    run = title.add_run('תוכן התמלול:')
-    run.bold = True
-    run.font.size = Pt(14)
+    remove_paragraph(details_marker)
 
     # --- Transcription Content ---
-    content = doc.add_paragraph()
-    set_rtl_paragraph(content)
-    content.alignment = WD_ALIGN_PARAGRAPH.RIGHT
-    run = content.add_run(transcription_text)
-    run.font.size = Pt(12)
-    paragraph_format = content.paragraph_format
-    paragraph_format.line_spacing = 1.5
+    body_marker = find_paragraph(doc, BODY_MARKER)
+    if layout == 'segments' and segments:
+        for segment in segments:
+            p = body_marker.insert_paragraph_before()
+            set_rtl_paragraph(p)
+            p.alignment = WD_ALIGN_PARAGRAPH.RIGHT
+            run_time = p.add_run(f'[{format_timestamp(segment["start"])}] ')
+            run_time.font.size = Pt(10)
+            run_time.font.color.rgb = RGBColor(107, 114, 128)
+            run_text = p.add_run(segment['text'])
+            run_text.font.size = Pt(12)
+            p.paragraph_format.line_spacing = 1.5
+    else:
+        content = body_marker.insert_paragraph_before()
+        set_rtl_paragraph(content)
+        content.alignment = WD_ALIGN_PARAGRAPH.RIGHT
+        run = content.add_run(transcription_text)
+        run.font.size = Pt(12)
+        paragraph_format = content.paragraph_format
+        paragraph_format.line_spacing = 1.5
+    remove_paragraph(body_marker)
+
+    buffer = BytesIO()
+    doc.save(buffer)
+    return buffer.getvalue()
 
-    # --- Footer ---
-    doc.add_paragraph()
-    sep3 = doc.add_paragraph()
-    sep3.alignment = WD_ALIGN_PARAGRAPH.CENTER
-    run = sep3.add_run('─' * 50)
-    run.font.color.rgb = RGBColor(156, 163, 175)
 
-    footer = doc.add_paragraph()
-    set_rtl_paragraph(footer)
-    footer.alignment = WD_ALIGN_PARAGRAPH.CENTER
-    run = footer.add_run('מסמך זה נוצר באופן אוטומטי על ידי מערכת DOCTOR SEARCH')
-    run.font.size = Pt(9)
-    run.font.color.rgb = RGBColor(156, 163, 175)
-
-    privacy = doc.add_paragraph()
-    set_rtl_paragraph(privacy)
-    privacy.alignment = WD_ALIGN_PARAGRAPH.CENTER
-    run = privacy.add_run('מסמך חסוי - לשימוש רפואי בלבד')
-    run.bold = True
-    run.font.size = Pt(9)
-    run.font.color.rgb = RGBColor(220, 38, 38)
+def generate_word_document(
+    transcription_text: str,
+    doctor_name: str = "",
+    doctor_specialization: str = "",
+    patient_name: str = "",
+    original_filename: str = "",
+    duration_seconds: float = 0,
+    output_path: str = None,
+    segments: list[dict] | None = None,
+    layout: str = 'text',
+    created_at: datetime | None = None,
+) -> str:
+    data = render_word_document(
+        transcription_text=transcription_text,
+        doctor_name=doctor_name,
+        doctor_specialization=doctor_specialization,
+        patient_name=patient_name,
+        original_filename=original_filename,
+        duration_seconds=duration_seconds,
+        segments=segments,
+        layout=layout,
+        created_at=created_at,
+    )
 
     # Save
     if output_path is None:
         output_dir = Path(__file__).parent / 'outputs'
         output_dir.mkdir(exist_ok=True)
-        timestamp = now.strftime('%Y%m%d_%H%M%S')
+        timestamp = (created_at or datetime.now()).strftime('%Y%m%d_%H%M%S')
         output_path = str(output_dir / f'transcription_{timestamp}.docx')
 
-    doc.save(output_path)
+    Path(output_path).write_bytes(data)
     return output_path
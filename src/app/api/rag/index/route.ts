@@ -2,6 +2,7 @@ import { NextRequest, NextResponse } from 'next/server'
 import { createClient } from '@/lib/supabase/server'
 
 const RAG_SERVER_URL = process.env.RAG_SERVER_URL || 'http://localhost:8001'
+const TRANSCRIPTION_SERVICE_URL = process.env.TRANSCRIPTION_SERVICE_URL || 'http://localhost:8000'
 const RAG_INTERNAL_KEY = process.env.SUPABASE_SERVICE_ROLE_KEY || ''
 
 export async function POST(request: NextRequest) {
@@ -18,7 +19,7 @@ export async function POST(request: NextRequest) {
       )
     }
 
-    const { source_table, source_id, doctor_id, patient_id } = await request.json()
+    const { source_table, source_id, doctor_id } = await request.json()
 
     if (!source_table || !source_id) {
       return NextResponse.json(
@@ -27,24 +28,94 @@ export async function POST(request: NextRequest) {
       )
     }
 
+    // Doctor, patient and job come from the row, never from the request
+    let doctorId: string | undefined
+    let jobId: string | null = null
+    if (source_table === 'transcriptions' || source_table === 'treatment_summaries') {
+      const doctorResult = await supabase
+        .from('doctors')
+        .select('id')
+        .eq('user_id', user.id)
+        .single()
+
+      doctorId = (doctorResult.data as { id: string } | null)?.id
+
+      if (!doctorId) {
+        return NextResponse.json(
+          { error: 'משתמש זה אינו רופא.' },
+          { status: 403 }
+        )
+      }
+
+      const { data: row } = await (supabase as any)
+        .from(source_table)
+        .select(source_table === 'transcriptions' ? 'id, job_id' : 'id')
+        .eq('id', source_id)
+        .eq('doctor_id', doctorId)
+        .maybeSingle()
+
+      if (!row) {
+        return NextResponse.json(
+          { error: 'המסמך לא נמצא.' },
+          { status: 404 }
+        )
+      }
+      jobId = (row as { job_id?: string | null }).job_id || null
+    } else if (source_table === 'users') {
+      // Patients index their own details for a doctor they booked with
+      if (source_id !== user.id || !doctor_id) {
+        return NextResponse.json(
+          { error: 'אין הרשאה.' },
+          { status: 403 }
+        )
+      }
+      doctorId = doctor_id
+    } else {
+      return NextResponse.json(
+        { error: `Unknown source_table: ${source_table}` },
+        { status: 400 }
+      )
+    }
+
+    const indexFromDatabase = () =>
+      fetch(`${RAG_SERVER_URL}/rag/index`, {
+        method: 'POST',
+        headers: {
+          'Content-Type': 'application/json',
+          'X-Internal-Key': RAG_INTERNAL_KEY,
+        },
+        body: JSON.stringify({
+          source_table,
+          source_id,
+          doctor_id: doctorId,
+        }),
+        signal: AbortSignal.timeout(300000),
+      })
+
     // Fire-and-forget: call RAG server to index the document
     // Don't await - let it run in the background
-    fetch(`${RAG_SERVER_URL}/rag/index`, {
-      method: 'POST',
-      headers: {
-        'Content-Type': 'application/json',
-        'X-Internal-Key': RAG_INTERNAL_KEY,
-      },
-      body: JSON.stringify({
-        source_table,
-        source_id,
-        doctor_id,
-        patient_id,
-      }),
-      signal: AbortSignal.timeout(300000),
-    }).catch((err) => {
-      console.error('RAG index fire-and-forget error:', err)
-    })
+    if (source_table === 'transcriptions' && jobId) {
+      // The transcription service hands its result (with segment timestamps)
+      // straight to the indexer; fall back to a fetch from the table if the
+      // job is gone (e.g. expired or service restarted)
+      fetch(`${TRANSCRIPTION_SERVICE_URL}/api/index/${encodeURIComponent(jobId)}`, {
+        method: 'POST',
+        headers: {
+          'Content-Type': 'application/json',
+          'X-Internal-Key': RAG_INTERNAL_KEY,
+        },
+        body: JSON.stringify({ source_id }),
+        signal: AbortSignal.timeout(300000),
+      })
+        .then((res) => (res.ok ? res : indexFromDatabase()))
+        .catch((err) => {
+          console.error('RAG index handoff error:', err)
+        })
+    } else {
+      indexFromDatabase().catch((err) => {
+        console.error('RAG index fire-and-forget error:', err)
+      })
+    }
 
     return NextResponse.json({ status: 'indexing' })
   } catch (error) {
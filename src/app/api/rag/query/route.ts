@@ -6,6 +6,13 @@ export const maxDuration = 600
 const RAG_SERVER_URL = process.env.RAG_SERVER_URL || 'http://localhost:8001'
 const RAG_INTERNAL_KEY = process.env.SUPABASE_SERVICE_ROLE_KEY || ''
 
+function traceHeaders(ragResponse: Response, requestId: string): Record<string, string> {
+  const headers: Record<string, string> = { 'X-Request-ID': requestId }
+  const serverTiming = ragResponse.headers.get('server-timing')
+  if (serverTiming) headers['Server-Timing'] = serverTiming
+  return headers
+}
+
 export async function POST(request: NextRequest) {
   try {
     const supabase = await createClient()
@@ -51,9 +58,13 @@ export async function POST(request: NextRequest) {
       doctor_id: doctorId,
     })
 
+    // Trace ID carried through the RAG server's logs and timing breakdown
+    const requestId = request.headers.get('x-request-id') || crypto.randomUUID()
+
     const ragHeaders = {
       'Content-Type': 'application/json',
       'X-Internal-Key': RAG_INTERNAL_KEY,
+      'X-Request-ID': requestId,
     }
 
     // --- Streaming path (SSE passthrough) ---
@@ -99,6 +110,7 @@ export async function POST(request: NextRequest) {
           'Cache-Control': 'no-cache, no-transform',
           'Connection': 'keep-alive',
           'X-Accel-Buffering': 'no',
+          ...traceHeaders(ragResponse, requestId),
         },
       })
     }
@@ -120,7 +132,7 @@ export async function POST(request: NextRequest) {
     }
 
     const data = await ragResponse.json()
-    return NextResponse.json(data)
+    return NextResponse.json(data, { headers: traceHeaders(ragResponse, requestId) })
   } catch (error) {
     console.error('RAG query error:', error)
     return NextResponse.json(
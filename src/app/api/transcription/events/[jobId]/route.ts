@@ -0,0 +1,61 @@
+import { NextRequest, NextResponse } from 'next/server'
+
+export const maxDuration = 3600
+
+const TRANSCRIPTION_SERVICE_URL = process.env.TRANSCRIPTION_SERVICE_URL || 'http://localhost:8000'
+
+export async function GET(
+  request: NextRequest,
+  { params }: { params: Promise<{ jobId: string }> }
+) {
+  try {
+    const { jobId } = await params
+
+    const response = await fetch(`${TRANSCRIPTION_SERVICE_URL}/api/status/${jobId}/events`, {
+      signal: request.signal,
+    })
+
+    if (!response.ok || !response.body) {
+      const error = await response.json().catch(() => ({}))
+      return NextResponse.json(
+        { error: error.detail || 'Status stream failed' },
+        { status: response.status }
+      )
+    }
+
+    // Pump the SSE stream chunk-by-chunk to avoid Next.js body buffering
+    const upstreamReader = response.body.getReader()
+    const readable = new ReadableStream({
+      async pull(controller) {
+        try {
+          const { done, value } = await upstreamReader.read()
+          if (done) {
+            controller.close()
+          } else {
+            controller.enqueue(value)
+          }
+        } catch {
+          controller.close()
+        }
+      },
+      cancel() {
+        upstreamReader.cancel()
+      },
+    })
+
+    return new Response(readable, {
+      headers: {
+        'Content-Type': 'text/event-stream; charset=utf-8',
+        'Cache-Control': 'no-cache, no-transform',
+        'Connection': 'keep-alive',
+        'X-Accel-Buffering': 'no',
+      },
+    })
+  } catch (error) {
+    console.error('Status stream error:', error)
+    return NextResponse.json(
+      { error: 'שגיאה בהתחברות לשירות התמלול' },
+      { status: 503 }
+    )
+  }
+}
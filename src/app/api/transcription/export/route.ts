@@ -0,0 +1,115 @@
+import { NextRequest, NextResponse } from 'next/server'
+import { createClient } from '@/lib/supabase/server'
+
+export const maxDuration = 600
+
+const TRANSCRIPTION_SERVICE_URL = process.env.TRANSCRIPTION_SERVICE_URL || 'http://localhost:8000'
+
+export async function POST(request: NextRequest) {
+  try {
+    const supabase = await createClient()
+
+    // Verify authentication
+    const { data: { user }, error: authError } = await supabase.auth.getUser()
+
+    if (authError || !user) {
+      return NextResponse.json(
+        { error: 'לא מאומת. יש להתחבר מחדש.' },
+        { status: 401 }
+      )
+    }
+
+    const doctorResult = await supabase
+      .from('doctors')
+      .select('id')
+      .eq('user_id', user.id)
+      .single()
+
+    const doctorId: string | undefined = (doctorResult.data as { id: string } | null)?.id
+
+    if (!doctorId) {
+      return NextResponse.json(
+        { error: 'משתמש זה אינו רופא.' },
+        { status: 403 }
+      )
+    }
+
+    const { transcription_ids, patient_id, date_from, date_to, layout } = await request.json()
+
+    // Only jobs behind this doctor's own saved transcriptions are exported
+    let rows = supabase
+      .from('transcriptions')
+      .select('job_id')
+      .eq('doctor_id', doctorId)
+      .eq('status', 'completed')
+      .not('job_id', 'is', null)
+    if (Array.isArray(transcription_ids)) rows = rows.in('id', transcription_ids)
+    if (patient_id) rows = rows.eq('patient_id', patient_id)
+    if (date_from) rows = rows.gte('created_at', date_from)
+    if (date_to) rows = rows.lte('created_at', `${date_to}T23:59:59.999Z`)
+
+    const { data, error: rowsError } = await rows
+    if (rowsError) {
+      throw rowsError
+    }
+
+    const jobIds = ((data || []) as { job_id: string | null }[])
+      .map((row) => row.job_id)
+      .filter((jobId): jobId is string => Boolean(jobId))
+
+    if (jobIds.length === 0) {
+      return NextResponse.json(
+        { error: 'לא נמצאו תמלולים לייצוא.' },
+        { status: 404 }
+      )
+    }
+
+    const response = await fetch(`${TRANSCRIPTION_SERVICE_URL}/api/export`, {
+      method: 'POST',
+      headers: { 'Content-Type': 'application/json' },
+      body: JSON.stringify({ job_ids: jobIds, layout: layout || 'text' }),
+      signal: request.signal,
+    })
+
+    if (!response.ok || !response.body) {
+      const error = await response.json().catch(() => ({ detail: 'Export failed' }))
+      return NextResponse.json(
+        { error: error.detail || 'Export failed' },
+        { status: response.status }
+      )
+    }
+
+    // Pass the archive through as it is produced instead of buffering it
+    const upstreamReader = response.body.getReader()
+    const readable = new ReadableStream({
+      async pull(controller) {
+        try {
+          const { done, value } = await upstreamReader.read()
+          if (done) {
+            controller.close()
+          } else {
+            controller.enqueue(value)
+          }
+        } catch {
+          controller.close()
+        }
+      },
+      cancel() {
+        upstreamReader.cancel()
+      },
+    })
+
+    return new Response(readable, {
+      headers: {
+        'Content-Type': 'application/zip',
+        'Content-Disposition': response.headers.get('content-disposition') || 'attachment; filename="transcriptions.zip"',
+      },
+    })
+  } catch (error) {
+    console.error('Export error:', error)
+    return NextResponse.json(
+      { error: 'שגיאה בייצוא התמלולים' },
+      { status: 503 }
+    )
+  }
+}
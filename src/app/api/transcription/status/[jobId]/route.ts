@@ -9,7 +9,7 @@ export async function GET(
   try {
     const { jobId } = await params
 
-    const response = await fetch(`${TRANSCRIPTION_SERVICE_URL}/api/status/${jobId}`)
+    const response = await fetch(`${TRANSCRIPTION_SERVICE_URL}/api/status/${jobId}?lite=true`)
 
     if (!response.ok) {
       const error = await response.json()
@@ -202,13 +202,15 @@ export default function DoctorTranscriptionsPage() {
     if (!doctorId) return
     const supabase = createClient() as any
 
+    const patientId = selectedPatient && selectedPatient !== 'none' ? selectedPatient : null
     const { data: insertedTranscription } = await supabase.from('transcriptions').insert({
       doctor_id: doctorId,
-      patient_id: selectedPatient && selectedPatient !== 'none' ? selectedPatient : null,
+      patient_id: patientId,
       original_filename: currentJob?.originalFilename || '',
       transcription_text: jobData.transcription_text,
       status: 'completed',
       duration_seconds: jobData.duration_seconds ? Math.round(jobData.duration_seconds) : null,
+      job_id: currentJob?.jobId || null,
     }).select('id').single()
 
     // Index in RAG vector store (fire-and-forget)
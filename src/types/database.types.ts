@@ -270,6 +270,7 @@ export interface Database {
           status: 'pending' | 'processing' | 'completed' | 'error'
           error_message: string | null
           duration_seconds: number | null
+          job_id: string | null
           created_at: string
           updated_at: string
         }
@@ -283,6 +284,7 @@ export interface Database {
           status?: 'pending' | 'processing' | 'completed' | 'error'
           error_message?: string | null
           duration_seconds?: number | null
+          job_id?: string | null
           created_at?: string
           updated_at?: string
         }
@@ -296,6 +298,7 @@ export interface Database {
           status?: 'pending' | 'processing' | 'completed' | 'error'
           error_message?: string | null
           duration_seconds?: number | null
+          job_id?: string | null
           created_at?: string
           updated_at?: string
         }
@@ -0,0 +1,155 @@
+-- Per-patient centroid vectors for two-stage (coarse-to-fine) retrieval.
+-- One row per (doctor, patient) over all sources ('*'), plus one per source table.
+CREATE TABLE patient_centroids (
+  doctor_id UUID NOT NULL REFERENCES doctors(id) ON DELETE CASCADE,
+  patient_id UUID NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+  source_table TEXT NOT NULL DEFAULT '*'
+    CHECK (source_table IN ('*', 'treatment_summaries', 'transcriptions', 'users')),
+
+  -- Mean of the patient's chunk embeddings
+  centroid vector(768) NOT NULL,
+  chunk_count INTEGER NOT NULL,
+
+  updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+
+  PRIMARY KEY (doctor_id, patient_id, source_table)
+);
+
+-- Stage-two lookups restrict chunks to a doctor's shortlisted patients
+CREATE INDEX idx_document_chunks_doctor_patient ON document_chunks(doctor_id, patient_id);
+
+-- RLS
+ALTER TABLE patient_centroids ENABLE ROW LEVEL SECURITY;
+
+CREATE POLICY "Doctors can view their own patient centroids"
+  ON patient_centroids FOR SELECT
+  USING (
+    EXISTS (
+      SELECT 1 FROM doctors WHERE doctors.id = patient_centroids.doctor_id AND doctors.user_id = auth.uid()
+    )
+  );
+
+-- Recompute the centroids of one (doctor, patient) from document_chunks.
+-- Called by the indexer after a patient's chunks change.
+CREATE OR REPLACE FUNCTION refresh_patient_centroids(
+  p_doctor_id UUID,
+  p_patient_id UUID
+)
+RETURNS VOID AS $$
+BEGIN
+  DELETE FROM patient_centroids
+  WHERE doctor_id = p_doctor_id AND patient_id = p_patient_id;
+
+  INSERT INTO patient_centroids (doctor_id, patient_id, source_table, centroid, chunk_count)
+  SELECT
+    dc.doctor_id,
+    dc.patient_id,
+    COALESCE(dc.source_table, '*'),
+    AVG(dc.embedding),
+    COUNT(*)::INTEGER
+  FROM document_chunks dc
+  WHERE dc.doctor_id = p_doctor_id AND dc.patient_id = p_patient_id
+  GROUP BY GROUPING SETS (
+    (dc.doctor_id, dc.patient_id, dc.source_table),
+    (dc.doctor_id, dc.patient_id)
+  );
+END;
+$$ LANGUAGE plpgsql;
+
+-- Stage one: rank a doctor's patients by centroid similarity
+CREATE OR REPLACE FUNCTION match_patient_centroids(
+  query_embedding vector(768),
+  filter_doctor_id UUID,
+  match_count INTEGER DEFAULT 5,
+  filter_source_table TEXT DEFAULT '*'
+)
+RETURNS TABLE (
+  patient_id UUID,
+  chunk_count INTEGER,
+  similarity FLOAT
+) AS $$
+BEGIN
+  RETURN QUERY
+  SELECT
+    pc.patient_id,
+    pc.chunk_count,
+    (1 - (pc.centroid <=> query_embedding))::FLOAT AS similarity
+  FROM patient_centroids pc
+  WHERE
+    pc.doctor_id = filter_doctor_id
+    AND pc.source_table = filter_source_table
+  ORDER BY pc.centroid <=> query_embedding
+  LIMIT match_count;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Stage two: exact search over the shortlisted patients' chunks (plus chunks
+-- with no patient). The candidate set is materialized first so the planner
+-- scans only those rows instead of walking the doctor-wide HNSW index.
+CREATE OR REPLACE FUNCTION match_document_chunks_for_patients(
+  query_embedding vector(768),
+  filter_doctor_id UUID,
+  filter_patient_ids UUID[],
+  match_count INTEGER DEFAULT 5,
+  similarity_threshold FLOAT DEFAULT 0.3
+)
+RETURNS TABLE (
+  id UUID,
+  source_table TEXT,
+  source_id UUID,
+  chunk_index INTEGER,
+  doctor_id UUID,
+  patient_id UUID,
+  content TEXT,
+  metadata JSONB,
+  similarity FLOAT
+) AS $$
+BEGIN
+  RETURN QUERY
+  WITH candidates AS MATERIALIZED (
+    SELECT
+      dc.id,
+      dc.source_table,
+      dc.source_id,
+      dc.chunk_index,
+      dc.doctor_id,
+      dc.patient_id,
+      dc.content,
+      dc.metadata,
+      dc.embedding <=> query_embedding AS distance
+    FROM document_chunks dc
+    WHERE
+      dc.doctor_id = filter_doctor_id
+      AND (dc.patient_id = ANY(filter_patient_ids) OR dc.patient_id IS NULL)
+  )
+  SELECT
+    c.id,
+    c.source_table,
+    c.source_id,
+    c.chunk_index,
+    c.doctor_id,
+    c.patient_id,
+    c.content,
+    c.metadata,
+    (1 - c.distance)::FLOAT AS similarity
+  FROM candidates c
+  WHERE (1 - c.distance) > similarity_threshold
+  ORDER BY c.distance
+  LIMIT match_count;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Backfill centroids for chunks indexed before this migration
+INSERT INTO patient_centroids (doctor_id, patient_id, source_table, centroid, chunk_count)
+SELECT
+  dc.doctor_id,
+  dc.patient_id,
+  COALESCE(dc.source_table, '*'),
+  AVG(dc.embedding),
+  COUNT(*)::INTEGER
+FROM document_chunks dc
+WHERE dc.patient_id IS NOT NULL
+GROUP BY GROUPING SETS (
+  (dc.doctor_id, dc.patient_id, dc.source_table),
+  (dc.doctor_id, dc.patient_id)
+);
@@ -0,0 +1,5 @@
+-- Transcription service job that produced each saved transcription, so exports
+-- and index handoffs can be limited to the doctor's own jobs
+ALTER TABLE transcriptions ADD COLUMN IF NOT EXISTS job_id TEXT;
+
+CREATE INDEX IF NOT EXISTS idx_transcriptions_job_id ON transcriptions(job_id);